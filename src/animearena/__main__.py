@@ -4,20 +4,17 @@ from asyncio.exceptions import CancelledError
 import logging
 import asyncio
 import contextvars
+import struct
 import time
 import sdl2
 import sdl2.ext
 import sdl2.sdlttf
 import pyautogui
-from playsound import playsound
-from animearena import client
-from animearena.byte_buffer import ByteBuffer
+from animearena import client, protocol
+from animearena.profiling import PROFILE_DIR, profiler
 from animearena.scene_manager import SceneManager
-from pydub import AudioSegment
-from pydub.playback import play
 import sys
 import gc
-import cProfile
 
 WHITE = sdl2.SDL_Color(255, 255, 255)
 
@@ -72,6 +69,8 @@ def main():
 target_fps = contextvars.ContextVar('target_fps', default=30)
 
 async def server_loop(scene_manager: SceneManager):
+    """Read packets as soon as they arrive and queue them for the game loop.
+    A full queue holds off reading, leaving the backlog in the socket."""
     VERSION_CHECKED = False
     cancelled = False
     timeouts = 0
@@ -92,13 +91,23 @@ async def server_loop(scene_manager: SceneManager):
         except asyncio.CancelledError:
             cancelled = True
             break
+    # Set after an oversized sentinel packet, whose remainder arrives as the
+    # next frame
+    discarding = False
     while True and not cancelled:
         if not VERSION_CHECKED:
             print("Checking version")
             scene_manager.connection.send_version_request()
             VERSION_CHECKED = True
         try:
-            data = await reader.readuntil(b'\x1f\x1f\x1f')
+            data = await protocol.read_frame(reader, scene_manager.connection.framing)
+            if discarding:
+                discarding = False
+                continue
+            if data:
+                packet_id = protocol.peek_packet_id(data)
+                logging.debug(f"Received packet id: {packet_id}")
+                await scene_manager.inbound.put((packet_id, data))
         except CancelledError:
             writer.close()
             await writer.wait_closed()
@@ -106,20 +115,18 @@ async def server_loop(scene_manager: SceneManager):
         except asyncio.exceptions.IncompleteReadError:
             break
         except asyncio.exceptions.LimitOverrunError as err:
-            print(f"{err.consumed}")
-        if data:
-            buffer = ByteBuffer()
-            buffer.write_bytes(data[:-3])
-            packet_id = buffer.read_int(False)
-            logging.debug(f"Received packet id: {packet_id}")
-            scene_manager.dispatch_message(packet_id, data)
-            buffer.clear()
-        
-        await asyncio.sleep(.1)
+            logging.warning("Discarding a packet over the %d byte limit", protocol.MAX_FRAME_SIZE)
+            await reader.readexactly(err.consumed)
+            discarding = True
+        except struct.error:
+            logging.warning("Discarding a packet too short to hold a packet id")
+        except ValueError as err:
+            logging.warning("Discarding packet: %s", err)
     
 
 async def game_loop(scene_manager: SceneManager, window: sdl2.ext.Window, server_loop_task):
     running = True
+    scene_manager.open_inbound_queue()
     tasktask = asyncio.create_task(server_loop_task)
 
     while running:
@@ -143,6 +150,10 @@ async def game_loop(scene_manager: SceneManager, window: sdl2.ext.Window, server
                         scene_manager.login_scene.tab_between_boxes()
                     if event.key.keysym.sym == sdl2.SDLK_BACKSPACE and scene_manager.current_scene == scene_manager.login_scene:
                         scene_manager.login_scene.prepare_backspace()
+                    if event.key.keysym.sym == sdl2.SDLK_BACKSPACE and scene_manager.current_scene == scene_manager.char_select:
+                        scene_manager.char_select.name_filter_backspace()
+                    if event.key.keysym.sym == sdl2.SDLK_F12 and profiler.enabled:
+                        profiler.dump(PROFILE_DIR / time.strftime("%Y%m%d-%H%M%S"))
                 if event.type == sdl2.SDL_MOUSEBUTTONUP:
                     if scene_manager.current_scene == scene_manager.char_select:
                         scene_manager.char_select.char_select_pressed = False
@@ -185,6 +196,7 @@ async def game_loop(scene_manager: SceneManager, window: sdl2.ext.Window, server
                     scene_manager.uiprocessor.dispatch(sprite, event)
                     if scene_manager.current_scene.triggered_event:
                         break
+        scene_manager.dispatch_inbound()
         scene_manager.battle_scene.target_clicked = False
         if scene_manager.current_scene == scene_manager.battle_scene:
             scene_manager.battle_scene.draw_timer_region()
@@ -200,8 +212,7 @@ async def game_loop(scene_manager: SceneManager, window: sdl2.ext.Window, server
             
         if scene_manager.current_scene.animations:
             scene_manager.current_scene.progress_animations()
-        scene_manager.spriterenderer.render(scene_manager.current_scene.renderables())
-        window.refresh()
+        scene_manager.present()
         
         if scene_manager.connected:
             if scene_manager.auto_queue and scene_manager.current_scene == scene_manager.char_select:
@@ -5,9 +5,11 @@ import sdl2
 import sdl2.ext
 import enum
 import copy
+import itertools
 import importlib.resources
 from animearena.effects import EffectType, Effect
 from animearena.ability_type import AbilityType
+from animearena.resource_manager import find_image_file, load_image
 import logging
 
 def get_path(file_name: str) -> Path:
@@ -17,7 +19,7 @@ def get_path(file_name: str) -> Path:
 
 RESOURCES = Path(__file__).parent.parent.parent / "resources"
 import typing
-from typing import Iterable, Callable
+from typing import Iterable, Callable, Optional, Tuple, Union
 from animearena.energy import Energy
 if typing.TYPE_CHECKING:
     from animearena.battle_scene import CharacterManager, BattleScene
@@ -46,7 +48,8 @@ class DamageType(enum.IntEnum):
 
 class Ability():
 
-    image: Image
+    image_file: Optional[str] = None
+    _image: Optional[Image.Image] = None
     name: str = ""
     db_name: str = ""
     desc: str = ""
@@ -61,14 +64,12 @@ class Ability():
     types: list[AbilityType]
     target: Callable
     execute: Callable
+    _target_cache: Optional[Tuple[tuple, int]] = None
 
     def __init__(self, name: str = None):
         if name:
             self.db_name = name
-            try:
-                self.image = Image.open(get_path(name + ".png"))
-            except FileNotFoundError:
-                self.image = Image.open(get_path(name + ".PNG"))
+            self.image_file = find_image_file(name)
             
         self.char_select_desc = None
         self.in_battle_desc = None
@@ -79,6 +80,16 @@ class Ability():
             pass
         
 
+    @property
+    def image(self) -> Image.Image:
+        if self._image is None and self.image_file:
+            return load_image(self.image_file)
+        return self._image
+
+    @image.setter
+    def image(self, image: Image.Image):
+        self._image = image
+
     def resources_available(self, energy: list[int]) -> bool:
         for k, v in self.cost.items():
             if v > 0:
@@ -163,8 +174,8 @@ class Ability():
                     return False
         if character.is_stunned():
             return False
-        if self.target(character, scene.player_display.team.character_managers,
-                       scene.enemy_display.team.character_managers, True) == 0:
+        if self.count_targets(character, scene.player_display.team.character_managers,
+                              scene.enemy_display.team.character_managers) == 0:
             return False
         if scene.waiting_for_turn:
             return False
@@ -183,6 +194,29 @@ class Ability():
                 
         return True
 
+    def count_targets(self, user: "CharacterManager",
+                      playerTeam: list["CharacterManager"],
+                      enemyTeam: list["CharacterManager"]) -> int:
+        if isinstance(self.target, TargetRule):
+            return bin(self.target_mask(user, playerTeam, enemyTeam)).count("1")
+        return self.target(user, playerTeam, enemyTeam, True)
+
+    def target_mask(self, user: "CharacterManager",
+                    playerTeam: list["CharacterManager"],
+                    enemyTeam: list["CharacterManager"]) -> int:
+        """Legal targets for a default targeting rule as a TargetRule bitmask.
+
+        Default rules only look at effects, death and targetability, so the
+        last mask is reused until one of those changes on a character
+        involved."""
+        state = (id(user), user.source.current_effects.version,
+                 tuple((id(manager), manager.source.current_effects.version,
+                        manager.source.dead, manager.source.untargetable)
+                       for manager in itertools.chain(playerTeam, enemyTeam)))
+        if self._target_cache is None or self._target_cache[0] != state:
+            self._target_cache = (state, self.target.target_mask(user, playerTeam, enemyTeam))
+        return self._target_cache[1]
+
     def modify_ability_cost(self, energy_type: Energy, mod: int):
         self.cost[energy_type] = max(self.cost[energy_type] + mod, 0)
         
@@ -222,79 +256,108 @@ class Ability():
 
 #region Targeting
 #region default targeting methods
-def default_target(target_type,
-                   def_type: str = "NORMAL",
-                   prep_req: str = "NONE",
-                   mark_req: str = "NONE",
-                   lockout="NONE",
-                   protection="NONE"):
-    def inner(user: "CharacterManager",
-              playerTeam: list["CharacterManager"],
-              enemyTeam: list["CharacterManager"],
-              fake_targeting: bool = False) -> int:
+@enum.unique
+class TargetScope(enum.IntEnum):
+    "A component for determining which characters a default targeting rule considers"
+    HOSTILE = 0
+    HELPFUL = 1
+    ALL = 2
+    SELFLESS = 3
+    SELF = 4
+
+
+class TargetRule():
+    """Default targeting for an ability, resolved once from its database entry."""
+    __slots__ = ("scope", "def_type", "prep_req", "mark_req", "lockout",
+                 "protection", "hostile", "helpful")
+
+    def __init__(self,
+                 scope: Union[TargetScope, str],
+                 def_type: str = "NORMAL",
+                 prep_req: str = "NONE",
+                 mark_req: str = "NONE",
+                 lockout="NONE",
+                 protection="NONE"):
+        self.scope = TargetScope[scope] if isinstance(scope, str) else scope
+        self.def_type = None if def_type == "NORMAL" else def_type
+        self.prep_req = None if prep_req == "NONE" else prep_req
+        self.mark_req = None if mark_req == "NONE" else mark_req
+        self.lockout = None if lockout == "NONE" else (lockout[0], lockout[1])
+        self.protection = None if protection == "NONE" else (protection[0], protection[1])
+        self.hostile = self.scope in (TargetScope.HOSTILE, TargetScope.ALL)
+        self.helpful = self.scope in (TargetScope.HELPFUL, TargetScope.ALL, TargetScope.SELFLESS)
+
+    def __call__(self,
+                 user: "CharacterManager",
+                 playerTeam: list["CharacterManager"],
+                 enemyTeam: list["CharacterManager"],
+                 fake_targeting: bool = False) -> int:
         total_targets = 0
-        if def_type == "NORMAL":
-            targeting = user.check_bypass_effects()
-        else:
-            targeting = def_type
+        for target in self.legal_targets(user, playerTeam, enemyTeam):
+            if not fake_targeting:
+                target.set_targeted()
+            total_targets += 1
+        return total_targets
 
-        if target_type == "HOSTILE" or target_type == "ALL":
+    def user_allowed(self, user: "CharacterManager") -> bool:
+        if self.prep_req is not None and not user.has_effect(EffectType.MARK, self.prep_req):
+            return False
+        if self.lockout is not None and user.has_effect(*self.lockout):
+            return False
+        return True
+
+    def target_allowed(self, target: "CharacterManager") -> bool:
+        if self.mark_req is not None and not target.has_effect(EffectType.MARK, self.mark_req):
+            return False
+        if self.protection is not None and target.has_effect(*self.protection):
+            return False
+        return True
+
+    def legal_targets(self,
+                      user: "CharacterManager",
+                      playerTeam: list["CharacterManager"],
+                      enemyTeam: list["CharacterManager"]) -> Iterable["CharacterManager"]:
+        if not self.user_allowed(user):
+            return
+        if self.scope == TargetScope.SELF:
+            if self.target_allowed(user):
+                yield user
+            return
+        targeting = user.check_bypass_effects() if self.def_type is None else self.def_type
+        if self.hostile:
             for enemy in enemyTeam:
-                if enemy.hostile_target(user, targeting) and (
-                        prep_req == "NONE"
-                        or user.has_effect(EffectType.MARK, prep_req)) and (
-                            mark_req == "NONE"
-                            or enemy.has_effect(EffectType.MARK, mark_req)
-                        ) and (lockout == "NONE" or not user.has_effect(
-                            lockout[0], lockout[1])) and (
-                                protection == "NONE" or not enemy.has_effect(
-                                    protection[0], protection[1])):
-                    if not fake_targeting:
-                        enemy.set_targeted()
-                    total_targets += 1
-        if target_type == "HELPFUL" or target_type == "ALL":
+                if enemy.hostile_target(user, targeting) and self.target_allowed(enemy):
+                    yield enemy
+        if self.helpful:
             for ally in playerTeam:
-                if ally.helpful_target(user, targeting) and (
-                        prep_req == "NONE"
-                        or user.has_effect(EffectType.MARK, prep_req)) and (
-                            mark_req == "NONE"
-                            or ally.has_effect(EffectType.MARK, mark_req)
-                        ) and (lockout == "NONE" or not user.has_effect(
-                            lockout[0], lockout[1])) and (
-                                protection == "NONE" or not ally.has_effect(
-                                    protection[0], protection[1])):
-                    if not fake_targeting:
-                        ally.set_targeted()
-                    total_targets += 1
-        if target_type == "SELFLESS":
-            for ally in playerTeam:
-                if ally != user and ally.helpful_target(user, targeting) and (
-                        prep_req == "NONE"
-                        or user.has_effect(EffectType.MARK, prep_req)) and (
-                            mark_req == "NONE"
-                            or ally.has_effect(EffectType.MARK, mark_req)
-                        ) and (lockout == "NONE" or not user.has_effect(
-                            lockout[0], lockout[1])) and (
-                                protection == "NONE" or not ally.has_effect(
-                                    protection[0], protection[1])):
-                    if not fake_targeting:
-                        ally.set_targeted()
-                    total_targets += 1
-        if target_type == "SELF":
-            if (mark_req == "NONE"
-                    or user.has_effect(EffectType.MARK, mark_req)
-                ) and (prep_req == "NONE"
-                       or user.has_effect(EffectType.MARK, prep_req)) and (
-                           lockout == "NONE" or not user.has_effect(
-                               lockout[0], lockout[1])) and (
-                                   protection == "NONE" or not user.has_effect(
-                                       protection[0], protection[1])):
-                if not fake_targeting:
-                    user.set_targeted()
-                total_targets += 1
-        return total_targets
+                if self.scope == TargetScope.SELFLESS and ally == user:
+                    continue
+                if ally.helpful_target(user, targeting) and self.target_allowed(ally):
+                    yield ally
+
+    def target_mask(self,
+                    user: "CharacterManager",
+                    playerTeam: list["CharacterManager"],
+                    enemyTeam: list["CharacterManager"]) -> int:
+        """Bit i is set if playerTeam[i] is a legal target, and bit
+        len(playerTeam) + i if enemyTeam[i] is."""
+        members = list(playerTeam) + list(enemyTeam)
+        mask = 0
+        for target in self.legal_targets(user, playerTeam, enemyTeam):
+            for i, member in enumerate(members):
+                if member is target:
+                    mask |= 1 << i
+                    break
+        return mask
 
-    return inner
+
+def default_target(target_type,
+                   def_type: str = "NORMAL",
+                   prep_req: str = "NONE",
+                   mark_req: str = "NONE",
+                   lockout="NONE",
+                   protection="NONE") -> TargetRule:
+    return TargetRule(target_type, def_type, prep_req, mark_req, lockout, protection)
 
 #endregion
 
@@ -3394,8 +3457,7 @@ def misaka_form_changed(user: "CharacterManager"):
     return (user.has_effect(EffectType.MARK, "Ultra Railgun") or user.has_effect(EffectType.CONT_DEST_DEF, "Iron Colossus") or user.has_effect(EffectType.PROF_SWAP, "Level-6 Shift"))
 
 def misaka_reset_swaps(user: "CharacterManager"):
-    new_effects = [eff for eff in user.source.current_effects if not (eff.eff_type == EffectType.ABILITY_SWAP and eff.user == user)]
-    user.source.current_effects = new_effects
+    user.source.current_effects.retain(lambda eff: not (eff.eff_type == EffectType.ABILITY_SWAP and eff.user == user))
 
 def exe_railgun(user: "CharacterManager", playerTeam: list["CharacterManager"], enemyTeam: list["CharacterManager"]):
     damage = 25
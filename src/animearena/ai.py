@@ -0,0 +1,307 @@
+"""Computer opponent that searches over legal turns.
+
+Candidate turns are sampled from the abilities Ability.can_use allows and the
+targets each ability's targeting marks. Each candidate is scored by rollouts:
+the turn is played, then a few plies of sampled enemy and ally turns, and the
+position is evaluated. Rollouts are spread over the candidates with UCB1
+until the time budget runs out. The search runs either in this process, on
+BattleState forks of the scene, or across a process pool whose workers
+rebuild the scene from its match log. A scene set up without a recorder can
+be given one for the pool with SearchPlayer.attach.
+"""
+import atexit
+import logging
+import math
+import multiprocessing
+import random
+import time
+from typing import Optional, Tuple
+
+from animearena.ability import Ability, Target
+from animearena.battle_scene import AbilityMessage
+from animearena.battle_state import BattleState
+from animearena.headless import HeadlessBattleScene
+from animearena.recording import MatchRecorder, read_records
+from animearena.replay import replay_record, start_replay
+
+# Seconds per turn; well inside the 90 second turn timer.
+DEFAULT_BUDGET = 10.0
+# Plies played out after the candidate turn.
+DEFAULT_DEPTH = 4
+CANDIDATES = 32
+PASS_CHANCE = 0.15
+ENEMY_ACT_CHANCE = 0.8
+EXPLORATION = 1.4
+
+# (user slot, ability index, primary target slot), where target slots run
+# over the ally team and then the enemy team
+Action = Tuple[int, int, int]
+Turn = Tuple[Action, ...]
+
+
+#region Turns
+
+def slot(manager) -> int:
+    return manager.char_id + (3 if manager.id == "enemy" else 0)
+
+
+def queue_action(scene: HeadlessBattleScene, action: Action) -> Ability:
+    user_id, ability_id, target_slot = action
+    user = scene.pteam[user_id]
+    ability = user.source.current_abilities[ability_id]
+    scene.queue_ability(user, ability, (scene.pteam + scene.eteam)[target_slot])
+    return ability
+
+
+def sample_turn(scene: HeadlessBattleScene, rng: random.Random,
+                pass_chance: float = PASS_CHANCE) -> Turn:
+    """Queue a random legal turn on the scene and return it."""
+    turn = []
+    for manager in rng.sample(scene.pteam, len(scene.pteam)):
+        if rng.random() < pass_chance:
+            continue
+        options = scene.usable_abilities(manager)
+        if not options:
+            continue
+        ability = rng.choice(options)
+        targets = scene.legal_targets(manager, ability)
+        if not targets:
+            continue
+        action = (manager.char_id, manager.source.current_abilities.index(ability),
+                  slot(rng.choice(targets)))
+        queue_action(scene, action)
+        turn.append(action)
+    return tuple(turn)
+
+
+def sample_enemy_turn(scene: HeadlessBattleScene, rng: random.Random) -> list[AbilityMessage]:
+    """A plausible enemy turn. The enemy's energy and cooldowns are hidden,
+    so any ability with a legal target may be used."""
+    messages = []
+    for manager in scene.eteam:
+        if manager.source.dead or manager.is_stunned() or rng.random() > ENEMY_ACT_CHANCE:
+            continue
+        abilities = list(enumerate(manager.source.current_abilities))
+        rng.shuffle(abilities)
+        for ability_id, ability in abilities:
+            if not ability.target(manager, scene.eteam, scene.pteam, fake_targeting=True):
+                continue
+            ability.target(manager, scene.eteam, scene.pteam)
+            targets = [target for target in scene.eteam + scene.pteam if target.targeted]
+            scene.reset_targeting()
+            primary = rng.choice(targets)
+            if ability.target_type == Target.SINGLE:
+                targets = [primary]
+            message = AbilityMessage()
+            message.assign_user_id(manager.char_id)
+            message.assign_ability_id(ability_id)
+            # Slots are from the enemy's side of the board.
+            message.set_primary_target(primary.char_id + (3 if primary.id == "ally" else 0))
+            message.ally_targets = [target.char_id for target in targets if target.id == "enemy"]
+            message.enemy_targets = [target.char_id for target in targets if target.id == "ally"]
+            messages.append(message)
+            break
+    return messages
+
+
+def roll_energy(rng: random.Random) -> list[int]:
+    return [rng.randint(0, 3) for _ in range(6)]
+
+#endregion
+
+#region Search
+
+def evaluate(scene: HeadlessBattleScene) -> float:
+    """Score a position from -1 (lost) to 1 (won)."""
+    if scene.game_over:
+        return 1.0 if scene.game_won else -1.0
+    ally_hp = sum(manager.source.hp for manager in scene.pteam if not manager.source.dead)
+    enemy_hp = sum(manager.source.hp for manager in scene.eteam if not manager.source.dead)
+    return max(-1.0, min(1.0, (ally_hp - enemy_hp) / 600))
+
+
+def rollout(scene: HeadlessBattleScene, turn: Turn, rng: random.Random, depth: int) -> float:
+    for action in turn:
+        queue_action(scene, action)
+    scene.execute_turn()
+    for ply in range(depth):
+        if scene.game_over:
+            break
+        if ply % 2 == 0:
+            scene.execute_enemy_turn(sample_enemy_turn(scene, rng), roll_energy(rng))
+        else:
+            sample_turn(scene, rng)
+            scene.execute_turn()
+    return evaluate(scene)
+
+
+def select(totals: list[float], visits: list[int], played: int) -> int:
+    best, best_score = 0, -math.inf
+    for i, count in enumerate(visits):
+        if not count:
+            return i
+        score = totals[i] / count + EXPLORATION * math.sqrt(math.log(played) / count)
+        if score > best_score:
+            best, best_score = i, score
+    return best
+
+
+def search(scene: HeadlessBattleScene, candidates: list[Turn], budget: float, depth: int,
+           rng: random.Random) -> Tuple[list[float], list[int]]:
+    """Roll out candidates until the budget is spent, returning the total
+    value and the number of rollouts of each."""
+    deadline = time.monotonic() + budget
+    totals = [0.0] * len(candidates)
+    visits = [0] * len(candidates)
+    root = BattleState.capture(scene)
+    recorder, scene.recorder = scene.recorder, None
+    try:
+        played = 0
+        while time.monotonic() < deadline:
+            i = select(totals, visits, played)
+            try:
+                value = rollout(scene, candidates[i], rng, depth)
+            except Exception:  # pylint: disable=broad-except
+                # Lines the engine cannot resolve are scored as losses.
+                logging.debug("Rollout of %s failed", candidates[i], exc_info=True)
+                value = -1.0
+            root.restore()
+            totals[i] += value
+            visits[i] += 1
+            played += 1
+    finally:
+        root.restore()
+        scene.recorder = recorder
+    return totals, visits
+
+
+def candidate_turns(scene: HeadlessBattleScene, rng: random.Random,
+                    count: int = CANDIDATES) -> list[Turn]:
+    """Distinct legal turns, passing included."""
+    root = BattleState.capture(scene)
+    candidates = {(): None}
+    try:
+        for _ in range(count):
+            candidates.setdefault(sample_turn(scene, rng), None)
+            root.restore()
+    finally:
+        root.restore()
+    return list(candidates)
+
+
+def best_turn(candidates: list[Turn], totals: list[float], visits: list[int]) -> Turn:
+    scored = [(totals[i] / visits[i], visits[i], i) for i in range(len(candidates)) if visits[i]]
+    if not scored:
+        return candidates[0]
+    return candidates[max(scored)[2]]
+
+#endregion
+
+#region Workers
+
+# The scene each worker process replays match logs into, and the log it
+# has replayed so far
+_worker_scene: Optional[HeadlessBattleScene] = None
+_worker_log = b""
+
+
+def load_log(log: bytes) -> HeadlessBattleScene:
+    """Bring the worker's scene up to the end of the log, replaying only
+    the records it has not seen when the log continues the last one."""
+    global _worker_scene, _worker_log
+    records = list(read_records(log))
+    if _worker_scene is None or not log.startswith(_worker_log):
+        _worker_scene = start_replay(records[0])
+        applied = 1
+    else:
+        applied = len(list(read_records(_worker_log)))
+    for record in records[applied:]:
+        replay_record(_worker_scene, record)
+    _worker_log = log
+    return _worker_scene
+
+
+def _search_worker(args: Tuple[bytes, list[Turn], float, int, int]) -> Tuple[list[float], list[int]]:
+    log, candidates, budget, depth, seed = args
+    started = time.monotonic()
+    scene = load_log(log)
+    return search(scene, candidates, budget - (time.monotonic() - started), depth,
+                  random.Random(seed))
+
+#endregion
+
+
+class SearchPlayer():
+    """Plays the ally side of a headless scene within a per-turn budget."""
+
+    budget: float
+    depth: int
+    processes: int
+    rng: random.Random
+
+    def __init__(self, budget: float = DEFAULT_BUDGET, depth: int = DEFAULT_DEPTH,
+                 processes: Optional[int] = None, seed: Optional[int] = None):
+        self.budget = budget
+        self.depth = depth
+        self.processes = processes or multiprocessing.cpu_count()
+        self.rng = random.Random(seed)
+        self.pool = None
+
+    def attach(self, scene: HeadlessBattleScene):
+        """Give a scene that is not set up yet a match log of its own, for
+        the pool's workers to rebuild it from. Scenes without one are
+        searched in this process."""
+        if scene.recorder is None:
+            scene.recorder = MatchRecorder()
+
+    def start(self):
+        """Start the pool's workers now rather than on the first turn."""
+        if self.processes > 1 and self.pool is None:
+            self.pool = multiprocessing.Pool(self.processes)
+
+    def choose_turn(self, scene: HeadlessBattleScene) -> Turn:
+        candidates = candidate_turns(scene, self.rng)
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.processes == 1 or scene.recorder is None:
+            return best_turn(candidates, *search(scene, candidates, self.budget, self.depth,
+                                                 self.rng))
+        self.start()
+        log = bytes(scene.recorder.log)
+        jobs = [(log, candidates, self.budget, self.depth, self.rng.getrandbits(32))
+                for _ in range(self.processes)]
+        totals = [0.0] * len(candidates)
+        visits = [0] * len(candidates)
+        for worker_totals, worker_visits in self.pool.map(_search_worker, jobs):
+            for i in range(len(candidates)):
+                totals[i] += worker_totals[i]
+                visits[i] += worker_visits[i]
+        return best_turn(candidates, totals, visits)
+
+    def take_turn(self, scene: HeadlessBattleScene) -> list[Ability]:
+        """Queue the chosen turn on the scene, ready for execute_turn."""
+        return [queue_action(scene, action) for action in self.choose_turn(scene)]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+# The players search_policy keeps between turns, by process count, so each
+# pool is started once
+_search_players: dict[int, SearchPlayer] = {}
+
+
+def search_policy(scene: HeadlessBattleScene, rng: random.Random,
+                  budget: float = 0.5, processes: int = 1) -> list[Ability]:
+    """Simulator policy: a search with a short budget, in this process or,
+    for scenes with a match log, across processes workers."""
+    player = _search_players.get(processes)
+    if player is None:
+        player = _search_players[processes] = SearchPlayer(processes=processes)
+        atexit.register(player.close)
+    player.budget = budget
+    player.rng.seed(rng.getrandbits(32))
+    return player.take_turn(scene)
@@ -4,6 +4,32 @@ import logging
 from animearena.color import *
 from animearena.text_formatter import get_string_width, get_font_height
 
+
+class FrameStrip():
+    """Sprites of one image at every size an animation passes through. Each
+    size is resized and converted once, however many frames show it."""
+
+    def __init__(self, scene, image):
+        self.scene = scene
+        self.image = image
+        self.sprites = {}
+
+    def sprite(self, width: int, height: int) -> sdl2.ext.SoftwareSprite:
+        sprite = self.sprites.get((width, height))
+        if sprite is None:
+            sprite = self.sprites[(width, height)] = self.scene.sprite_factory.from_surface(
+                self.scene.get_scaled_surface(self.image, width, height, cache=False), free=True)
+        return sprite
+
+
+def make_alpha_sprite(scene, image) -> sdl2.ext.SoftwareSprite:
+    """A sprite whose opacity is set with SDL_SetSurfaceAlphaMod, so fading
+    it never touches its pixels."""
+    sprite = scene.sprite_factory.from_surface(scene.get_scaled_surface(image, cache=False), free=True)
+    sdl2.SDL_SetSurfaceBlendMode(sprite.surface, sdl2.SDL_BLENDMODE_BLEND)
+    return sprite
+
+
 class Animation():
     
     current_x: int
@@ -126,7 +152,7 @@ class MovementAnimation(Animation):
     
 class SizeAnimation(Animation):
     
-    def __init__(self, start_x, start_y, image, duration, scene, lock, shrink, dest_size = None, start_size = None):
+    def __init__(self, start_x, start_y, image, duration, scene, lock, shrink, dest_size = None, start_size = None, strip = None):
         self.start_x = start_x
         self.start_y = start_y
         self.frame_timer = 0
@@ -135,9 +161,10 @@ class SizeAnimation(Animation):
         self.links = list()
         self.end_funcs = list()
         self.frequency = 1
-        self.image = image.copy()
+        self.image = image
         self.display = True
         frame_allotment = float(duration * 30)
+        self.frame_count = int(frame_allotment) + 1
         self.shrink = shrink
         self.name = ""
         x_offset = 0
@@ -201,11 +228,26 @@ class SizeAnimation(Animation):
                 self.display_x = start_x + (x_diff // 2)
                 self.display_y = start_y + (y_diff // 2)
             self.orient = 1
-            
+        self.strip = strip or FrameStrip(scene, scene.border_image(image, 1))
+        self.bake()
+    
+    def bake(self):
+        """Render every frame size up front by playing the steps through,
+        then put the animation back at its first frame."""
+        state = (self.current_x, self.current_y, self.display_x, self.display_y,
+                 self.current_width, self.current_height, self.display_width, self.display_height)
+        self.strip.sprite(self.display_width, self.display_height)
+        for _ in range(self.frame_count):
+            if self.has_ended:
+                break
+            self.step()
+            self.strip.sprite(self.display_width, self.display_height)
+        (self.current_x, self.current_y, self.display_x, self.display_y,
+         self.current_width, self.current_height, self.display_width, self.display_height) = state
     
     @property
     def current_sprite(self):
-        return self.scene.sprite_factory.from_surface(self.scene.get_scaled_surface(self.scene.border_image(self.image, 1), self.display_width, self.display_height), free=True)
+        return self.strip.sprite(self.display_width, self.display_height)
     
     def step(self):
         self.current_width += self.x_step
@@ -237,11 +279,13 @@ class SizeAnimation(Animation):
 def create_pulse_animation(start_x, start_y, image, pulse_duration, pulse_amount, scene, lock, dest_size):
     image_start_size = image.size
     animations = []
+    # Every pulse grows and shrinks through the same sizes, so they share one strip.
+    strip = FrameStrip(scene, scene.border_image(image, 1))
     for i in range(pulse_amount):
-        grow_animation = SizeAnimation(start_x, start_y, image, pulse_duration, scene, lock, False, dest_size=dest_size, start_size=image_start_size)
+        grow_animation = SizeAnimation(start_x, start_y, image, pulse_duration, scene, lock, False, dest_size=dest_size, start_size=image_start_size, strip=strip)
         if animations:
             animations[-1].link_animation(grow_animation)
-        shrink_animation = SizeAnimation(start_x, start_y, image, pulse_duration, scene, lock, True, dest_size=image_start_size, start_size=dest_size)
+        shrink_animation = SizeAnimation(start_x, start_y, image, pulse_duration, scene, lock, True, dest_size=image_start_size, start_size=dest_size, strip=strip)
         grow_animation.link_animation(shrink_animation)
         animations.append(grow_animation)
         animations.append(shrink_animation)
@@ -274,9 +318,11 @@ class FadeAnimation(Animation):
         self.display = True
         self.frequency = 1
         self.frame_timer = 0
-        self.image = image.copy()
         self.scene = scene
-        self.image = self.scene.border_image(self.image, 1)
+        self.image = self.scene.border_image(image, 1)
+        # Every pixel takes the fade's alpha, as putalpha would give it.
+        self.image.putalpha(255)
+        self.sprite = make_alpha_sprite(scene, self.image)
         self.links = list()
         self.end_funcs = list()
         self.lock = lock
@@ -300,8 +346,8 @@ class FadeAnimation(Animation):
         
     @property
     def current_sprite(self):
-        self.image.putalpha(self.display_alpha)
-        return self.scene.sprite_factory.from_surface(self.scene.get_scaled_surface(self.image), free=True)
+        sdl2.SDL_SetSurfaceAlphaMod(self.sprite.surface, self.display_alpha)
+        return self.sprite
     
     def step(self):
         self.current_alpha += self.alpha_step
@@ -432,8 +478,10 @@ class ShakeAnimation(Animation):
         self.duration = duration * 30
         self.display = True
         self.name = ""
-        self.image = image.copy()
-        self.image = self.scene.border_image(self.image, 1)
+        self.image = self.scene.border_image(image, 1)
+        if fade:
+            self.image.putalpha(255)
+        self.sprite = make_alpha_sprite(scene, self.image)
         self.fade = fade
         self.start_x = start_x
         self.start_y = start_y
@@ -450,8 +498,8 @@ class ShakeAnimation(Animation):
     @property
     def current_sprite(self):
         if self.fade:
-            self.image.putalpha(int(self.current_alpha))
-        return self.scene.sprite_factory.from_surface(self.scene.get_scaled_surface(self.image), free=True)
+            sdl2.SDL_SetSurfaceAlphaMod(self.sprite.surface, int(self.current_alpha))
+        return self.sprite
     
     def step(self):
         self.display_x = self.start_x + (self.cycle[self.i % 6][0] * self.intensity)
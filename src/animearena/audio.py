@@ -0,0 +1,96 @@
+"""Sound effects through an SDL_mixer channel pool.
+
+Every sound is decoded to PCM in the device format once, when the mixer is
+opened. Playing one only hands the decoded chunk to a free channel, and SDL
+mixes the channels on its own audio thread, so the frame loop never waits
+on audio:
+
+    open_mixer(["ability_click.wav", "turn_back.wav"])
+    play_sound("ability_click.wav")
+
+When every channel is busy, the sound that has played longest is cut off.
+Without an audio device or the SDL_mixer library, play_sound does nothing.
+"""
+import logging
+import os
+from typing import Iterable, Optional
+
+from animearena.resource_manager import get_path
+
+try:
+    import sdl2.sdlmixer as sdlmixer
+except ImportError:
+    sdlmixer = None
+
+FREQUENCY = 44100
+CHANNELS = 2
+# Samples per mixing pass; small enough that clicks land on the frame they
+# were made on.
+CHUNK_SIZE = 1024
+# Sounds playing at once
+MAX_VOICES = 8
+
+
+class Mixer():
+    """Decoded sounds, keyed by file name, and the channels that play them."""
+
+    chunks: dict
+
+    def __init__(self, file_names: Iterable[str]):
+        self.chunks = {}
+        for file_name in file_names:
+            chunk = sdlmixer.Mix_LoadWAV(os.fspath(get_path(file_name)).encode())
+            if not chunk:
+                logging.warning("Could not load sound %s: %s", file_name, sdlmixer.Mix_GetError())
+                continue
+            self.chunks[file_name] = chunk
+
+    def play(self, file_name: str):
+        chunk = self.chunks.get(file_name)
+        if chunk is None:
+            return
+        if sdlmixer.Mix_PlayChannel(-1, chunk, 0) == -1:
+            oldest = sdlmixer.Mix_GroupOldest(-1)
+            if oldest != -1:
+                sdlmixer.Mix_HaltChannel(oldest)
+                sdlmixer.Mix_PlayChannel(oldest, chunk, 0)
+
+    def close(self):
+        sdlmixer.Mix_HaltChannel(-1)
+        for chunk in self.chunks.values():
+            sdlmixer.Mix_FreeChunk(chunk)
+        self.chunks.clear()
+
+
+mixer: Optional[Mixer] = None
+
+
+def open_mixer(file_names: Iterable[str]) -> Optional[Mixer]:
+    """Open the audio device and decode every sound up front."""
+    global mixer
+    if mixer is not None:
+        return mixer
+    if sdlmixer is None:
+        logging.warning("SDL_mixer is not available; sound is off")
+        return None
+    if sdlmixer.Mix_OpenAudio(FREQUENCY, sdlmixer.MIX_DEFAULT_FORMAT, CHANNELS, CHUNK_SIZE) == -1:
+        logging.warning("Could not open the audio device: %s", sdlmixer.Mix_GetError())
+        return None
+    sdlmixer.Mix_AllocateChannels(MAX_VOICES)
+    mixer = Mixer(file_names)
+    logging.debug("SDL2 audio mixer initialized with %d sounds", len(mixer.chunks))
+    return mixer
+
+
+def close_mixer():
+    global mixer
+    if mixer is None:
+        return
+    mixer.close()
+    mixer = None
+    sdlmixer.Mix_CloseAudio()
+
+
+def play_sound(file_name: str):
+    if mixer is not None:
+        mixer.play(file_name)
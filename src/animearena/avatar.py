@@ -0,0 +1,165 @@
+"""Player avatars as compressed, content-addressed images.
+
+Avatars travel as WebP bytes (PNG where Pillow has no WebP support) and are
+named by the SHA-256 of those bytes. Match start pouches carry the name
+next to the bytes, so an opponent already seen is taken from the cache
+without decoding anything, and every avatar decoded is kept on disk:
+
+    code = encode_avatar(image)
+    image = load_avatar(avatar_hash(code), code)
+
+Nothing received is unpickled. Avatars uploaded by older clients are
+pickled dicts of raw pixels; those are read with an unpickler that refuses
+every global, so only plain containers can come out of them.
+"""
+import hashlib
+import io
+import logging
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image, features
+
+from animearena.catalog import CACHE_DIR
+
+AVATAR_DIR = CACHE_DIR / "avatars"
+AVATAR_SIZE = (100, 100)
+# Larger images are refused before their pixels are decoded.
+MAX_AVATAR_SIZE = (256, 256)
+AVATAR_FORMAT = "WEBP" if features.check("webp") else "PNG"
+AVATAR_QUALITY = 90
+# Marks the pouch's image mode field as holding an avatar hash rather than
+# the PIL mode of raw pixels.
+HASH_PREFIX = "sha256:"
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+_avatars: dict[str, Image.Image] = {}
+# The last image put in a pouch and its pouch fields
+_pouched: Optional[Tuple[Image.Image, Tuple[str, Tuple[int, int], bytes]]] = None
+
+
+def avatar_hash(code: bytes) -> str:
+    return hashlib.sha256(code).hexdigest()
+
+
+def encode_avatar(image: Image.Image) -> bytes:
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    out = io.BytesIO()
+    if AVATAR_FORMAT == "WEBP":
+        image.save(out, AVATAR_FORMAT, quality=AVATAR_QUALITY, method=6)
+    else:
+        image.save(out, AVATAR_FORMAT, optimize=True)
+    return out.getvalue()
+
+
+class _PlainUnpickler(pickle.Unpickler):
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"avatar pickles may not reference {module}.{name}")
+
+
+def read_legacy_avatar(code: bytes) -> Image.Image:
+    """An avatar uploaded by a client that pickled its raw pixels."""
+    try:
+        fields = _PlainUnpickler(io.BytesIO(code)).load()
+    except (pickle.UnpicklingError, EOFError) as e:
+        raise ValueError(f"unreadable legacy avatar: {e}") from e
+    if not isinstance(fields, dict):
+        raise ValueError("legacy avatar is not a dict")
+    mode, size, pixels = fields.get("mode"), fields.get("size"), fields.get("pixels")
+    if not isinstance(mode, str):
+        raise ValueError(f"legacy avatar mode {mode!r} is not a string")
+    if not (isinstance(size, (tuple, list)) and len(size) == 2
+            and all(type(side) is int for side in size)):
+        raise ValueError(f"legacy avatar size {size!r} is not a width and height")
+    if not isinstance(pixels, (bytes, bytearray)):
+        raise ValueError("legacy avatar pixels are not bytes")
+    return read_raw_avatar(mode, tuple(size), pixels)
+
+
+def read_raw_avatar(mode: str, size: Tuple[int, int], pixels: bytes) -> Image.Image:
+    check_size(size)
+    return Image.frombytes(mode, size, bytes(pixels))
+
+
+def check_size(size: Tuple[int, int]):
+    if not (0 < size[0] <= MAX_AVATAR_SIZE[0] and 0 < size[1] <= MAX_AVATAR_SIZE[1]):
+        raise ValueError(f"avatar size {size} is out of bounds")
+
+
+def decode_avatar(code: bytes) -> Image.Image:
+    """Decode avatar bytes, compressed or from an older client's pickle."""
+    if code[:1] == pickle.PROTO:
+        return read_legacy_avatar(code)
+    image = Image.open(io.BytesIO(code), formats=("WEBP", "PNG"))
+    check_size(image.size)
+    image.load()
+    return image
+
+
+def avatar_path(digest: str) -> Path:
+    return AVATAR_DIR / digest
+
+
+def read_cached_avatar(digest: str) -> Optional[Image.Image]:
+    try:
+        with open(avatar_path(digest), "rb") as f:
+            code = f.read()
+    except FileNotFoundError:
+        return None
+    if avatar_hash(code) != digest:
+        logging.warning("Discarding corrupt cached avatar %s", digest)
+        avatar_path(digest).unlink(missing_ok=True)
+        return None
+    return decode_avatar(code)
+
+
+def write_cached_avatar(digest: str, code: bytes):
+    path = avatar_path(digest)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(partial, "wb") as f:
+            f.write(code)
+        os.replace(partial, path)
+    except OSError as e:
+        logging.warning("Could not cache avatar %s: %s", digest, e)
+
+
+def load_avatar(digest: str, code: bytes = b"") -> Image.Image:
+    """The avatar with the given hash, from memory or the disk cache when
+    it has been seen before, otherwise decoded from code and cached."""
+    if not _DIGEST.fullmatch(digest):
+        raise ValueError(f"{digest!r} is not an avatar hash")
+    image = _avatars.get(digest)
+    if image is None:
+        image = read_cached_avatar(digest)
+    if image is None:
+        if avatar_hash(code) != digest:
+            raise ValueError(f"avatar bytes do not match hash {digest}")
+        image = decode_avatar(code)
+        write_cached_avatar(digest, code)
+    _avatars[digest] = image
+    return image
+
+
+def pouch_avatar(image: Image.Image) -> Tuple[str, Tuple[int, int], bytes]:
+    """The image mode, size and image fields of a player pouch. The player's
+    own avatar is only encoded again when it changes."""
+    global _pouched
+    if _pouched is None or _pouched[0] is not image:
+        code = encode_avatar(image)
+        _pouched = (image, (HASH_PREFIX + avatar_hash(code), image.size, code))
+    return _pouched[1]
+
+
+def read_pouch_avatar(image_mode: str, size: Tuple[int, int], code: bytes) -> Image.Image:
+    """The avatar in a received pouch. Pouches from older clients hold the
+    PIL mode and raw pixels instead of a hash and compressed bytes."""
+    if image_mode.startswith(HASH_PREFIX):
+        return load_avatar(image_mode[len(HASH_PREFIX):], bytes(code))
+    return read_raw_avatar(image_mode, size, code)
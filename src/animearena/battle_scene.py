@@ -19,7 +19,8 @@ from animearena.player import Player
 from animearena.character_manager import CharacterManager
 from animearena.animation import DisplayAnimation, FadeAnimation, HPBarAnimation, MovementAnimation, ShakeAnimation, SizeAnimation, SplitAnimation, create_pulse_animation, JoinAnimation
 from random import randint
-from playsound import playsound
+from animearena.audio import play_sound
+from animearena.profiling import PROFILE_DIR, profiler, timed
 from pathlib import Path
 from typing import Optional
 import typing
@@ -31,7 +32,10 @@ from animearena.color import *
 from animearena.text_formatter import get_font_height, get_lines, get_string_width
 
 import random
+import time
 if typing.TYPE_CHECKING:
+    from animearena.practice import PracticeOpponent
+    from animearena.recording import MatchRecorder
     from animearena.scene_manager import SceneManager
 
 FONTSIZE = 16
@@ -41,11 +45,7 @@ MESSAGE_FONTSIZE = 35
 LARGE_STACK_FONTSIZE = 20
 HUGE_STACK_FONTSIZE = 16
 TIMER_FONTSIZE = 100
-
-def play_sound(file_name: str):
-    # with importlib.resources.path('animearena.resources', file_name) as path:
-    #     playsound(str(path), False)
-    pass
+REPLAY_DIR = Path("replays")
 
 
 
@@ -252,6 +252,15 @@ class BattleScene(engine.Scene):
     d20: random.Random
     collapsing_ally_inviolate_shield: bool
     collapsing_enemy_inviolate_shield: bool
+    headless: bool = False
+    recorder: Optional["MatchRecorder"] = None
+    # Stands in for the server in a local practice match
+    practice: Optional["PracticeOpponent"] = None
+
+    @property
+    def opponent(self):
+        """Where the match's packets go: the server, or the practice opponent."""
+        return self.practice or self.scene_manager.connection
     
     @property
     def pteam(self):
@@ -267,41 +276,11 @@ class BattleScene(engine.Scene):
 
     def __init__(self, scene_manager, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.stored_effect_animations = list()
-        self.dying_to_doping = False
-        self.catching_up = False
-        self.collapsing_ally_inviolate_shield = False
-        self.collapsing_enemy_inviolate_shield = False
-        self.d20 = random.Random()
-        self.execution_animations = list()
-        self.ability_messages = list()
-        self.timer = TurnTimer(1, self.empty_placeholder)
-        self.random_spent = [0, 0, 0, 0]
-        self.window_closing = False
-        self.waiting_for_turn = True
-        self.first_turn = True
-        self.execution_order = list()
-        self.dragging_order_button = False
-        self.dragging_button = False
-        self.cont_list = list()
-        self.acting_order = list()
-        self.cont_storage = dict()
-        self.target_clicked = False
-        self.sharingan_reflecting = False
-        self.sharingan_reflector = None
-        self.sharingan_reflected_effects = []
-        self.sharingan_reflected_effect_ticking = False
-        self.triggering_stack_print = False
-        self.stacks_to_print = 0
         self.scene_manager = scene_manager
-        self.ally_managers = []
-        self.enemy_managers = []
-        self.missions_to_check = []
-        self.round_any_cost = 0
-        self.current_button = None
+        self.init_battle_state()
+        self.timer = TurnTimer(1, self.empty_placeholder)
         self.player_display = ActiveTeamDisplay(self)
         self.enemy_display = EnemyTeamDisplay(self)
-        self.moving_first = False
         self.font = init_font(FONTSIZE)
         self.cooldown_font = init_font(COOLDOWN_FONTSIZE)
         self.stack_font = init_font(STACK_FONTSIZE)
@@ -309,23 +288,6 @@ class BattleScene(engine.Scene):
         self.huge_stack_font = init_font(HUGE_STACK_FONTSIZE)
         self.timer_font = init_font(TIMER_FONTSIZE)
         self.message_font = init_font(MESSAGE_FONTSIZE)
-        self.selected_ability = None
-        self.acting_character = None
-        self.exchanging_energy = False
-        self.has_exchanged = False
-        self.clicked_surrender = False
-        self.traded_away_energy = 5
-        self.traded_for_energy = 5
-        self.enemy_detail_character = None
-        self.enemy_detail_ability = None
-        self.active_effect_buttons = list()
-        self.offered_pool = {
-            Energy.PHYSICAL: 0,
-            Energy.SPECIAL: 0,
-            Energy.MENTAL: 0,
-            Energy.WEAPON: 0,
-            Energy.RANDOM: 0
-        }
         self.turn_end_button = self.ui_factory.from_surface(
             sdl2.ext.BUTTON,
             self.get_scaled_surface(self.scene_manager.surfaces["end"],
@@ -367,13 +329,65 @@ class BattleScene(engine.Scene):
         self.surrender_button_region = self.region.subregion(725, 625, 0, 0)
         self.enemy_info_region = self.region.subregion(5, 578, 670, 120)
         self.hover_effect_region = self.region.subregion(0, 0, 0, 0)
+        self.drawn_hover = None
         self.game_end_region = self.region.subregion(50, 110, 800, 480)
         self.timer_region = self.region.subregion(x=269, y=95, width=362, height=12)
+        self.drawn_time_left = None
         self.energy_region = self.region.subregion(x=300,
                                                    y=60,
                                                    width=300,
                                                    height=30)
-        self.animation_region = engine.Region(0, 0, 0, 0)
+        self.animation_region = engine.Region(0, 0, 0, 0, self.damage)
+
+    def init_battle_state(self):
+        self.stored_effect_animations = list()
+        self.dying_to_doping = False
+        self.catching_up = False
+        self.collapsing_ally_inviolate_shield = False
+        self.collapsing_enemy_inviolate_shield = False
+        self.d20 = random.Random()
+        self.execution_animations = list()
+        self.ability_messages = list()
+        self.random_spent = [0, 0, 0, 0]
+        self.window_closing = False
+        self.waiting_for_turn = True
+        self.first_turn = True
+        self.execution_order = list()
+        self.dragging_order_button = False
+        self.dragging_button = False
+        self.cont_list = list()
+        self.acting_order = list()
+        self.cont_storage = dict()
+        self.target_clicked = False
+        self.sharingan_reflecting = False
+        self.sharingan_reflector = None
+        self.sharingan_reflected_effects = []
+        self.sharingan_reflected_effect_ticking = False
+        self.triggering_stack_print = False
+        self.stacks_to_print = 0
+        self.ally_managers = []
+        self.enemy_managers = []
+        self.missions_to_check = []
+        self.round_any_cost = 0
+        self.current_button = None
+        self.moving_first = False
+        self.selected_ability = None
+        self.acting_character = None
+        self.exchanging_energy = False
+        self.has_exchanged = False
+        self.clicked_surrender = False
+        self.traded_away_energy = 5
+        self.traded_for_energy = 5
+        self.enemy_detail_character = None
+        self.enemy_detail_ability = None
+        self.active_effect_buttons = list()
+        self.offered_pool = {
+            Energy.PHYSICAL: 0,
+            Energy.SPECIAL: 0,
+            Energy.MENTAL: 0,
+            Energy.WEAPON: 0,
+            Energy.RANDOM: 0
+        }
 
     #region On-Click event handlers
 
@@ -397,7 +411,7 @@ class BattleScene(engine.Scene):
             (self.window_up and self.exchanging_energy)):
             play_sound(self.scene_manager.sounds["click"])
             self.clicked_surrender = True
-            self.scene_manager.connection.send_surrender(
+            self.opponent.send_surrender(
                 self.get_enemy_mission_progress_packages())
             self.lose_game()
 
@@ -444,7 +458,10 @@ class BattleScene(engine.Scene):
                 self.random_spent[attr] = i
             self.offered_pool[attr] = 0
         
-        self.scene_manager.connection.send_match_communication(
+        if self.recorder:
+            self.recorder.record_player_turn(self.ability_messages, self.execution_order,
+                                             self.random_spent, self.player_display.team.energy_pool)
+        self.opponent.send_match_communication(
                     self.ability_messages, self.execution_order, self.random_spent)
         self.ability_messages.clear()
         self.random_spent = [0, 0, 0, 0]
@@ -551,6 +568,10 @@ class BattleScene(engine.Scene):
             self.update_energy_region()
 
     def show_hover_text(self):
+        hover = (self.current_button, engine.get_mouse_position())
+        if hover == self.drawn_hover and (self.current_button is None) == self.hover_effect_region.is_empty():
+            return
+        self.drawn_hover = hover
         self.hover_effect_region.clear()
         if self.current_button is not None:
 
@@ -632,6 +653,10 @@ class BattleScene(engine.Scene):
     #region Rendering functions
 
     def full_update(self):
+        if self.catching_up:
+            for manager in self.pteam:
+                manager.update_state()
+            return
         self.region.clear()
         self.region.add_sprite(self.background, 0, 0)
 
@@ -648,13 +673,17 @@ class BattleScene(engine.Scene):
         self.draw_enemy_info_region()
 
     def draw_timer_region(self):
+        time_left = self.timer.time_left if self.timer else 0
+        if time_left == self.drawn_time_left and not self.timer_region.is_empty():
+            return
+        self.drawn_time_left = time_left
         self.timer_region.clear()
         bar_height = self.timer_region.size()[1] - 2
         bar_width = self.timer_region.size()[0] - 2
         self.timer_region.add_sprite(self.sprite_factory.from_color(AQUA, size=(self.timer_region.size())), 0, 0)
         self.timer_region.add_sprite(self.sprite_factory.from_color(MENU_TRANSPARENT, size=(bar_width, bar_height)), 1, 1)
-        if self.timer and self.timer.time_left > 0:
-            self.timer_region.add_sprite(self.sprite_factory.from_color(DULL_AQUA, size=(self.timer.time_left * 4, bar_height)), 1, 1)
+        if time_left > 0:
+            self.timer_region.add_sprite(self.sprite_factory.from_color(DULL_AQUA, size=(time_left * 4, bar_height)), 1, 1)
 
     def draw_enemy_info_region(self):
         self.enemy_info_region.clear()
@@ -1010,18 +1039,31 @@ class BattleScene(engine.Scene):
             self.full_update()
         else:
             self.waiting_for_turn = True
-            if first_turn:
-                self.player_catchup_execution(stored_turns, execution_order, energy_pools, all_random_expenditure, time_remaining)
+            player_turn = self.fast_forward(first_turn, stored_turns, execution_order, energy_pools, all_random_expenditure)
+            self.catching_up = False
+            self.timer = self.start_timer(time_remaining)
+            if player_turn:
+                self.waiting_for_turn = False
+                self.full_update()
+
+    def fast_forward(self, player_turn: bool, stored_turns: list[list["AbilityMessage"]], execution_order: list[list[int]],
+                     energy_pools: list[list[int]], all_random_expenditure: list[list[int]]) -> bool:
+        """Replay stored turns in order, alternating sides, without drawing.
+
+        Returns whether the player moves next."""
+        pools = iter(energy_pools)
+        for turn, order, random_spent in zip(stored_turns, execution_order, all_random_expenditure):
+            if player_turn:
+                self.replay_player_turn(turn, order, random_spent)
             else:
-                self.enemy_catchup_execution(stored_turns, execution_order, energy_pools, all_random_expenditure, time_remaining)
-
-    def player_catchup_execution(self, stored_turns: list[list["AbilityMessage"]], execution_order: list[list[int]], energy_pools: list[list[int]], all_random_expenditure: list[list[int]], time_remaining: int):
-        current_turn = stored_turns[0]
-        stored_turns = stored_turns[1:]
-        current_execution_order = execution_order[0]
-        execution_order = execution_order[1:]
-        current_random_expenditure = all_random_expenditure[0]
-        all_random_expenditure = all_random_expenditure[1:]
+                self.enemy_execution_loop(turn, order, next(pools))
+            player_turn = not player_turn
+        return player_turn
+
+    def replay_player_turn(self, current_turn: list["AbilityMessage"], current_execution_order: list[int], current_random_expenditure: list[int]):
+        if self.recorder:
+            self.recorder.record_player_turn(current_turn, current_execution_order, current_random_expenditure,
+                                             self.confirmed_pool(current_turn, current_random_expenditure))
         for ability in current_turn:
             
             self.pteam[ability.user_id].acted = True
@@ -1070,12 +1112,18 @@ class BattleScene(engine.Scene):
 
 
         self.turn_end()
-        #TODO if stored_turns still has turns left, activate enemy_catchup_execution, else set player state to waiting
-        if stored_turns:
-            self.enemy_catchup_execution(stored_turns, execution_order, energy_pools, all_random_expenditure, time_remaining)
-        else:
-            self.catching_up = False
-            self.timer = self.start_timer(time_remaining)
+
+    def confirmed_pool(self, current_turn: list["AbilityMessage"], random_spent: list[int]) -> dict[Energy, int]:
+        """The energy pool a stored turn was confirmed with: the pool before it,
+        less the costs of its abilities and the random energy it spent."""
+        pool = {Energy(i): self.player_display.team.energy_pool[i] for i in range(5)}
+        costs = [self.pteam[ability.user_id].source.current_abilities[ability.ability_id].cost
+                 for ability in current_turn]
+        for i in range(4):
+            spent = sum(cost[i] for cost in costs) + random_spent[i]
+            pool[Energy(i)] -= spent
+            pool[Energy.RANDOM] -= spent
+        return pool
 
     def execution_loop(self):
         
@@ -1090,28 +1138,6 @@ class BattleScene(engine.Scene):
         
         self.turn_end()
 
-    def enemy_catchup_execution(self, stored_turns: list[list["AbilityMessage"]], execution_order: list[list[int]], energy_pools: list[list[int]], all_random_expenditure: list[list[int]], time_remaining: int):
-        current_turn = stored_turns[0]
-        stored_turns = stored_turns[1:]
-        this_turn_pool = energy_pools[0]
-        energy_pools = energy_pools[1:]
-        current_execution_order = execution_order[0]
-        execution_order = execution_order[1:]
-    
-        all_random_expenditure = all_random_expenditure[1:]
-        #TODO Execute all abilities in current_turn
-        self.enemy_execution_loop(current_turn, current_execution_order, this_turn_pool)
-
-        #TODO if stored_turns still has turns left, and activate player_catchup_execution,
-        #else set player state to active
-        if stored_turns:
-            self.player_catchup_execution(stored_turns, execution_order, energy_pools, all_random_expenditure, time_remaining)
-        else:
-            self.timer = self.start_timer(time_remaining)
-            self.waiting_for_turn = False
-            self.catching_up = False
-            self.full_update()
-
     def get_hp_bar_animation_splitter(self, ally = True):
         if not ally:
             func = self.pump_enemy_execution_order
@@ -1433,6 +1459,8 @@ class BattleScene(engine.Scene):
         self.get_execution_order_base("enemy")
         if not timeout:
             self.execution_order = execution_order
+        if self.recorder:
+            self.recorder.record_enemy_turn(executed_abilities, self.execution_order, potential_energy)
         for action in self.execution_order:
             
             if action < 3:
@@ -1479,6 +1507,8 @@ class BattleScene(engine.Scene):
         self.get_execution_order_base("enemy")
         if not timeout:
             self.execution_order = execution_order
+        if self.recorder:
+            self.recorder.record_enemy_turn(executed_abilities, self.execution_order, potential_energy)
         self.pump_enemy_execution_order()
                 
     def finish_turn_start(self):
@@ -1579,6 +1609,10 @@ class BattleScene(engine.Scene):
         #     resolve continuous effects
         #
         
+        if self.recorder:
+            self.recorder.record_timeout([AbilityMessage(manager) for manager in self.acting_order
+                                          if manager.acted],
+                                         self.player_display.team.energy_pool)
         self.get_execution_order_base("ally")
         
         if self.skipping_animations:
@@ -1618,6 +1652,7 @@ class BattleScene(engine.Scene):
                 ability.cooldown_remaining = max(
                     ability.cooldown_remaining - 1, 0)
     
+    @timed(label=lambda self, timeout=False: "/".join(manager.source.name for manager in self.pteam))
     def turn_end(self, timeout=False):
         self.sharingan_reflecting = False
         self.sharingan_reflector = None
@@ -1716,7 +1751,8 @@ class BattleScene(engine.Scene):
 
         
         
-        self.timer = self.start_timer()
+        if not self.catching_up:
+            self.timer = self.start_timer()
         
         self.full_update()
 
@@ -1741,341 +1777,249 @@ class BattleScene(engine.Scene):
                 total_pool[i] += v
         return total_pool
 
+    @timed(label=lambda self, enemy_tick=False: "enemy" if enemy_tick else "ally")
     def tick_effect_duration(self, enemy_tick: bool = False):
         player_team = self.player_display.team.character_managers
         enemy_team = self.enemy_display.team.character_managers
         for i, manager in enumerate(player_team):
             for eff in manager.source.current_effects:
-                eff.check_waiting()
-                if not enemy_tick:
-                    #region Spend Turn Under Effect Mission Check
-                    if not eff.eff_type == EffectType.SYSTEM:
-                        #region Spend Enemy Turn Under Effect
-                        if eff.name == "Tsukuyomi" and eff.eff_type == EffectType.ALL_STUN:
-                            if manager.is_stunned():
-                                eff.user.progress_mission(2, 1)
-                        if eff.name == "Alaudi's Handcuffs" and eff.eff_type == EffectType.ALL_STUN:
-                            if manager.is_stunned():
-                                eff.user.progress_mission(4, 1)
-                        #endregion
-                        if eff.name == "Active Combat Mode" and eff.eff_type == EffectType.CONT_DEST_DEF:
-                            eff.user.progress_mission(2, 1)
-                        if eff.name == "Dive":
-                            eff.user.progress_mission(4, 1)
-                        if eff.name == "Ally Mobilization":
-                            eff.user.progress_mission(2, 1)
-                        if eff.name == "Loyal Guard" and manager.check_invuln(
-                        ):
-                            manager.progress_mission(3, 1)
-                        if eff.name == "Fog of London" and eff.eff_type == EffectType.MARK and not eff.user.has_effect(
-                                EffectType.SYSTEM, "JackMission5Success"):
-                            if not eff.user.has_effect(EffectType.SYSTEM,
-                                                       "JackMission5Tracker"):
-                                eff.user.add_effect(
-                                    Effect("JackMission5Tracker",
-                                           EffectType.SYSTEM,
-                                           eff.user,
-                                           280000,
-                                           lambda eff: "",
-                                           mag=0,
-                                           system=True))
-                            else:
-                                eff.user.get_effect(
-                                    EffectType.SYSTEM,
-                                    "JackMission5Tracker").alter_mag(1)
-                                if eff.user.get_effect(
-                                        EffectType.SYSTEM,
-                                        "JackMission5Tracker").mag >= 10:
-                                    eff.user.add_effect(
-                                        Effect("JackMission5Success",
-                                               EffectType.SYSTEM,
-                                               eff.user,
-                                               280000,
-                                               lambda eff: "",
-                                               system=True))
-                                    eff.user.remove_effect(eff.user.get_effect(
-                                        EffectType.SYSTEM,
-                                        "JackMission5Tracker"))
-                        if eff.name == "Shadow Clones" and eff.eff_type == EffectType.ALL_DR:
-                            eff.user.progress_mission(1, 1)
-                        if eff.name == "Asari Ugetsu" and eff.eff_type == EffectType.ALL_DR:
-                            eff.user.progress_mission(5, 1)
-                        if eff.name == "Flying Raijin" and eff.eff_type == EffectType.ALL_INVULN:
-                            eff.user.progress_mission(5, 1)
-                        if eff.name == "Kamui" and eff.eff_type == EffectType.IGNORE:
-                            eff.user.progress_mission(5, 1)
-                        if eff.name == "Ice, Make Unlimited":
-                            eff.user.progress_mission(1, 1)
-                        if eff.name == "Summon Gyudon" and eff.eff_type == EffectType.MARK:
-                            eff.user.progress_mission(5, 1)
-
-                #endregion
-                if eff.eff_type == EffectType.CONSECUTIVE_TRACKER:
-                    if not manager.has_effect(EffectType.CONSECUTIVE_BUFFER,
-                                              eff.name):
-                        eff.removing = True
-                eff.tick_duration()
-                #Effects that trigger upon ending
-
-                if eff.duration == 0:
-
-                    if eff.name == "Bridal Chest":
-                        if eff.user.has_effect(EffectType.SYSTEM, "FrankensteinMission2Counter"):
-                            eff.user.remove_effect(eff.user.get_effect(EffectType.SYSTEM, "FrankensteinMission2Counter"))
-
-                    if eff.name == "Lightning Palm" or eff.name == "Narukami" or eff.name == "Whirlwind Rush":
-                        if not eff.user.has_effect(EffectType.SYSTEM,
-                                                   "KilluaMission5Tracker"):
-                            eff.user.add_effect(
-                                Effect("KilluaMission5Failure",
-                                       EffectType.SYSTEM,
-                                       eff.user,
-                                       280000,
-                                       lambda eff: "",
-                                       system=True))
-
-                    if eff.name == "Quirk - Transform":
-                        manager.toga_flush_effects()
-                        manager.toga_transform("toga")
-
-                    if eff.name == "Bunny Assault" and eff.eff_type == EffectType.CONT_USE:
-                        if manager.has_effect(EffectType.DEST_DEF,
-                                              "Perfect Paper - Rampage Suit"):
-                            manager.get_effect(
-                                EffectType.DEST_DEF,
-                                "Perfect Paper - Rampage Suit").alter_dest_def(
-                                    30)
-                            manager.progress_mission(3, 20)
-                    if eff.name == "Thunder Palace":
-                        for enemy in self.enemy_display.team.character_managers:
-                            if enemy.final_can_effect(
-                                    manager.check_bypass_effects()):
-                                eff.user.deal_eff_damage(40, enemy, eff, DamageType.NORMAL)
-                    if eff.name == "Lightning Dragon's Roar":
-                        manager.add_effect(
-                            Effect(Ability("laxus2"),
-                                   EffectType.ALL_DR,
-                                   eff.user,
-                                   2,
-                                   lambda eff:
-                                   "This character will take 10 more damage.",
-                                   mag=-10))
-                    if eff.name == "Mahapadma" and eff.eff_type == EffectType.MARK:
-                        manager.add_effect(
-                            Effect(Ability("esdeathalt1"), EffectType.ALL_STUN,
-                                   manager, 5,
-                                   lambda eff: "Esdeath is stunned."))
-                    if eff.name == "Quickdraw - Rifle" and eff.eff_type == EffectType.CONT_USE:
-                        manager.full_remove_effect("Quickdraw - Rifle",
-                                                   manager)
-                        manager.add_effect(
-                            Effect(
-                                Ability("cmaryalt2"),
-                                EffectType.ABILITY_SWAP,
-                                manager,
-                                280000,
-                                lambda eff:
-                                "Quickdraw - Rifle has been replaced by Quickdraw - Sniper",
-                                mag=12))
-                    if eff.name == "Illusory Breakdown" and eff.mag > 0:
-                        for emanager in enemy_team:
-                            if emanager.has_effect(
-                                    EffectType.MARK, "Illusory Breakdown"
-                            ) and emanager.get_effect(
-                                    EffectType.MARK,
-                                    "Illusory Breakdown").user == manager:
-                                if emanager.final_can_effect(
-                                        manager.check_bypass_effects()):
-                                    manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
-                                    emanager.add_effect(
-                                        Effect(
-                                            Ability("chrome2"),
-                                            EffectType.ALL_STUN, manager, 2,
-                                            lambda eff:
-                                            "This character is stunned."))
-                                    if emanager.meets_stun_check():
-                                        manager.check_on_stun(emanager)
-                    if eff.name == "Mental Immolation" and eff.mag > 0:
-                        for emanager in enemy_team:
-                            if emanager.has_effect(
-                                    EffectType.MARK, "Mental Immolation"
-                            ) and emanager.get_effect(
-                                    EffectType.MARK,
-                                    "Mental Immolation").user == manager:
-                                if emanager.final_can_effect(
-                                        manager.check_bypass_effects()):
-                                    manager.deal_eff_damage(25, emanager, eff, DamageType.NORMAL)
-                                    eff.user.progress_mission(3, 1)
-                                    emanager.source.energy_contribution -= 1
-                                    manager.check_on_drain(emanager)
-                    if eff.name == "Mental Annihilation" and eff.mag > 0:
-                        for emanager in enemy_team:
-                            if emanager.has_effect(
-                                    EffectType.MARK, "Mental Annihilation"
-                            ) and emanager.get_effect(
-                                    EffectType.MARK,
-                                    "Mental Annihilation").user == manager:
-                                if emanager.final_can_effect("BYPASS"):
-                                    manager.deal_eff_damage(45, emanager, eff, DamageType.NORMAL)
-                    if eff.name == "Illusory World Destruction" and eff.mag > 0:
-                        for emanager in enemy_team:
-                            if emanager.final_can_effect(
-                                    manager.check_bypass_effects()):
-                                manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
-                                emanager.add_effect(
-                                    Effect(
-                                        Ability("chromealt2"),
-                                        EffectType.ALL_STUN, manager, 2, lambda
-                                        eff: "This character is stunned."))
-                                if emanager.meets_stun_check():
-                                    manager.check_on_stun(emanager)
-                    if not manager.has_effect(
-                            EffectType.INVIS_END,
-                            eff.name) and eff.invisible == True:
-                        manager.add_effect(
-                            Effect(eff.source, EffectType.INVIS_END, eff.user,
-                                   2, lambda eff: f"{eff.name} has ended."))
-            new_list = [
-                eff for eff in manager.source.current_effects
-                if eff.duration > 0 and not eff.removing
-            ]
-
-            manager.source.current_effects = new_list
+                self.tick_ally_effect(manager, eff, enemy_team, enemy_tick)
+            manager.source.current_effects.retain(
+                lambda eff: eff.duration > 0 and not eff.removing)
 
         for i, manager in enumerate(enemy_team):
             for eff in manager.source.current_effects:
-                eff.check_waiting()
-                eff.tick_duration()
-                if eff.name == "Consecutive Normal Punches":
-                    if manager.has_effect(
-                            EffectType.SYSTEM, "SaitamaMission2Tracker"
-                    ) and not eff.user.source.mission2complete:
-                        manager.get_effect(
-                            EffectType.SYSTEM,
-                            "SaitamaMission2Tracker").alter_mag(1)
-                        if manager.get_effect(
-                                EffectType.SYSTEM,
-                                "SaitamaMission2Tracker").mag >= 7:
-                            eff.user.source.mission2complete = True
-                            eff.user.progress_mission(2, 1)
-                        else:
-                            manager.get_effect(
-                                EffectType.SYSTEM,
-                                "SaitamaMission2Tracker").duration += 2
-                if eff.duration == 0:
-                    if eff.invisible and not manager.has_effect(
-                            EffectType.INVIS_END, eff.name):
-                        manager.add_effect(
-                            Effect(eff.source, EffectType.INVIS_END, eff.user,
-                                   2, lambda eff: f"{eff.name} has ended."))
-                    if eff.name == "In The Name Of Ruler!" and eff.eff_type == EffectType.ALL_STUN:
-                        eff.user.progress_mission(1, 1)
-                    if eff.name == "Quirk - Transform":
-                        manager.toga_flush_effects()
-                        manager.toga_transform("toga")    
-                    if eff.name == "Bunny Assault" and eff.eff_type == EffectType.CONT_USE:
-                        if manager.has_effect(EffectType.DEST_DEF,
-                                              "Perfect Paper - Rampage Suit"):
-                            manager.get_effect(
-                                EffectType.DEST_DEF,
-                                "Perfect Paper - Rampage Suit").alter_dest_def(
-                                    30)
-                            manager.progress_mission(3, 20)
-                    if eff.name == "Thunder Palace":
-                        for enemy in self.pteam:
-                            if enemy.final_can_effect(
-                                    manager.check_bypass_effects()):
-                                eff.user.deal_eff_damage(40, enemy, eff, DamageType.NORMAL)
-                    if eff.name == "Hidden Mine" and eff.eff_Type == EffectType.UNIQUE:
-                        eff.user.progress_mission(5, 1)
-                    if eff.name == "Illusory Disorientation":
-                        eff.user.progress_mission(5, 1)
-                    if eff.name == "Mahapadma" and eff.eff_type == EffectType.MARK:
-                        manager.add_effect(
-                            Effect(Ability("esdeathalt1"), EffectType.ALL_STUN,
-                                   manager, 5,
-                                   lambda eff: "Esdeath is stunned."))
-                    if eff.name == "Lightning Dragon's Roar":
-                        manager.add_effect(
-                            Effect(Ability("laxus2"),
-                                   EffectType.ALL_DR,
-                                   eff.user,
-                                   2,
-                                   lambda eff:
-                                   "This character will take 10 more damage.",
-                                   mag=-10))
-                    if eff.name == "Illusory Breakdown" and eff.mag > 0:
-                        for emanager in self.pteam:
-                            if emanager.has_effect(
-                                    EffectType.SYSTEM, "Chrome1Target"
-                            ) and emanager.get_effect(
-                                    EffectType.SYSTEM, "Chrome1Target").user == manager:
-                                if emanager.final_can_effect(
-                                        manager.check_bypass_effects()):
-                                    manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
-                                    emanager.add_effect(
-                                        Effect(
-                                            Ability("chrome2"),
-                                            EffectType.ALL_STUN, manager, 2,
-                                            lambda eff:
-                                            "This character is stunned."))
-                                    if emanager.meets_stun_check():
-                                        manager.check_on_stun(emanager)
-                    if eff.name == "Mental Immolation" and eff.mag > 0:
-                        for emanager in self.pteam:
-                            if emanager.has_effect(
-                                    EffectType.SYSTEM, "Chrome2Target"
-                            ) and emanager.get_effect(
-                                    EffectType.SYSTEM, "Chrome2Target").user == manager:
-                                if emanager.final_can_effect(
-                                        manager.check_bypass_effects()):
-                                    manager.deal_eff_damage(25, emanager, eff, DamageType.NORMAL)
-                                    eff.user.progress_mission(3, 1)
-                                    emanager.source.energy_contribution -= 1
-                                    manager.check_on_drain(emanager)
-                    if eff.name == "Mental Annihilation" and eff.mag > 0:
-                        for emanager in self.pteam:
-                            if emanager.has_effect(
-                                    EffectType.SYSTEM, "MukuroTarget"
-                            ) and emanager.get_effect(
-                                    EffectType.SYSTEM, "MukuroTarget").user == manager:
-                                if emanager.final_can_effect("BYPASS"):
-                                    manager.deal_eff_damage(45, emanager, eff, DamageType.NORMAL)
-                    if eff.name == "Illusory World Destruction" and eff.mag > 0:
-                        for emanager in self.pteam:
-                            if emanager.final_can_effect(
-                                    manager.check_bypass_effects()):
-                                manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
-                                emanager.add_effect(
-                                    Effect(
-                                        Ability("chromealt2"),
-                                        EffectType.ALL_STUN, manager, 2, lambda
-                                        eff: "This character is stunned."))
-                                if emanager.meets_stun_check():
-                                    manager.check_on_stun(emanager)
-                    if eff.name == "Quickdraw - Rifle" and eff.eff_type == EffectType.CONT_USE:
-                        manager.full_remove_effect("Quickdraw - Rifle",
-                                                   manager)
-                        manager.add_effect(
-                            Effect(
-                                Ability("cmaryalt2"),
-                                EffectType.ABILITY_SWAP,
-                                manager,
-                                280000,
-                                lambda eff:
-                                "Quickdraw - Rifle has been replaced by Quickdraw - Sniper",
-                                mag=12))
-            new_list = [
-                eff for eff in manager.source.current_effects
-                if eff.duration > 0 and not eff.removing
-            ]
-            manager.source.current_effects = new_list
+                self.tick_enemy_effect(manager, eff)
+            manager.source.current_effects.retain(
+                lambda eff: eff.duration > 0 and not eff.removing)
         new_reflected_list = [
             eff for eff in self.sharingan_reflected_effects
             if eff.duration > 0 and not eff.removing
         ]
         self.sharingan_reflected_effects = new_reflected_list
 
+    @timed("tick_effect", label=lambda self, manager, eff, *args: f"{manager.source.name}/{eff.name}")
+    def tick_ally_effect(self, manager: CharacterManager, eff: Effect,
+                         enemy_team: list[CharacterManager], enemy_tick: bool):
+        eff.check_waiting()
+        if not enemy_tick and eff.eff_type != EffectType.SYSTEM:
+            MissionHandler.handle_effect_mission(eff, manager, "tick")
+        if eff.eff_type == EffectType.CONSECUTIVE_TRACKER:
+            if not manager.has_effect(EffectType.CONSECUTIVE_BUFFER,
+                                      eff.name):
+                eff.removing = True
+        eff.tick_duration()
+        #Effects that trigger upon ending
+
+        if eff.duration == 0:
+            MissionHandler.handle_effect_mission(eff, manager, "expire")
+
+            if eff.name == "Quirk - Transform":
+                manager.toga_flush_effects()
+                manager.toga_transform("toga")
+
+            if eff.name == "Bunny Assault" and eff.eff_type == EffectType.CONT_USE:
+                if manager.has_effect(EffectType.DEST_DEF,
+                                      "Perfect Paper - Rampage Suit"):
+                    manager.get_effect(
+                        EffectType.DEST_DEF,
+                        "Perfect Paper - Rampage Suit").alter_dest_def(
+                            30)
+                    manager.progress_mission(3, 20)
+            if eff.name == "Thunder Palace":
+                for enemy in self.enemy_display.team.character_managers:
+                    if enemy.final_can_effect(
+                            manager.check_bypass_effects()):
+                        eff.user.deal_eff_damage(40, enemy, eff, DamageType.NORMAL)
+            if eff.name == "Lightning Dragon's Roar":
+                manager.add_effect(
+                    Effect(Ability("laxus2"),
+                           EffectType.ALL_DR,
+                           eff.user,
+                           2,
+                           lambda eff:
+                           "This character will take 10 more damage.",
+                           mag=-10))
+            if eff.name == "Mahapadma" and eff.eff_type == EffectType.MARK:
+                manager.add_effect(
+                    Effect(Ability("esdeathalt1"), EffectType.ALL_STUN,
+                           manager, 5,
+                           lambda eff: "Esdeath is stunned."))
+            if eff.name == "Quickdraw - Rifle" and eff.eff_type == EffectType.CONT_USE:
+                manager.full_remove_effect("Quickdraw - Rifle",
+                                           manager)
+                manager.add_effect(
+                    Effect(
+                        Ability("cmaryalt2"),
+                        EffectType.ABILITY_SWAP,
+                        manager,
+                        280000,
+                        lambda eff:
+                        "Quickdraw - Rifle has been replaced by Quickdraw - Sniper",
+                        mag=12))
+            if eff.name == "Illusory Breakdown" and eff.mag > 0:
+                for emanager in enemy_team:
+                    if emanager.has_effect(
+                            EffectType.MARK, "Illusory Breakdown"
+                    ) and emanager.get_effect(
+                            EffectType.MARK,
+                            "Illusory Breakdown").user == manager:
+                        if emanager.final_can_effect(
+                                manager.check_bypass_effects()):
+                            manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
+                            emanager.add_effect(
+                                Effect(
+                                    Ability("chrome2"),
+                                    EffectType.ALL_STUN, manager, 2,
+                                    lambda eff:
+                                    "This character is stunned."))
+                            if emanager.meets_stun_check():
+                                manager.check_on_stun(emanager)
+            if eff.name == "Mental Immolation" and eff.mag > 0:
+                for emanager in enemy_team:
+                    if emanager.has_effect(
+                            EffectType.MARK, "Mental Immolation"
+                    ) and emanager.get_effect(
+                            EffectType.MARK,
+                            "Mental Immolation").user == manager:
+                        if emanager.final_can_effect(
+                                manager.check_bypass_effects()):
+                            manager.deal_eff_damage(25, emanager, eff, DamageType.NORMAL)
+                            eff.user.progress_mission(3, 1)
+                            emanager.source.energy_contribution -= 1
+                            manager.check_on_drain(emanager)
+            if eff.name == "Mental Annihilation" and eff.mag > 0:
+                for emanager in enemy_team:
+                    if emanager.has_effect(
+                            EffectType.MARK, "Mental Annihilation"
+                    ) and emanager.get_effect(
+                            EffectType.MARK,
+                            "Mental Annihilation").user == manager:
+                        if emanager.final_can_effect("BYPASS"):
+                            manager.deal_eff_damage(45, emanager, eff, DamageType.NORMAL)
+            if eff.name == "Illusory World Destruction" and eff.mag > 0:
+                for emanager in enemy_team:
+                    if emanager.final_can_effect(
+                            manager.check_bypass_effects()):
+                        manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
+                        emanager.add_effect(
+                            Effect(
+                                Ability("chromealt2"),
+                                EffectType.ALL_STUN, manager, 2, lambda
+                                eff: "This character is stunned."))
+                        if emanager.meets_stun_check():
+                            manager.check_on_stun(emanager)
+            if not manager.has_effect(
+                    EffectType.INVIS_END,
+                    eff.name) and eff.invisible == True:
+                manager.add_effect(
+                    Effect(eff.source, EffectType.INVIS_END, eff.user,
+                           2, lambda eff: f"{eff.name} has ended."))
+
+    @timed("tick_effect", label=lambda self, manager, eff, *args: f"{manager.source.name}/{eff.name}")
+    def tick_enemy_effect(self, manager: CharacterManager, eff: Effect):
+        eff.check_waiting()
+        eff.tick_duration()
+        MissionHandler.handle_effect_mission(eff, manager, "enemy_tick")
+        if eff.duration == 0:
+            if eff.invisible and not manager.has_effect(
+                    EffectType.INVIS_END, eff.name):
+                manager.add_effect(
+                    Effect(eff.source, EffectType.INVIS_END, eff.user,
+                           2, lambda eff: f"{eff.name} has ended."))
+            MissionHandler.handle_effect_mission(eff, manager, "enemy_expire")
+            if eff.name == "Quirk - Transform":
+                manager.toga_flush_effects()
+                manager.toga_transform("toga")    
+            if eff.name == "Bunny Assault" and eff.eff_type == EffectType.CONT_USE:
+                if manager.has_effect(EffectType.DEST_DEF,
+                                      "Perfect Paper - Rampage Suit"):
+                    manager.get_effect(
+                        EffectType.DEST_DEF,
+                        "Perfect Paper - Rampage Suit").alter_dest_def(
+                            30)
+                    manager.progress_mission(3, 20)
+            if eff.name == "Thunder Palace":
+                for enemy in self.pteam:
+                    if enemy.final_can_effect(
+                            manager.check_bypass_effects()):
+                        eff.user.deal_eff_damage(40, enemy, eff, DamageType.NORMAL)
+            if eff.name == "Mahapadma" and eff.eff_type == EffectType.MARK:
+                manager.add_effect(
+                    Effect(Ability("esdeathalt1"), EffectType.ALL_STUN,
+                           manager, 5,
+                           lambda eff: "Esdeath is stunned."))
+            if eff.name == "Lightning Dragon's Roar":
+                manager.add_effect(
+                    Effect(Ability("laxus2"),
+                           EffectType.ALL_DR,
+                           eff.user,
+                           2,
+                           lambda eff:
+                           "This character will take 10 more damage.",
+                           mag=-10))
+            if eff.name == "Illusory Breakdown" and eff.mag > 0:
+                for emanager in self.pteam:
+                    if emanager.has_effect(
+                            EffectType.SYSTEM, "Chrome1Target"
+                    ) and emanager.get_effect(
+                            EffectType.SYSTEM, "Chrome1Target").user == manager:
+                        if emanager.final_can_effect(
+                                manager.check_bypass_effects()):
+                            manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
+                            emanager.add_effect(
+                                Effect(
+                                    Ability("chrome2"),
+                                    EffectType.ALL_STUN, manager, 2,
+                                    lambda eff:
+                                    "This character is stunned."))
+                            if emanager.meets_stun_check():
+                                manager.check_on_stun(emanager)
+            if eff.name == "Mental Immolation" and eff.mag > 0:
+                for emanager in self.pteam:
+                    if emanager.has_effect(
+                            EffectType.SYSTEM, "Chrome2Target"
+                    ) and emanager.get_effect(
+                            EffectType.SYSTEM, "Chrome2Target").user == manager:
+                        if emanager.final_can_effect(
+                                manager.check_bypass_effects()):
+                            manager.deal_eff_damage(25, emanager, eff, DamageType.NORMAL)
+                            eff.user.progress_mission(3, 1)
+                            emanager.source.energy_contribution -= 1
+                            manager.check_on_drain(emanager)
+            if eff.name == "Mental Annihilation" and eff.mag > 0:
+                for emanager in self.pteam:
+                    if emanager.has_effect(
+                            EffectType.SYSTEM, "MukuroTarget"
+                    ) and emanager.get_effect(
+                            EffectType.SYSTEM, "MukuroTarget").user == manager:
+                        if emanager.final_can_effect("BYPASS"):
+                            manager.deal_eff_damage(45, emanager, eff, DamageType.NORMAL)
+            if eff.name == "Illusory World Destruction" and eff.mag > 0:
+                for emanager in self.pteam:
+                    if emanager.final_can_effect(
+                            manager.check_bypass_effects()):
+                        manager.deal_eff_damage(30, emanager, eff, DamageType.NORMAL)
+                        emanager.add_effect(
+                            Effect(
+                                Ability("chromealt2"),
+                                EffectType.ALL_STUN, manager, 2, lambda
+                                eff: "This character is stunned."))
+                        if emanager.meets_stun_check():
+                            manager.check_on_stun(emanager)
+            if eff.name == "Quickdraw - Rifle" and eff.eff_type == EffectType.CONT_USE:
+                manager.full_remove_effect("Quickdraw - Rifle",
+                                           manager)
+                manager.add_effect(
+                    Effect(
+                        Ability("cmaryalt2"),
+                        EffectType.ABILITY_SWAP,
+                        manager,
+                        280000,
+                        lambda eff:
+                        "Quickdraw - Rifle has been replaced by Quickdraw - Sniper",
+                        mag=12))
+
     def scene_remove_effect(self, effect_name: str, user: CharacterManager):
         for character in self.pteam:
             character.full_remove_effect(effect_name, user)
@@ -2091,35 +2035,13 @@ class BattleScene(engine.Scene):
         self.round_any_cost = 0
         self.acting_character = None
         
-        play_sound(self.scene_manager.sounds["turnstart"])
+        if not (self.headless or self.catching_up):
+            play_sound(self.scene_manager.sounds["turnstart"])
         game_lost = True
         for manager in self.player_display.team.character_managers:
 
-            if manager.source.name == "nemurin":
-                if manager.has_effect(
-                        EffectType.CONT_UNIQUE,
-                        "Nemurin Nap") and manager.get_effect(
-                            EffectType.CONT_UNIQUE, "Nemurin Nap").mag <= 0:
-                    if not (manager.has_effect(EffectType.SYSTEM,
-                                               "NemurinMission5Tracker")
-                            or manager.has_effect(EffectType.SYSTEM,
-                                                  "NemurinMission5Failure")):
-                        manager.add_effect(
-                            Effect("NemurinMission5Tracker",
-                                   EffectType.SYSTEM,
-                                   manager,
-                                   280000,
-                                   lambda eff: "",
-                                   mag=1,
-                                   system=True))
-                    else:
-                        manager.add_effect(
-                            Effect("NemurinMission5Failure",
-                                   EffectType.SYSTEM,
-                                   manager,
-                                   280000,
-                                   lambda eff: "",
-                                   system=True))
+            for eff in manager.source.current_effects:
+                MissionHandler.handle_effect_mission(eff, manager, "turn_start")
             manager.source.energy_contribution = 1
             if manager.source.hp <= 0:
                 manager.kill()
@@ -2179,6 +2101,7 @@ class BattleScene(engine.Scene):
     def lose_game(self):
         self.player.losses += 1
 
+        self.record_result(won=False, surrendered=self.clicked_surrender)
         self.lose_game_mission_check()
         if self.timer:
             self.timer.cancel()
@@ -2225,7 +2148,7 @@ class BattleScene(engine.Scene):
         save_button = self.border_sprite(save_button, DULL_AQUA, 2)
         save_button = self.render_bordered_text(self.font, "Save", WHITE, BLACK, save_button, 22, 1, 1)
         save_button = self.render_bordered_text(self.font, "Replay", WHITE, BLACK, save_button, 14, 16, 1)
-        # save_button.click += self.save_replay
+        save_button.click += self.save_replay
         missions_button = self.ui_factory.from_color(sdl2.ext.BUTTON, MENU, (80, 40))
         missions_button = self.border_sprite(missions_button, DULL_AQUA, 2)
         missions_button = self.render_bordered_text(self.font, "Missions", WHITE, BLACK, missions_button, 11, 9, 1)
@@ -2236,13 +2159,27 @@ class BattleScene(engine.Scene):
         self.game_end_region.add_sprite(save_button, 710, 60)
         self.game_end_region.add_sprite(missions_button, 710, 110)
         
-        self.scene_manager.connection.send_match_ending(won=False)
-        self.scene_manager.connection.send_player_update(self.player)
-        self.scene_manager.connection.send_match_statistics([
+        self.opponent.send_match_ending(won=False)
+        self.opponent.send_player_update(self.player)
+        self.opponent.send_match_statistics([
             manager.source.name
             for manager in self.player_display.team.character_managers
         ], False)
 
+    def record_result(self, won: bool, surrendered: bool = False):
+        if self.recorder:
+            self.recorder.finish(self.pteam + self.eteam, won, surrendered)
+        if profiler.enabled and not self.headless:
+            profiler.dump(PROFILE_DIR / f"{self.player.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+            profiler.reset()
+
+    def save_replay(self, button, sender):
+        if not self.recorder:
+            return
+        play_sound(self.scene_manager.sounds["click"])
+        REPLAY_DIR.mkdir(exist_ok=True)
+        self.recorder.save(REPLAY_DIR / f"{self.player.name}-{time.strftime('%Y%m%d-%H%M%S')}.aar")
+
     def return_to_char_select(self, button, sender):
         play_sound(self.scene_manager.sounds["click"])
         for manager in self.pteam:
@@ -2257,7 +2194,10 @@ class BattleScene(engine.Scene):
             if manager.source.name == "orihime":
                 manager.source.current_effects.clear()
                 rename_i_reject(manager)
-        self.scene_manager.return_to_select(self.player)
+        if self.practice:
+            self.scene_manager.return_to_select(self.practice.stored_player)
+        else:
+            self.scene_manager.return_to_select(self.player)
         self.window_up = False
 
     def saber_is_the_strongest_servant(self,
@@ -2308,6 +2248,7 @@ class BattleScene(engine.Scene):
     def win_game(self, surrendered=False):
         self.player.wins += 1
 
+        self.record_result(won=True, surrendered=surrendered)
         self.win_game_mission_check()
         if self.timer:
             self.timer.cancel()
@@ -2351,7 +2292,7 @@ class BattleScene(engine.Scene):
         save_button = self.border_sprite(save_button, DULL_AQUA, 2)
         save_button = self.render_bordered_text(self.font, "Save", WHITE, BLACK, save_button, 22, 1, 1)
         save_button = self.render_bordered_text(self.font, "Replay", WHITE, BLACK, save_button, 14, 16, 1)
-        # save_button.click += self.save_replay
+        save_button.click += self.save_replay
         missions_button = self.ui_factory.from_color(sdl2.ext.BUTTON, MENU, (80, 40))
         missions_button = self.border_sprite(missions_button, DULL_AQUA, 2)
         missions_button = self.render_bordered_text(self.font, "Missions", WHITE, BLACK, missions_button, 11, 9, 1)
@@ -2360,9 +2301,9 @@ class BattleScene(engine.Scene):
         self.game_end_region.add_sprite(save_button, 710, 60)
         self.game_end_region.add_sprite(missions_button, 710, 110)
         
-        self.scene_manager.connection.send_match_ending(won=True)
-        self.scene_manager.connection.send_player_update(self.player)
-        self.scene_manager.connection.send_match_statistics([
+        self.opponent.send_match_ending(won=True)
+        self.opponent.send_player_update(self.player)
+        self.opponent.send_match_statistics([
             manager.source.name
             for manager in self.player_display.team.character_managers
         ], True)
@@ -2534,13 +2475,6 @@ class BattleScene(engine.Scene):
                     player: Player = None,
                     enemy: Player = None,
                     energy=[0, 0, 0, 0], seed: int = 0):
-        self.window_closing = True
-        self.sharingan_reflecting = False
-        self.sharingan_reflector = None
-        self.clicked_surrender = False
-        self.round_any_cost = 0
-        self.d20 = random.Random(x = seed)
-        self.has_exchanged = False
         self.region.clear()
         self.enemy_detail_ability = None
         self.enemy_detail_character = None
@@ -2549,6 +2483,40 @@ class BattleScene(engine.Scene):
                 self.scene_manager.surfaces["in_game_background"]))
         self.region.add_sprite(self.background, 0, 0)
         self.draw_turn_end_region()
+        self.setup_battle_state(ally_team, enemy_team, player, enemy, energy, seed)
+        if player:
+            for manager in self.pteam:
+                self.build_ally_sprites(manager)
+        for manager in self.eteam:
+            self.build_enemy_sprites(manager)
+        self.draw_timer_region()
+        if player:
+            self.update_energy_region()
+
+            for manager in self.player_display.team.character_managers:
+                manager.source.current_hp = 200
+                manager.update()
+
+            for manager in self.enemy_display.team.character_managers:
+                manager.source.current_hp = 200
+                manager.update_limited()
+            self.draw_player_region()
+            self.draw_enemy_region()
+            self.draw_surrender_region()
+
+    def setup_battle_state(self,
+                           ally_team: list[Character],
+                           enemy_team: list[Character],
+                           player: Player = None,
+                           enemy: Player = None,
+                           energy=[0, 0, 0, 0], seed: int = 0):
+        self.window_closing = True
+        self.sharingan_reflecting = False
+        self.sharingan_reflector = None
+        self.clicked_surrender = False
+        self.round_any_cost = 0
+        self.d20 = random.Random(x = seed)
+        self.has_exchanged = False
         self.enemy = enemy
         self.player = player
         ally_roster: list[CharacterManager] = []
@@ -2557,137 +2525,16 @@ class BattleScene(engine.Scene):
             char_manager = CharacterManager(ally, self)
             if not ally.name in self.missions_to_check:
                 self.missions_to_check.append(ally.name)
-            if player:
-                char_manager.profile_sprite = self.ui_factory.from_surface(
-                    sdl2.ext.BUTTON,
-                    self.get_scaled_surface(
-                        self.scene_manager.surfaces[char_manager.source.name +
-                                                    "allyprof"]),
-                    free=True)
-                char_manager.profile_border = self.ui_factory.from_color(
-                    sdl2.ext.BUTTON, BLACK, (104, 104))
-                char_manager.profile_sprite.click += char_manager.detail_click
-                char_manager.selected_filter = self.ui_factory.from_surface(
-                    sdl2.ext.BUTTON,
-                    self.get_scaled_surface(
-                        self.scene_manager.surfaces["selected"]),
-                    free=True)
-                char_manager.selected_filter.click += char_manager.profile_click
-                char_manager.main_ability_sprites = [
-                    self.ui_factory.from_surface(
-                        sdl2.ext.BUTTON,
-                        self.get_scaled_surface(self.scene_manager.surfaces[
-                            char_manager.source.main_abilities[j].db_name], 80, 80))
-                    for j in range(4)
-                ]
-                for j, sprite in enumerate(char_manager.main_ability_sprites):
-                    sprite.selected_pane = self.ui_factory.from_surface(
-                        sdl2.ext.BUTTON,
-                        self.get_scaled_surface(
-                            self.scene_manager.surfaces["selected"], 80, 80),
-                        free=True)
-                    sprite.ability = char_manager.source.main_abilities[j]
-                    char_manager.source.main_abilities[
-                        j].cooldown_remaining = 0
-                    sprite.null_pane = self.ui_factory.from_surface(
-                        sdl2.ext.BUTTON,
-                        self.get_scaled_surface(
-                            self.scene_manager.surfaces["locked"], 80, 80),
-                        free=True)
-                    sprite.null_pane.ability = char_manager.source.main_abilities[
-                        j]
-                    sprite.null_pane.in_battle_desc = self.create_text_display(
-                        self.font, sprite.null_pane.ability.name + ": " +
-                        sprite.null_pane.ability.desc, BLACK, WHITE, 5, 0, 520,
-                        110)
-                    sprite.null_pane.text_border = self.ui_factory.from_color(
-                        sdl2.ext.BUTTON, BLACK, (524, 129))
-                    sprite.border = self.ui_factory.from_color(
-                        sdl2.ext.BUTTON, BLACK, (84, 84))
-                    sprite.click += char_manager.set_selected_ability
-
-                char_manager.alt_ability_sprites = [
-                    self.ui_factory.from_surface(
-                        sdl2.ext.BUTTON,
-                        self.get_scaled_surface(self.scene_manager.surfaces[
-                            char_manager.source.alt_abilities[j].db_name], 80, 80))
-                    for j in range(len(char_manager.source.alt_abilities))
-                ]
-                for j, sprite in enumerate(char_manager.alt_ability_sprites):
-                    sprite.selected_pane = self.ui_factory.from_surface(
-                        sdl2.ext.BUTTON,
-                        self.get_scaled_surface(
-                            self.scene_manager.surfaces["selected"], 80, 80),
-                        free=True)
-                    sprite.ability = char_manager.source.alt_abilities[j]
-                    char_manager.source.alt_abilities[j].cooldown_remaining = 0
-                    sprite.null_pane = self.ui_factory.from_surface(
-                        sdl2.ext.BUTTON,
-                        self.get_scaled_surface(
-                            self.scene_manager.surfaces["locked"], 80, 80),
-                        free=True)
-                    sprite.null_pane.ability = char_manager.source.main_abilities[
-                        j]
-                    sprite.null_pane.in_battle_desc = self.create_text_display(
-                        self.font, sprite.null_pane.ability.name + ": " +
-                        sprite.null_pane.ability.desc, BLACK, WHITE, 5, 0, 520,
-                        110)
-                    sprite.null_pane.text_border = self.ui_factory.from_color(
-                        sdl2.ext.BUTTON, BLACK, (524, 129))
-                    sprite.border = self.ui_factory.from_color(
-                        sdl2.ext.BUTTON, BLACK, (84, 84))
-                    sprite.click += char_manager.set_selected_ability
-
-                char_manager.current_ability_sprites = [
-                    ability for ability in char_manager.main_ability_sprites
-                ]
-                for j, sprite in enumerate(
-                        char_manager.current_ability_sprites):
-                    sprite.ability = char_manager.source.current_abilities[j]
-
-                char_manager.in_battle_desc = self.create_text_display(
-                    self.font, char_manager.source.desc, BLACK, WHITE, 5, 0,
-                    520, 110)
-                char_manager.text_border = self.ui_factory.from_color(
-                    sdl2.ext.BUTTON, BLACK, (524, 129))
-                for sprite in char_manager.main_ability_sprites:
-                    sprite.in_battle_desc = self.create_text_display(
-                        self.font,
-                        sprite.ability.name + ": " + sprite.ability.desc,
-                        BLACK, WHITE, 5, 0, 520, 110)
-                    sprite.text_border = self.ui_factory.from_color(
-                        sdl2.ext.BUTTON, BLACK, (524, 129))
-                for sprite in char_manager.alt_ability_sprites:
-                    sprite.in_battle_desc = self.create_text_display(
-                        self.font,
-                        sprite.ability.name + ": " + sprite.ability.desc,
-                        BLACK, WHITE, 5, 0, 520, 110)
-                    sprite.text_border = self.ui_factory.from_color(
-                        sdl2.ext.BUTTON, BLACK, (524, 129))
+            for ability in itertools.chain(ally.main_abilities, ally.alt_abilities):
+                ability.cooldown_remaining = 0
             char_manager.id = "ally"
             char_manager.char_id = i
             self.handle_unique_startup(char_manager)
             ally_roster.append(char_manager)
-        for i, enemy in enumerate(enemy_team):
-            e_char_manager = CharacterManager(enemy, self)
-            if not enemy.name in self.missions_to_check:
-                self.missions_to_check.append(enemy.name)
-            if enemy:
-                e_char_manager.profile_sprite = self.ui_factory.from_surface(
-                    sdl2.ext.BUTTON,
-                    self.get_scaled_surface(
-                        self.scene_manager.surfaces[e_char_manager.source.name
-                                                    + "enemyprof"]),
-                    free=True)
-                e_char_manager.profile_border = self.ui_factory.from_color(
-                    sdl2.ext.BUTTON, BLACK, (104, 104))
-                e_char_manager.profile_sprite.click += e_char_manager.detail_click
-                e_char_manager.selected_filter = self.ui_factory.from_surface(
-                    sdl2.ext.BUTTON,
-                    self.get_scaled_surface(
-                        self.scene_manager.surfaces["selected"]),
-                    free=True)
-                e_char_manager.selected_filter.click += e_char_manager.profile_click
+        for i, enemy_character in enumerate(enemy_team):
+            e_char_manager = CharacterManager(enemy_character, self)
+            if not enemy_character.name in self.missions_to_check:
+                self.missions_to_check.append(enemy_character.name)
             e_char_manager.id = "enemy"
             e_char_manager.char_id = i
             self.handle_unique_startup(e_char_manager)
@@ -2706,21 +2553,134 @@ class BattleScene(engine.Scene):
         if self.moving_first:
             self.first_turn = False
         
-        self.timer = self.start_timer()
-        self.draw_timer_region()
-        if player:
-            self.update_energy_region()
+        if self.recorder:
+            self.recorder.start([character.name for character in ally_team],
+                                [character.name for character in enemy_team],
+                                energy, seed, self.moving_first)
 
-            for manager in self.player_display.team.character_managers:
-                manager.source.current_hp = 200
-                manager.update()
+        self.timer = self.start_timer()
 
-            for manager in self.enemy_display.team.character_managers:
-                manager.source.current_hp = 200
-                manager.update_limited()
-            self.draw_player_region()
-            self.draw_enemy_region()
-            self.draw_surrender_region()
+    def build_ally_sprites(self, char_manager: "CharacterManager"):
+        char_manager.profile_sprite = self.ui_factory.from_surface(
+            sdl2.ext.BUTTON,
+            self.get_scaled_surface(
+                self.scene_manager.surfaces[char_manager.source.name +
+                                            "allyprof"]),
+            free=True)
+        char_manager.profile_border = self.ui_factory.from_color(
+            sdl2.ext.BUTTON, BLACK, (104, 104))
+        char_manager.profile_sprite.click += char_manager.detail_click
+        char_manager.selected_filter = self.ui_factory.from_surface(
+            sdl2.ext.BUTTON,
+            self.get_scaled_surface(
+                self.scene_manager.surfaces["selected"]),
+            free=True)
+        char_manager.selected_filter.click += char_manager.profile_click
+        char_manager.main_ability_sprites = [
+            self.ui_factory.from_surface(
+                sdl2.ext.BUTTON,
+                self.get_scaled_surface(self.scene_manager.surfaces[
+                    char_manager.source.main_abilities[j].db_name], 80, 80))
+            for j in range(4)
+        ]
+        for j, sprite in enumerate(char_manager.main_ability_sprites):
+            sprite.selected_pane = self.ui_factory.from_surface(
+                sdl2.ext.BUTTON,
+                self.get_scaled_surface(
+                    self.scene_manager.surfaces["selected"], 80, 80),
+                free=True)
+            sprite.ability = char_manager.source.main_abilities[j]
+            sprite.null_pane = self.ui_factory.from_surface(
+                sdl2.ext.BUTTON,
+                self.get_scaled_surface(
+                    self.scene_manager.surfaces["locked"], 80, 80),
+                free=True)
+            sprite.null_pane.ability = char_manager.source.main_abilities[
+                j]
+            sprite.null_pane.in_battle_desc = self.create_text_display(
+                self.font, sprite.null_pane.ability.name + ": " +
+                sprite.null_pane.ability.desc, BLACK, WHITE, 5, 0, 520,
+                110)
+            sprite.null_pane.text_border = self.ui_factory.from_color(
+                sdl2.ext.BUTTON, BLACK, (524, 129))
+            sprite.border = self.ui_factory.from_color(
+                sdl2.ext.BUTTON, BLACK, (84, 84))
+            sprite.click += char_manager.set_selected_ability
+
+        char_manager.alt_ability_sprites = [
+            self.ui_factory.from_surface(
+                sdl2.ext.BUTTON,
+                self.get_scaled_surface(self.scene_manager.surfaces[
+                    char_manager.source.alt_abilities[j].db_name], 80, 80))
+            for j in range(len(char_manager.source.alt_abilities))
+        ]
+        for j, sprite in enumerate(char_manager.alt_ability_sprites):
+            sprite.selected_pane = self.ui_factory.from_surface(
+                sdl2.ext.BUTTON,
+                self.get_scaled_surface(
+                    self.scene_manager.surfaces["selected"], 80, 80),
+                free=True)
+            sprite.ability = char_manager.source.alt_abilities[j]
+            sprite.null_pane = self.ui_factory.from_surface(
+                sdl2.ext.BUTTON,
+                self.get_scaled_surface(
+                    self.scene_manager.surfaces["locked"], 80, 80),
+                free=True)
+            sprite.null_pane.ability = char_manager.source.main_abilities[
+                j]
+            sprite.null_pane.in_battle_desc = self.create_text_display(
+                self.font, sprite.null_pane.ability.name + ": " +
+                sprite.null_pane.ability.desc, BLACK, WHITE, 5, 0, 520,
+                110)
+            sprite.null_pane.text_border = self.ui_factory.from_color(
+                sdl2.ext.BUTTON, BLACK, (524, 129))
+            sprite.border = self.ui_factory.from_color(
+                sdl2.ext.BUTTON, BLACK, (84, 84))
+            sprite.click += char_manager.set_selected_ability
+
+        char_manager.current_ability_sprites = [
+            ability for ability in char_manager.main_ability_sprites
+        ]
+        for j, sprite in enumerate(
+                char_manager.current_ability_sprites):
+            sprite.ability = char_manager.source.current_abilities[j]
+
+        char_manager.in_battle_desc = self.create_text_display(
+            self.font, char_manager.source.desc, BLACK, WHITE, 5, 0,
+            520, 110)
+        char_manager.text_border = self.ui_factory.from_color(
+            sdl2.ext.BUTTON, BLACK, (524, 129))
+        for sprite in char_manager.main_ability_sprites:
+            sprite.in_battle_desc = self.create_text_display(
+                self.font,
+                sprite.ability.name + ": " + sprite.ability.desc,
+                BLACK, WHITE, 5, 0, 520, 110)
+            sprite.text_border = self.ui_factory.from_color(
+                sdl2.ext.BUTTON, BLACK, (524, 129))
+        for sprite in char_manager.alt_ability_sprites:
+            sprite.in_battle_desc = self.create_text_display(
+                self.font,
+                sprite.ability.name + ": " + sprite.ability.desc,
+                BLACK, WHITE, 5, 0, 520, 110)
+            sprite.text_border = self.ui_factory.from_color(
+                sdl2.ext.BUTTON, BLACK, (524, 129))
+
+    def build_enemy_sprites(self, char_manager: "CharacterManager"):
+        char_manager.profile_sprite = self.ui_factory.from_surface(
+            sdl2.ext.BUTTON,
+            self.get_scaled_surface(
+                self.scene_manager.surfaces[char_manager.source.name
+                                            + "enemyprof"]),
+            free=True)
+        char_manager.profile_border = self.ui_factory.from_color(
+            sdl2.ext.BUTTON, BLACK, (104, 104))
+        char_manager.profile_sprite.click += char_manager.detail_click
+        char_manager.selected_filter = self.ui_factory.from_surface(
+            sdl2.ext.BUTTON,
+            self.get_scaled_surface(
+                self.scene_manager.surfaces["selected"]),
+            free=True)
+        char_manager.selected_filter.click += char_manager.profile_click
 
     def targeting_all_allies(self, primary_target: "CharacterManager"):
         return self.selected_ability.target_type == Target.MULTI_ALLY or self.selected_ability.target_type == Target.ALL_TARGET or (
@@ -2752,7 +2712,8 @@ class BattleScene(engine.Scene):
         self.acting_character.primary_target = primary_target
         self.selected_ability.user = self.acting_character
         self.acting_character.used_ability = self.selected_ability
-        self.acting_character.used_slot.ability = self.selected_ability
+        if self.acting_character.used_slot is not None:
+            self.acting_character.used_slot.ability = self.selected_ability
         self.acting_order.append(self.acting_character)
         self.selected_ability = None
         self.acting_character.acted = True
@@ -0,0 +1,126 @@
+"""Fork points for lookahead over a battle scene.
+
+A BattleState records the rules state of a scene: its teams and energy
+pools, every character, ability and effect on them, the scene's rules flags
+and the d20. Nothing is deep copied. Each object keeps its identity, its
+attributes are copied one level down, and effect lists are shared
+copy-on-write. Restoring writes that state back into the same objects, so
+the rules code runs on the scene as usual between a capture and a restore:
+
+    state = BattleState.capture(scene)
+    ... play a turn out ...
+    state.restore()
+"""
+import itertools
+import typing
+from typing import Any, Iterable, Optional, Tuple
+
+from animearena.effects import EffectList, EffectListSnapshot
+
+if typing.TYPE_CHECKING:
+    from animearena.battle_scene import BattleScene
+
+# BattleScene attributes the rules read or change during a turn; the rest
+# of the scene is display state.
+SCENE_FIELDS = (
+    "dying_to_doping", "collapsing_ally_inviolate_shield", "collapsing_enemy_inviolate_shield",
+    "ability_messages", "random_spent", "waiting_for_turn", "first_turn", "moving_first",
+    "execution_order", "cont_list", "cont_storage", "acting_order", "acting_character",
+    "selected_ability", "sharingan_reflecting", "sharingan_reflector",
+    "sharingan_reflected_effects", "sharingan_reflected_effect_ticking",
+    "triggering_stack_print", "stacks_to_print", "missions_to_check", "round_any_cost",
+    "exchanging_energy", "has_exchanged", "traded_away_energy", "traded_for_energy",
+    "potential_energy", "window_up", "game_over", "game_won",
+)
+
+_CONTAINERS = frozenset((list, dict, set))
+
+
+def _restore_contents(container, contents):
+    if type(container) is list:
+        container[:] = contents
+    else:
+        container.clear()
+        container.update(contents)
+
+
+class AttributeState:
+    """An object's attributes, and the contents of the lists, dicts and sets
+    among them, as they stood when captured."""
+    __slots__ = ("target", "values", "contents", "fields")
+
+    def __init__(self, target: Any, fields: Optional[Iterable[str]] = None):
+        attributes = target.__dict__
+        if fields is None:
+            self.values = attributes.copy()
+        else:
+            self.values = {name: attributes[name] for name in fields if name in attributes}
+        self.target = target
+        self.fields = fields
+        self.contents = [(value, value.copy()) for value in self.values.values()
+                         if type(value) in _CONTAINERS]
+
+    def restore(self):
+        if self.fields is None:
+            attributes = self.target.__dict__
+            attributes.clear()
+            attributes.update(self.values)
+        else:
+            for name, value in self.values.items():
+                setattr(self.target, name, value)
+        for container, contents in self.contents:
+            _restore_contents(container, contents)
+
+
+class BattleState:
+    """The rules state of a scene at one point in a match."""
+    __slots__ = ("scene", "objects", "effect_lists", "rng_state")
+
+    scene: "BattleScene"
+    objects: list[AttributeState]
+    effect_lists: list[Tuple[EffectList, EffectListSnapshot]]
+    rng_state: tuple
+
+    def __init__(self, scene: "BattleScene", objects: list[AttributeState],
+                 effect_lists: list[Tuple[EffectList, EffectListSnapshot]], rng_state: tuple):
+        self.scene = scene
+        self.objects = objects
+        self.effect_lists = effect_lists
+        self.rng_state = rng_state
+
+    @classmethod
+    def capture(cls, scene: "BattleScene") -> "BattleState":
+        objects = [AttributeState(scene, SCENE_FIELDS)]
+        effect_lists = []
+        seen = set()
+
+        def track(target):
+            if id(target) not in seen:
+                seen.add(id(target))
+                objects.append(AttributeState(target))
+
+        for team in (scene.player_display.team, scene.enemy_display.team):
+            track(team)
+            for manager in team.character_managers:
+                track(manager)
+                character = manager.source
+                track(character)
+                for ability in itertools.chain(character.main_abilities, character.alt_abilities,
+                                               character.current_abilities):
+                    track(ability)
+                effects = character.current_effects
+                effect_lists.append((effects, effects.snapshot()))
+                for effect in effects:
+                    track(effect)
+        for effect in scene.sharingan_reflected_effects:
+            track(effect)
+        return cls(scene, objects, effect_lists, scene.d20.getstate())
+
+    def restore(self):
+        """Put the scene back as it was captured. A state can be restored
+        any number of times."""
+        for state in self.objects:
+            state.restore()
+        for effects, snapshot in self.effect_lists:
+            effects.restore(snapshot)
+        self.scene.d20.setstate(self.rng_state)
@@ -0,0 +1,177 @@
+"""Roster thumbnails and the roster filter index.
+
+Thumbnails are decoded once and cached on disk between runs.
+
+The character select and draft rosters show every character's profile image
+shrunk and bordered. Building those means decoding every profile PNG, so the
+finished thumbnails are written to a cache file named for the resource hash;
+later runs load that one file instead, and any change to the resources
+starts a new cache:
+
+    image = roster_thumbnail("naruto")
+
+The filter index answers the character select filters from each character's
+energy mask, and matches search text against names and ability types:
+
+    get_roster_index().filter(required=1 << Energy.PHYSICAL, query="stun")
+"""
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Optional
+
+from PIL import Image
+
+from animearena.ability_type import AbilityType
+from animearena.character import Character, get_character_db
+from animearena.engine import border_image
+from animearena.resource_manager import load_image, resource_hash
+
+THUMBNAIL_SIZE = 75
+CACHE_DIR = Path("cache")
+CACHE_MAGIC = b"AATHUMB\x01"
+_INDEX_LENGTH = struct.Struct(">I")
+
+_thumbnails: Optional[dict[str, Image.Image]] = None
+_roster_index: Optional["RosterIndex"] = None
+
+
+def cache_path() -> Path:
+    return CACHE_DIR / f"thumbnails-{resource_hash()[:16]}.bin"
+
+
+def make_thumbnail(name: str) -> Image.Image:
+    image = load_image(name + "prof.png").resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    image = border_image(image, 1)
+    # The cache holds raw pixels, which carry no palette.
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    return image
+
+
+def read_thumbnails(path: Path) -> dict[str, Image.Image]:
+    """Decode a cache file: the magic, a length-prefixed JSON index of
+    name, mode, size and pixel offset, then the pixels."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(CACHE_MAGIC):
+        raise ValueError(f"{path} is not a thumbnail cache")
+    offset = len(CACHE_MAGIC)
+    length = _INDEX_LENGTH.unpack_from(data, offset)[0]
+    offset += _INDEX_LENGTH.size
+    index = json.loads(data[offset:offset + length])
+    pixels = memoryview(data)[offset + length:]
+    return {
+        name: Image.frombytes(mode, tuple(size), bytes(pixels[start:start + count]))
+        for name, mode, size, start, count in index
+    }
+
+
+def write_thumbnails(path: Path, thumbnails: dict[str, Image.Image]):
+    index = []
+    pixels = bytearray()
+    for name, image in thumbnails.items():
+        data = image.tobytes()
+        index.append((name, image.mode, image.size, len(pixels), len(data)))
+        pixels += data
+    encoded = json.dumps(index).encode()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written to the side and moved into place, so a second client starting
+    # at the same time never reads half a file.
+    partial = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(partial, "wb") as f:
+        f.write(CACHE_MAGIC + _INDEX_LENGTH.pack(len(encoded)) + encoded + pixels)
+    os.replace(partial, path)
+    for stale in path.parent.glob("thumbnails-*.bin"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def load_thumbnails() -> dict[str, Image.Image]:
+    """Every roster thumbnail, from the cache when it matches the resources."""
+    global _thumbnails
+    if _thumbnails is not None:
+        return _thumbnails
+    path = cache_path()
+    names = [name for name, character in get_character_db().items() if not character.hidden]
+    thumbnails = {}
+    try:
+        thumbnails = read_thumbnails(path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError, struct.error) as e:
+        logging.warning("Ignoring unreadable thumbnail cache %s: %s", path, e)
+    missing = [name for name in names if name not in thumbnails]
+    if missing:
+        for name in missing:
+            thumbnails[name] = make_thumbnail(name)
+        try:
+            write_thumbnails(path, thumbnails)
+        except OSError as e:
+            logging.warning("Could not write thumbnail cache %s: %s", path, e)
+    _thumbnails = thumbnails
+    return thumbnails
+
+
+def roster_thumbnail(name: str) -> Image.Image:
+    """A character's bordered roster thumbnail. The same image is returned
+    every time, so scaled surfaces made from it are cached as well."""
+    thumbnails = load_thumbnails()
+    image = thumbnails.get(name)
+    if image is None:
+        image = thumbnails[name] = make_thumbnail(name)
+    return image
+
+
+class RosterIndex():
+    """The visible roster in catalog order, with the filtered lists each
+    energy filter combination selects built on first use."""
+
+    characters: list[Character]
+    names: dict[str, str]
+    types: dict[str, frozenset[str]]
+    _filtered: dict[tuple[int, int], list[Character]]
+
+    def __init__(self, characters: Iterable[Character]):
+        self.characters = [character for character in characters if not character.hidden]
+        self.names = {}
+        self.types = {}
+        self._filtered = {}
+        for character in self.characters:
+            # The display name is how the description opens, up to the first comma.
+            display_name = (character.desc or "").split(",", 1)[0]
+            self.names[character.name] = f"{character.name} {display_name}".lower()
+            self.types[character.name] = frozenset(
+                AbilityType(ability_type).name.lower()
+                for ability in character.main_abilities + character.alt_abilities
+                for ability_type in getattr(ability, "types", []))
+
+    def filter(self, required: int = 0, excluded: int = 0, query: str = "") -> list[Character]:
+        """Characters that use every energy in the required mask and none in
+        the excluded mask, and that match every word of the query."""
+        key = (required, excluded)
+        filtered = self._filtered.get(key)
+        if filtered is None:
+            filtered = self._filtered[key] = [
+                character for character in self.characters
+                if character.energy_mask & required == required and not character.energy_mask & excluded
+            ]
+        words = query.lower().split()
+        if not words:
+            return filtered
+        return [character for character in filtered if self.matches(character, words)]
+
+    def matches(self, character: Character, words: list[str]) -> bool:
+        name = self.names[character.name]
+        types = self.types[character.name]
+        return all(word in name or any(ability_type.startswith(word) for ability_type in types)
+                   for word in words)
+
+
+def get_roster_index() -> RosterIndex:
+    global _roster_index
+    if _roster_index is None:
+        _roster_index = RosterIndex(get_character_db().values())
+    return _roster_index
@@ -1,13 +1,12 @@
 import sdl2.ext
 import copy
+import types
 import typing
 import logging
 import importlib.resources
 from PIL import Image
-from animearena.energy import Energy
 from animearena.ability import Ability
-if typing.TYPE_CHECKING:
-    from animearena.effects import Effect
+from animearena.effects import EffectList
 
 def get_image_from_path(file_name: str) -> Image:
     with importlib.resources.path('animearena.resources', file_name) as path:
@@ -15,6 +14,17 @@ def get_image_from_path(file_name: str) -> Image:
 
 
 
+def energy_mask(abilities: list[Ability]) -> int:
+    """Bit i is set when any of the abilities has a base cost in Energy(i)."""
+    mask = 0
+    for ability in abilities:
+        # Abilities missing from ability_info_db have no costs.
+        for energy, cost in getattr(ability, "_base_cost", {}).items():
+            if cost > 0:
+                mask |= 1 << energy.value
+    return mask
+
+
 class Character:
 
     profile_image: Image
@@ -28,6 +38,7 @@ class Character:
     main_prof: Image
     desc: str = ""
     selected: bool
+    energy_mask: int
     energy_contribution: int
     targeted: bool
     invulnerable: bool
@@ -43,7 +54,6 @@ class Character:
     second_swing: bool
     first_countered: bool
     sistema_CAI_stage: int
-    current_effects: list["Effect"]
     mission1progress: int
     mission2progress: int
     mission3progress: int
@@ -80,7 +90,7 @@ class Character:
         self.second_swing = False
         self.first_countered = False
         self.damage_reduction = 0
-        self.current_effects = []
+        self.current_effects = EffectList()
         self.current_hp = 200
         self.mission1progress = 0
         self.mission2progress = 0
@@ -101,6 +111,17 @@ class Character:
                 self.alt_abilities.append(Ability(f"{name}alt{i + 1}"))
             except FileNotFoundError:
                 break
+        self.energy_mask = energy_mask(self.main_abilities + self.alt_abilities)
+
+    @property
+    def current_effects(self) -> EffectList:
+        return self._current_effects
+
+    @current_effects.setter
+    def current_effects(self, effects):
+        if not isinstance(effects, EffectList):
+            effects = EffectList(effects)
+        self._current_effects = effects
 
     def reset_character_post_match(self):
         self.hp = 200
@@ -123,29 +144,15 @@ class Character:
 
     def clear_effects(self, final=False):
         if not final:
-            new_effects = [eff for eff in self.current_effects if eff.system == True]
-            self.current_effects = new_effects
+            self.current_effects.retain(lambda eff: eff.system == True)
         else:
             self.current_effects.clear()
 
     def uses_energy(self, energy_type: int) -> bool:
-        for ability in self.main_abilities:
-            if ability._base_cost[Energy(energy_type)] > 0:
-                return True
-        for ability in self.alt_abilities:
-            if ability._base_cost[Energy(energy_type)] > 0:
-                return True
-        return False
+        return bool(self.energy_mask & (1 << energy_type))
 
     def uses_energy_mult(self, energy_types: list[int]) -> bool:
-        for energy_type in energy_types:
-            for ability in self.main_abilities:
-                if ability._base_cost[Energy(energy_type)] > 0:
-                    return True
-            for ability in self.alt_abilities:
-                if ability._base_cost[Energy(energy_type)] > 0:
-                    return True
-        return False
+        return any(self.uses_energy(energy_type) for energy_type in energy_types)
 
     def set_hp(self, hp: int):
         self.hp = hp
@@ -157,16 +164,14 @@ class Character:
 
 character_db = None
 
-def get_character_db():
+def get_character_db() -> typing.Mapping[str, Character]:
+    """The catalog of every character, built once per process. It is shared
+    by every scene, so it is read-only; selection state belongs to scenes."""
     global character_db
     if not character_db:
-        character_db = make_character_db()
+        character_db = types.MappingProxyType(make_character_db())
     return character_db
 
-def reset_character_db():
-    global character_db
-    character_db = None
-
 
 def make_character_db():
  return {"naruto": Character("naruto", "Uzumaki Naruto, a former outcast of the Hidden Leaf Village, struggled throughout" +
@@ -10,19 +10,15 @@ from animearena.ability_type import AbilityType
 from animearena.energy import Energy
 from animearena.mission import Mission
 from animearena.mission_handler import MissionHandler, TriggerHandler
+from animearena.audio import play_sound
+from animearena.profiling import timed
 from animearena.animation import FadeAnimation, MovementAnimation, SizeAnimation
 import math
-from random import randint
 import logging
 from typing import Optional, Union, Tuple
 import collections.abc
 
 
-def play_sound(file_name: str):
-    # with importlib.resources.path('animearena.resources', file_name) as path:
-    #     playsound(str(path), False)
-    pass
-
 if typing.TYPE_CHECKING:
     from animearena.battle_scene import BattleScene
 
@@ -62,11 +58,13 @@ class CharacterManager(collections.abc.Container):
     char_id: int
     main_ability_sprites: list[sdl2.ext.SoftwareSprite]
     alt_ability_sprites: list[sdl2.ext.SoftwareSprite]
+    effect_sprites: dict[tuple, Tuple[Ability, Optional[int], sdl2.ext.SoftwareSprite, sdl2.ext.SoftwareSprite]]
     
     
 
     def __init__(self, source: character.Character, scene: "BattleScene"):
         self.updated_effect_families = list()
+        self.effect_sprites = dict()
         self.countered = False
         self.countering_ability = None
         self.counterer_id = 0
@@ -82,22 +80,19 @@ class CharacterManager(collections.abc.Container):
         self.received_ability = list()
         self.current_targets = list()
         self.primary_target = None
-        self.used_slot = self.scene.ui_factory.from_surface(sdl2.ext.BUTTON, self.scene.get_scaled_surface(self.scene.scene_manager.surfaces["used_slot"], 80, 80))
-        self.used_slot.border = self.scene.sprite_factory.from_color(BLACK, (84, 84))
-        self.used_slot.click += self.used_slot_click
-        self.used_slot.ability = None
+        if self.scene.headless:
+            self.used_slot = None
+        else:
+            self.used_slot = self.scene.ui_factory.from_surface(sdl2.ext.BUTTON, self.scene.get_scaled_surface(self.scene.scene_manager.surfaces["used_slot"], 80, 80))
+            self.used_slot.border = self.scene.sprite_factory.from_color(BLACK, (84, 84))
+            self.used_slot.click += self.used_slot_click
+            self.used_slot.ability = None
 
     def __contains__(self, __x: Tuple[EffectType, str]) -> bool:
-        for eff in self.source.current_effects:
-            if eff == __x:
-                return True
-        return False
+        return __x in self.source.current_effects
 
     def contains_sig(self, effect) -> bool:
-        for eff in self.source.current_effects:
-            if eff.signature == effect.signature:
-                return True
-        return False
+        return self.source.current_effects.contains_sig(effect)
 
     def __str__(self) -> str:
         list_of_effects = f"{self.source.name} ID: {self.id}"
@@ -672,7 +667,7 @@ class CharacterManager(collections.abc.Container):
                         team = self.scene.eteam
                     valid_targets = [manager for manager in team if manager.helpful_target(eff.user, eff.user.check_bypass_effects())]
                     if valid_targets:
-                        chosen_target = valid_targets[randint(0, len(valid_targets) - 1)]
+                        chosen_target = valid_targets[self.scene.d20.randint(0, len(valid_targets) - 1)]
                         eff.user.current_targets.append(chosen_target)
                         eff.user.acted = True
                         eff.user.used_ability = eff.user.source.main_abilities[0]
@@ -685,7 +680,7 @@ class CharacterManager(collections.abc.Container):
                         team = self.scene.eteam
                     valid_targets = [manager for manager in team if manager.hostile_target(eff.user, "BYPASS")]
                     if valid_targets:
-                        chosen_target = valid_targets[randint(0, len(valid_targets) - 1)]
+                        chosen_target = valid_targets[self.scene.d20.randint(0, len(valid_targets) - 1)]
                         eff.user.current_targets.append(chosen_target)
                         eff.user.acted = True
                         eff.user.used_ability = eff.user.source.main_abilities[1]
@@ -1165,6 +1160,7 @@ class CharacterManager(collections.abc.Container):
             if target.has_effect(EffectType.AFF_IMMUNE, "Heaven's Wheel Armor"):
                 target.progress_mission(2, mod_damage)
 
+    @timed(label=lambda self, *args, **kwargs: self.source.name)
     def receive_active_damage(self, damage: int, dealer: "CharacterManager", damage_type: DamageType):
         mod_damage = damage
         if damage_type == DamageType.NORMAL:
@@ -1712,28 +1708,15 @@ class CharacterManager(collections.abc.Container):
         return base_dur
 
     def get_effect(self, eff_type: EffectType, eff_name: str) -> Optional[Effect]:
-        gen = (eff for eff in self.source.current_effects
-               if eff.eff_type == eff_type)
-        for eff in gen:
-            if eff.name == eff_name:
-                return eff
+        return self.source.current_effects.get(eff_type, eff_name)
 
     def get_effect_with_user(self, eff_type: EffectType, eff_name: str,
                              user: "CharacterManager") -> Optional[Effect]:
-        gen = (eff for eff in self.source.current_effects
-               if eff.eff_type == eff_type and eff.user == user)
-        for eff in gen:
-            if eff.name == eff_name:
-                return eff
+        return self.source.current_effects.get_with_user(eff_type, eff_name, user)
 
     def has_effect_with_user(self, eff_type: EffectType, eff_name: str,
                              user: "CharacterManager") -> bool:
-        gen = (eff for eff in self.source.current_effects
-               if eff.eff_type == eff_type and eff.user == user)
-        for eff in gen:
-            if eff.name == eff_name:
-                return True
-        return False
+        return self.source.current_effects.get_with_user(eff_type, eff_name, user) is not None
 
     def get_ability(self, name: str):
         for ability in self.source.current_abilities:
@@ -1741,12 +1724,7 @@ class CharacterManager(collections.abc.Container):
                 return ability
 
     def has_effect(self, eff_type: EffectType, eff_name: str) -> bool:
-        gen = (eff for eff in self.source.current_effects
-               if eff.eff_type == eff_type)
-        for eff in gen:
-            if eff.name == eff_name:
-                return True
-        return False
+        return (eff_type, eff_name) in self.source.current_effects
 
     def check_for_collapsing_dest_def(self, eff: Effect):
         if eff.mag == 0:
@@ -2311,7 +2289,8 @@ class CharacterManager(collections.abc.Container):
                 self.source.hp = 0
                 self.kill()
                 
-                self.update_effect_region()
+                if self.scene.player:
+                    self.update_effect_region()
                 
                 #region Checking for winning killing blow mission progress
 
@@ -2507,6 +2486,7 @@ class CharacterManager(collections.abc.Container):
         elif def_type == "FULLBYPASS":
             return not (self.source.dead)
         
+    @timed(label=lambda self: f"{self.source.name}/{self.used_ability.name}")
     def execute_ability(self):
         self.used_ability.execute(self, self.scene.pteam, self.scene.eteam)
         self.check_for_cost_increase_missions()
@@ -2564,50 +2544,76 @@ class CharacterManager(collections.abc.Container):
             
 
     def remove_effect(self, effect: Effect):
-        new_current_effects: list[Effect] = []
-        
-        for eff in self.source.current_effects:
-            if not (eff == effect):
-                new_current_effects.append(eff)
-        self.source.current_effects = new_current_effects
-        
+        if effect is not None:
+            self.source.current_effects.discard(effect.eff_type, effect.name)
 
     def full_remove_effect(self, eff_name: str, user: "CharacterManager"):
-        new_current_effects: list[Effect] = []
-        for eff in self.source.current_effects:
-            if not (eff.name == eff_name and eff.user == user):
-                new_current_effects.append(eff)
-        self.source.current_effects = new_current_effects
+        self.source.current_effects.discard_with_user(eff_name, user)
 
     def is_enemy(self) -> bool:
-        return self.character_region.x > 400
+        return self.id == "enemy"
 
 
 
+    @timed(label=lambda self: self.source.name)
     def update_effect_region(self):
-        self.effect_region.clear()
         x_offset = 31
         if self.character_region.x > 400:
             position_modifier = -1
         else:
             position_modifier = 1
+        # Only the icons of clusters whose image or stack count has changed
+        # are rebuilt, and only those and the ones that moved are placed
+        # again, so an unchanged icon damages nothing on the screen.
+        previous_sprites = self.effect_sprites
+        self.effect_sprites = dict()
         for idx, effect_cluster in enumerate(self.make_effect_clusters().items()):
             cluster_family, effect_set = effect_cluster
-            effect_sprite = self.scene.ui_factory.from_surface(
-                sdl2.ext.BUTTON,
-                self.scene.get_scaled_surface(effect_set[0].eff_img, 25, 25),
-                free=True)
-            for eff in effect_set:
-                if eff.print_mag:
-                    effect_sprite.surface = self.stamp_stack_count(eff.mag, effect_sprite.surface)
-                    break
+            source = effect_set[0].source
+            stacks = next((eff.mag for eff in effect_set if eff.print_mag), None)
+            x = idx * x_offset * position_modifier
+            cached = previous_sprites.pop(cluster_family, None)
+            if cached is not None and cached[0] is source and cached[1] == stacks:
+                effect_sprite, border_sprite = cached[2], cached[3]
+                if not effect_sprite.placed:
+                    # The region was cleared by a full redraw.
+                    self.scene.active_effect_buttons.append(effect_sprite)
+                    self.scene.add_sprite_with_border(self.effect_region, effect_sprite, border_sprite, x, 0)
+                elif effect_sprite.x != self.effect_region.x + x:
+                    self.effect_region.remove_sprite(border_sprite)
+                    self.effect_region.remove_sprite(effect_sprite)
+                    self.scene.add_sprite_with_border(self.effect_region, effect_sprite, border_sprite, x, 0)
+            else:
+                if cached is not None:
+                    self.remove_effect_sprites(cached)
+                effect_sprite, border_sprite = self.make_effect_sprite(effect_set[0], stacks)
+                self.scene.active_effect_buttons.append(effect_sprite)
+                self.scene.add_sprite_with_border(self.effect_region, effect_sprite, border_sprite, x, 0)
+            self.effect_sprites[cluster_family] = (source, stacks, effect_sprite, border_sprite)
             effect_sprite.effects = effect_set
             effect_sprite.ID = f"{idx}/{self.id}"
             effect_sprite.is_enemy = self.is_enemy()
-            self.scene.active_effect_buttons.append(effect_sprite)
-            self.scene.add_bordered_sprite(self.effect_region, effect_sprite,
-                                           BLACK, idx * x_offset * position_modifier,
-                                           0)
+        for cached in previous_sprites.values():
+            self.remove_effect_sprites(cached)
+
+    def remove_effect_sprites(self, cached: Tuple[Ability, Optional[int], sdl2.ext.SoftwareSprite, sdl2.ext.SoftwareSprite]):
+        effect_sprite, border_sprite = cached[2], cached[3]
+        if effect_sprite.placed:
+            self.effect_region.remove_sprite(border_sprite)
+            self.effect_region.remove_sprite(effect_sprite)
+        if effect_sprite in self.scene.active_effect_buttons:
+            self.scene.active_effect_buttons.remove(effect_sprite)
+
+    def make_effect_sprite(self, effect: Effect, stacks: Optional[int]):
+        effect_sprite = self.scene.ui_factory.from_surface(
+            sdl2.ext.BUTTON,
+            self.scene.get_scaled_surface(effect.eff_img, 25, 25),
+            free=True)
+        if stacks is not None:
+            effect_sprite.surface = self.stamp_stack_count(stacks, effect_sprite.surface)
+        width, height = effect_sprite.size
+        border_sprite = self.scene.sprite_factory.from_color(BLACK, (width + 4, height + 4))
+        return effect_sprite, border_sprite
 
     def stamp_stack_count(self, stacks: int,
                        surface: sdl2.SDL_Surface) -> sdl2.SDL_Surface:
@@ -2629,10 +2635,8 @@ class CharacterManager(collections.abc.Container):
             x_offset = 0
             y_offset = 2
         
-        text_border_surface = sdl2.sdlttf.TTF_RenderText_Blended(
-            font, str.encode(f"{stacks}"), BLACK)
-        text_surface = sdl2.sdlttf.TTF_RenderText_Blended(
-            font, str.encode(f"{stacks}"), WHITE)
+        text_border_surface = engine.text_surfaces.get(font, f"{stacks}", BLACK)
+        text_surface = engine.text_surfaces.get(font, f"{stacks}", WHITE)
         
         sdl2.surface.SDL_BlitSurface(text_border_surface, None, surface,
                                      sdl2.SDL_Rect(x_offset - 1, y_offset - 1, 25, 25))
@@ -2658,10 +2662,8 @@ class CharacterManager(collections.abc.Container):
         
     def stamp_cooldown(self, cooldown: int,
                        surface: sdl2.SDL_Surface) -> sdl2.SDL_Surface:
-        text_border_surface = sdl2.sdlttf.TTF_RenderText_Blended(
-            self.scene.cooldown_font, str.encode(f"{cooldown}"), BLACK)
-        text_surface = sdl2.sdlttf.TTF_RenderText_Blended(
-            self.scene.cooldown_font, str.encode(f"{cooldown}"), WHITE)
+        text_border_surface = engine.text_surfaces.get(self.scene.cooldown_font, f"{cooldown}", BLACK)
+        text_surface = engine.text_surfaces.get(self.scene.cooldown_font, f"{cooldown}", WHITE)
         
         sdl2.surface.SDL_BlitSurface(text_border_surface, None, surface,
                                      sdl2.SDL_Rect(20, -15, 0, 0))
@@ -2783,7 +2785,10 @@ class CharacterManager(collections.abc.Container):
             ability.reset_cooldown()
         self.set_used_slot_to_none()
         if self.scene.player:
-            if enemy:
+            if self.scene.catching_up:
+                if not enemy:
+                    self.update_state()
+            elif enemy:
                 self.update_limited()
             else:
                 self.update()
@@ -2791,6 +2796,12 @@ class CharacterManager(collections.abc.Container):
     def add_received_ability(self, ability: Ability):
         self.received_ability.append(ability)
 
+    def update_state(self):
+        """Make the state changes update makes, without drawing anything."""
+        self.check_ability_swaps()
+        self.adjust_targeting_types()
+        self.adjust_ability_costs()
+
     def update(self, x: int = 0, y: int = 0):
         self.character_region.clear()
         self.update_profile(x, y)
@@ -2972,7 +2983,8 @@ class CharacterManager(collections.abc.Container):
             self.set_used_slot_to_none()
 
     def set_used_slot_to_none(self):
-        self.used_slot.ability = None
+        if self.used_slot is not None:
+            self.used_slot.ability = None
 
     def profile_click(self, _button, _sender):
         if not self.scene.window_up:
@@ -1,5 +1,6 @@
 from pathlib import Path
 from re import search
+import random
 from typing import Union, TYPE_CHECKING
 import threading
 import gc
@@ -9,15 +10,16 @@ import sdl2.surface
 import sdl2.sdlttf
 import easygui
 from PIL import Image
-import dill as pickle
 from animearena import engine
 from animearena.player import Player
-from animearena.character import Character, get_character_db, reset_character_db
+from animearena.catalog import get_roster_index, roster_thumbnail
+from animearena.character import Character, get_character_db
 from animearena.ability import Ability
 from animearena.mission import mission_db
 from animearena.resource_manager import init_font
 from animearena.color import *
-from playsound import playsound
+from animearena.audio import play_sound
+from animearena.avatar import AVATAR_SIZE, decode_avatar, encode_avatar, pouch_avatar, read_pouch_avatar
 import logging
 import math
 import sys
@@ -26,10 +28,6 @@ if TYPE_CHECKING:
     from animearena.scene_manager import SceneManager
 
 
-def play_sound(file_name: str):
-    # with importlib.resources.path('animearena.resources', file_name) as path:
-    #     playsound(str(path), False)
-    pass
 FONTSIZE = 16
 SEARCH_FONTSIZE = 24
 
@@ -60,6 +58,8 @@ class CharacterSelectScene(engine.Scene):
     unlock_filtering: bool
     exclusive_filtering: bool
     energy_filtering: list[bool]
+    name_filter_text: str
+    name_filter_entry: bool
     dragging_picture: bool
     scene_manager: "SceneManager"
     drag_offset: tuple[int, int]
@@ -90,6 +90,8 @@ class CharacterSelectScene(engine.Scene):
         self.unlock_filtering = False
         self.exclusive_filtering = False
         self.energy_filtering = [False, False, False, False, False]
+        self.name_filter_text = ""
+        self.name_filter_entry = False
         self.filtered_characters = []
         self.drag_offset = (0, 0)
         self.player = None
@@ -107,6 +109,7 @@ class CharacterSelectScene(engine.Scene):
         self.character_info_region = self.region.subregion(15, 15, 770, 260)
         self.start_match_region = self.region.subregion(130, 355, 100, 40)
         self.how_to_region = self.region.subregion(235, 355, 100, 40)
+        self.practice_region = self.region.subregion(340, 355, 100, 40)
         self.ranked_region = self.region.subregion(15, 355, 110, 40)
         
         self.player_profile_region = self.region.subregion(15, 20, 200, 100)
@@ -115,6 +118,7 @@ class CharacterSelectScene(engine.Scene):
         self.character_scroll_selection_region = self.region.subregion(15, 400, 770, 285)
         self.scroll_bar_region = self.character_scroll_selection_region.subregion(485, 2, 20, 280)
         self.filter_region = self.character_scroll_selection_region.subregion(515, 240, 0, 0)
+        self.name_filter_region = self.character_scroll_selection_region.subregion(515, 126, 245, 20)
         self.player_profile_region = self.character_scroll_selection_region.subregion(515, 20, 0, 0)
         self.team_region = self.character_scroll_selection_region.subregion(515, 150, 245, 75)
         self.mission_region = self.region.subregion(210, 158, 0, 0)
@@ -150,24 +154,20 @@ class CharacterSelectScene(engine.Scene):
         self.quick_match_button = self.render_bordered_text(self.font, "Quick Match", WHITE, BLACK, self.quick_match_button, 9, 9, 1)
         self.quick_match_button = self.border_sprite(self.quick_match_button, AQUA, 2)
         self.quick_match_button.click += self.quick_match_start_click
+        self.practice_button = self.ui_factory.from_color(sdl2.ext.BUTTON, MENU_TRANSPARENT, (100, 40))
+        self.practice_button = self.render_bordered_text(self.font, "Practice", WHITE, BLACK, self.practice_button, 21, 9, 1)
+        self.practice_button = self.border_sprite(self.practice_button, AQUA, 2)
+        self.practice_button.click += self.practice_start_click
         self.ranked_match_button = self.ui_factory.from_color(sdl2.ext.BUTTON, MENU_TRANSPARENT, (110, 40))
         self.ranked_match_button = self.render_bordered_text(self.font, "Ranked Match", WHITE, BLACK, self.ranked_match_button, 5, 9, 1)
         self.ranked_match_button = self.border_sprite(self.ranked_match_button, AQUA, 2)
         self.ranked_match_button.click += self.ranked_match_start_click
+        # Full-size roster buttons, built once. Rows cut off by the edge of
+        # the roster get cropped buttons of their own on each redraw.
         self.character_sprites = {}
         for k, v in get_character_db().items():
             if not v.hidden:
-                image = self.border_image(self.scene_manager.surfaces[k + "allyprof"].resize((75, 75)), 1)
-                sprite = self.ui_factory.from_surface(
-                    sdl2.ext.BUTTON,
-                    self.get_scaled_surface(image, 75, 75), free=True)
-                sprite.click += self.character_click
-                sprite.pressed += self.char_select_press
-                sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], 75, 75))
-                sprite.filter_cover.click += self.character_click
-                sprite.filter_cover.character = v
-                sprite.character = v
-                self.character_sprites[k] = sprite
+                self.character_sprites[k] = self.make_character_button(v, roster_thumbnail(k))
         
         self.character_info_prof = self.ui_factory.from_color(
             sdl2.ext.BUTTON,
@@ -267,6 +267,7 @@ class CharacterSelectScene(engine.Scene):
             self.render_main_character_info()
         self.render_tutorial_button()
         self.render_quick_match_button()
+        self.render_practice_button()
         self.render_ranked_match_button()
         self.render_character_scroll_selection()
         self.render_search_panel()
@@ -315,6 +316,21 @@ class CharacterSelectScene(engine.Scene):
             self.filter_region.add_sprite(self.ex_border, 211, 3)
         self.filter_region.add_sprite(self.ex_icon, 213, 5)
 
+    def render_name_filter(self):
+        self.name_filter_region.clear()
+        # A fresh entry each time, since text is drawn onto the entry's surface.
+        name_filter_box = self.ui_factory.from_color(sdl2.ext.TEXTENTRY, WHITE, self.name_filter_region.size())
+        name_filter_box.pressed += self.name_filter_click
+        name_filter_box.input += self.edit_name_filter_text
+        name_filter_box.text = self.name_filter_text
+        if self.name_filter_text:
+            self.render_text(self.font, self.name_filter_text, BLACK, name_filter_box, 4, 1)
+        elif not self.name_filter_entry:
+            self.render_text(self.font, "Search names or ability types", DARK_GRAY, name_filter_box, 4, 1)
+        if self.name_filter_entry:
+            self.scene_manager.uiprocessor.activate(name_filter_box)
+        self.add_bordered_sprite(self.name_filter_region, name_filter_box, ELECTRIC_BLUE if self.name_filter_entry else BLACK, 0, 0)
+
     def render_search_panel(self):
         self.search_panel_region.clear()
         if self.clicked_search:
@@ -523,48 +539,31 @@ class CharacterSelectScene(engine.Scene):
         if len(self.selected_team) == 3:
             self.start_match_region.add_sprite(self.quick_match_button, 0, 0)
 
+    def render_practice_button(self):
+        self.practice_region.clear()
+        if len(self.selected_team) == 3:
+            self.practice_region.add_sprite(self.practice_button, 0, 0)
+
     
     
-    def scroll_character_scroll_selection(self):     
-        self.character_scroll_selection_region.clear()
-        background = self.sprite_factory.from_color(MENU_TRANSPARENT, (self.character_scroll_selection_region.size()[0], self.character_scroll_selection_region.size()[1] + 8))
-        background = self.border_sprite(background, AQUA, 2)
-        scroll_bar = self.ui_factory.from_color(sdl2.ext.BUTTON, DULL_AQUA, self.scroll_bar_region.size())
-        scroll_bar.pressed += self.click_scroll_bar
-        self.character_scroll_selection_region.add_sprite(background, 0, -4)
-        self.scroll_bar_region.add_sprite(scroll_bar, 0, 0)
-        self.render_filter_options()
-        self.render_team_display()
-        self.render_player_profile()
-        if self.scrolling:
-            self.scroll_bar_y = self.scene_manager.mouse_y - 402 - self.scroll_button.click_offset
-            if self.scroll_bar_y > (280 - self.scroll_button.size[1]):
-                self.scroll_bar_y = 280 - self.scroll_button.size[1]
-            elif self.scroll_bar_y < 0:
-                self.scroll_bar_y = 0
-        self.character_sprites.clear()
-        for k, v in get_character_db().items():
-            if not v.hidden:
-                image = self.border_image(self.scene_manager.surfaces[k + "allyprof"].resize((75, 75)), 1)
-                sprite = self.ui_factory.from_surface(
-                    sdl2.ext.BUTTON,
-                    self.get_scaled_surface(self.border_image(image, 1), 75, 75), free=True)
-                sprite.click += self.character_click
-                sprite.pressed += self.char_select_press
-                sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], 75, 75))
-                sprite.filter_cover.character = v
-                sprite.filter_cover.click += self.character_click
-                sprite.character = v
-                self.character_sprites[k] = sprite
-        
+    def make_character_button(self, character: Character, image: Image.Image) -> sdl2.ext.SoftwareSprite:
+        sprite = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(image), free=True)
+        sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], image.width, image.height))
+        sprite.click += self.character_click
+        sprite.pressed += self.char_select_press
+        sprite.filter_cover.click += self.character_click
+        sprite.character = character
+        sprite.filter_cover.character = character
+        return sprite
+
+    def render_roster_buttons(self):
+        """Lay out the buttons of the filtered roster rows in view."""
         self.scroll_position = self.scroll_bar_y / (280 - self.scroll_button.size[1])
         
         CHARS_PER_ROW = 6
         BUTTON_HEIGHT = 75
-        BUTTON_WIDTH = 75
         PADDING = 5
         BUTTON_SPACE = BUTTON_HEIGHT + PADDING
-        #TODO add filtering here
         characters = self.get_filtered_characters_list()
         CHARACTER_COUNT = len(characters)
         ROW_COUNT = math.ceil(CHARACTER_COUNT / CHARS_PER_ROW)
@@ -574,42 +573,48 @@ class CharacterSelectScene(engine.Scene):
             VERT_OFFSET = 0
         else:
             VERT_OFFSET = int(TOTAL_HEIGHT * self.scroll_position)
-        for i, character in enumerate(characters):
-            row = i // CHARS_PER_ROW
-            column = i % CHARS_PER_ROW
+        first_row = max(VERT_OFFSET // BUTTON_SPACE, 0)
+        last_row = min((VERT_OFFSET + VIEWPORT_HEIGHT) // BUTTON_SPACE, ROW_COUNT - 1)
+        for row in range(first_row, last_row + 1):
             ROW_TOP = PADDING + (row * BUTTON_SPACE) - VERT_OFFSET
-            BASE_ROW_TOP = PADDING + (row * BUTTON_SPACE)
-            ROW_BOTTOM = BASE_ROW_TOP + BUTTON_HEIGHT
-            if (row + 1) * BUTTON_SPACE > VERT_OFFSET and ROW_TOP < self.character_scroll_selection_region.size()[1]:
-                image = self.border_image(self.scene_manager.surfaces[character.name + "allyprof"].resize((75, 75)), 1)
+            if ROW_TOP + BUTTON_HEIGHT <= 0 or ROW_TOP >= VIEWPORT_HEIGHT:
+                continue
+            for column, character in enumerate(characters[row * CHARS_PER_ROW:(row + 1) * CHARS_PER_ROW]):
+                sprite = self.character_sprites[character.name]
+                top = ROW_TOP
                 if ROW_TOP < 0:
-                    image = image.crop( (0, abs(ROW_TOP), 75, 75))
-                    ROW_TOP = 0
-                    sprite = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(image), free=True)
-                    sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], 75, image.height))
-                    sprite.click += self.character_click
-                    sprite.pressed += self.char_select_press
-                    sprite.filter_cover.click += self.character_click
-                    sprite.character = character
-                    sprite.filter_cover.character = character
-                    self.character_sprites[character.name] = sprite
-                elif ROW_BOTTOM - VERT_OFFSET > VIEWPORT_HEIGHT:
-                    image = image.crop( (0, 0, 75, min(VIEWPORT_HEIGHT - ROW_TOP, 75) ))
-                    sprite = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(image), free=True)
-                    sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], 75, image.height))
-                    sprite.click += self.character_click
-                    sprite.pressed += self.char_select_press
-                    sprite.filter_cover.click += self.character_click
-                    sprite.character = character
-                    sprite.filter_cover.character = character
-                    self.character_sprites[character.name] = sprite
-                self.character_scroll_selection_region.add_sprite(self.character_sprites[character.name], PADDING + (BUTTON_SPACE * column), ROW_TOP)
-                if character.selected or not self.player.missions[character.name][5] or (self.dragging_character == character.name):
-                    self.character_scroll_selection_region.add_sprite(self.character_sprites[character.name].filter_cover, PADDING + (BUTTON_SPACE * column), ROW_TOP)
-                
+                    image = roster_thumbnail(character.name).crop((0, -ROW_TOP, 75, 75))
+                    sprite = self.make_character_button(character, image)
+                    top = 0
+                elif ROW_TOP + BUTTON_HEIGHT > VIEWPORT_HEIGHT:
+                    image = roster_thumbnail(character.name).crop((0, 0, 75, VIEWPORT_HEIGHT - ROW_TOP))
+                    sprite = self.make_character_button(character, image)
+                self.character_scroll_selection_region.add_sprite(sprite, PADDING + (BUTTON_SPACE * column), top)
+                if self.is_selected(character.name) or not self.player.missions[character.name][5] or (self.dragging_character == character.name):
+                    self.character_scroll_selection_region.add_sprite(sprite.filter_cover, PADDING + (BUTTON_SPACE * column), top)
         if CHARACTER_COUNT > 18:
             self.scroll_bar_region.add_sprite(self.scroll_button, 0, self.scroll_bar_y)
-        
+
+    def scroll_character_scroll_selection(self):     
+        self.character_scroll_selection_region.clear()
+        background = self.sprite_factory.from_color(MENU_TRANSPARENT, (self.character_scroll_selection_region.size()[0], self.character_scroll_selection_region.size()[1] + 8))
+        background = self.border_sprite(background, AQUA, 2)
+        scroll_bar = self.ui_factory.from_color(sdl2.ext.BUTTON, DULL_AQUA, self.scroll_bar_region.size())
+        scroll_bar.pressed += self.click_scroll_bar
+        self.character_scroll_selection_region.add_sprite(background, 0, -4)
+        self.scroll_bar_region.add_sprite(scroll_bar, 0, 0)
+        self.render_filter_options()
+        self.render_name_filter()
+        self.render_team_display()
+        self.render_player_profile()
+        if self.scrolling:
+            self.scroll_bar_y = self.scene_manager.mouse_y - 402 - self.scroll_button.click_offset
+            if self.scroll_bar_y > (280 - self.scroll_button.size[1]):
+                self.scroll_bar_y = 280 - self.scroll_button.size[1]
+            elif self.scroll_bar_y < 0:
+                self.scroll_bar_y = 0
+        self.render_roster_buttons()
+
     
     def render_character_scroll_selection(self):
         self.character_scroll_selection_region.clear()
@@ -621,6 +626,7 @@ class CharacterSelectScene(engine.Scene):
         self.scroll_bar_region.add_sprite(scroll_bar, 0, 0)
         self.render_team_display()
         self.render_filter_options()
+        self.render_name_filter()
         self.render_player_profile()
         if self.scrolling:
             self.scroll_bar_y = self.scene_manager.mouse_y - 402 - self.scroll_button.click_offset
@@ -629,57 +635,7 @@ class CharacterSelectScene(engine.Scene):
             elif self.scroll_bar_y < 0:
                 self.scroll_bar_y = 0
 
-        self.scroll_position = self.scroll_bar_y / (280 - self.scroll_button.size[1])
-        
-        CHARS_PER_ROW = 6
-        BUTTON_HEIGHT = 75
-        PADDING = 5
-        BUTTON_SPACE = BUTTON_HEIGHT + PADDING
-        #TODO add filtering here
-        characters = self.get_filtered_characters_list()
-        CHARACTER_COUNT = len(characters)
-        ROW_COUNT = math.ceil(CHARACTER_COUNT / CHARS_PER_ROW)
-        VIEWPORT_HEIGHT = self.character_scroll_selection_region.size()[1]
-        TOTAL_HEIGHT = (ROW_COUNT * BUTTON_SPACE) - VIEWPORT_HEIGHT + 5
-        if CHARACTER_COUNT <= 18:
-            VERT_OFFSET = 0
-        else:
-            VERT_OFFSET = int(TOTAL_HEIGHT * self.scroll_position)
-        
-        for i, character in enumerate(characters):
-            row = i // CHARS_PER_ROW
-            column = i % CHARS_PER_ROW
-            ROW_TOP = PADDING + (row * BUTTON_SPACE) - VERT_OFFSET
-            BASE_ROW_TOP = PADDING + (row * BUTTON_SPACE)
-            ROW_BOTTOM = BASE_ROW_TOP + BUTTON_SPACE
-            if (row + 1) * BUTTON_SPACE > VERT_OFFSET and ROW_TOP < self.character_scroll_selection_region.size()[1]:
-                image = self.border_image(self.scene_manager.surfaces[character.name + "allyprof"].resize((75, 75)), 1)
-                if ROW_TOP < 0:
-                    image = image.crop( (0, abs(ROW_TOP), 75, 75))
-                    ROW_TOP = 0
-                    sprite = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(image), free=True)
-                    sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], 75, image.height))
-                    sprite.click += self.character_click
-                    sprite.pressed += self.char_select_press
-                    sprite.filter_cover.click += self.character_click
-                    sprite.character = character
-                    sprite.filter_cover.character = character
-                    self.character_sprites[character.name] = sprite
-                elif ROW_BOTTOM - VERT_OFFSET > VIEWPORT_HEIGHT:
-                    image = image.crop( (0, 0, 75, VIEWPORT_HEIGHT - ROW_TOP ))
-                    sprite = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(image), free=True)
-                    sprite.filter_cover = self.ui_factory.from_surface(sdl2.ext.BUTTON, self.get_scaled_surface(self.scene_manager.surfaces["locked"], 75, image.height))
-                    sprite.click += self.character_click
-                    sprite.pressed += self.char_select_press
-                    sprite.filter_cover.click += self.character_click
-                    sprite.character = character
-                    sprite.filter_cover.character = character
-                    self.character_sprites[character.name] = sprite
-                self.character_scroll_selection_region.add_sprite(self.character_sprites[character.name], PADDING + (BUTTON_SPACE * column), ROW_TOP)
-                if character.selected or not self.player.missions[character.name][5] or (self.dragging_character == character.name):
-                    self.character_scroll_selection_region.add_sprite(self.character_sprites[character.name].filter_cover, PADDING + (BUTTON_SPACE * column), ROW_TOP)
-        if CHARACTER_COUNT > 18:
-            self.scroll_bar_region.add_sprite(self.scroll_button, 0, self.scroll_bar_y)
+        self.render_roster_buttons()
         if self.dragging_picture:
             sprite = self.sprite_factory.from_surface(self.get_scaled_surface(self.border_image(self.scene_manager.surfaces[self.dragging_character + "allyprof"], 1), 75, 75), free=True)
             self.team_region.add_sprite(sprite, self.scene_manager.mouse_x - self.drag_offset[0] - self.team_region.x, self.scene_manager.mouse_y - self.drag_offset[1] - self.team_region.y)
@@ -701,7 +657,7 @@ class CharacterSelectScene(engine.Scene):
 
     def char_select_press(self, button, _sender):
         if hasattr(button, "character") and button.character and not self.window_up:
-            if not get_character_db()[button.character.name].selected and self.player.missions[button.character.name][5]:
+            if not self.is_selected(button.character.name) and self.player.missions[button.character.name][5]:
                 self.char_select_pressed = True
                 self.drag_offset = self.get_click_coordinates(button)
                 self.dragging_character = button.character.name
@@ -727,9 +683,11 @@ class CharacterSelectScene(engine.Scene):
         self.scrolling = True
         button.click_offset = self.get_click_coordinates(button)[1]
 
+    def is_selected(self, name: str) -> bool:
+        return any(character.name == name for character in self.selected_team)
+
     def add_character(self, char):
         character = get_character_db()[char]
-        character.selected = True
         self.selected_team.append(character)
         self.team_display[len(self.selected_team) - 1].character = character
 
@@ -776,6 +734,7 @@ class CharacterSelectScene(engine.Scene):
         self.dragging_picture = False
         self.dragging_character = ""
         self.render_quick_match_button()
+        self.render_practice_button()
         self.render_team_display()
         self.render_character_scroll_selection()
         
@@ -793,6 +752,24 @@ class CharacterSelectScene(engine.Scene):
         self.render_filter_options()
         self.scroll_character_scroll_selection()
 
+    def name_filter_click(self, button, sender):
+        self.name_filter_entry = True
+        self.render_name_filter()
+
+    def edit_name_filter_text(self, entry, event):
+        self.name_filter_text = entry.text
+        self.apply_name_filter()
+
+    def name_filter_backspace(self):
+        if self.name_filter_entry and self.name_filter_text:
+            self.name_filter_text = self.name_filter_text[:-1]
+            self.apply_name_filter()
+
+    def apply_name_filter(self):
+        self.page_on_display = 1
+        self.scroll_bar_y = 0
+        self.scroll_character_scroll_selection()
+
     def lock_filter_click(self, button, sender):
         self.unlock_filtering = not self.unlock_filtering
         self.page_on_display = 1
@@ -837,11 +814,9 @@ class CharacterSelectScene(engine.Scene):
             self.player_profile_lock.acquire()
             try:
                 self.player_profile = Image.open(file)
-                self.player_profile = self.player_profile.resize((100, 100))
+                self.player_profile = self.player_profile.resize(AVATAR_SIZE)
                 self.player.avatar = self.player_profile
-                image = {"mode": self.player_profile.mode, "size": self.player_profile.size, "pixels": self.player_profile.tobytes()}
-                msg = pickle.dumps(image)
-                self.scene_manager.connection.update_avatar(msg)
+                self.scene_manager.connection.update_avatar(encode_avatar(self.player_profile))
             except:
                 pass
             self.player_profile_lock.release()
@@ -936,7 +911,6 @@ class CharacterSelectScene(engine.Scene):
             self.removing_from_team = False    
             for character in self.selected_team:
                 if character.name == self.dragging_character:
-                    get_character_db()[character.name].selected = False
                     self.selected_team.remove(character)
                     self.check_code(character.name, False)
                     
@@ -955,6 +929,14 @@ class CharacterSelectScene(engine.Scene):
             self.queue_type = "Quick Match"
             self.start_quick_match_searching()
 
+    def practice_start_click(self, _button, _sender):
+        if not self.clicked_search and not self.window_up and len(self.selected_team) == 3:
+            play_sound(self.scene_manager.sounds["page"])
+            player_team = [Character(character.name) for character in self.selected_team]
+            enemy_team = [Character(character.name)
+                          for character in random.sample(get_roster_index().characters, 3)]
+            self.scene_manager.start_practice(self.player, player_team, enemy_team)
+
     def ranked_match_start_click(self, _button, _sender):
         if not self.clicked_search and self.scene_manager.connected and not self.window_up:
             self.queue_type = "Ranked Match"
@@ -964,8 +946,7 @@ class CharacterSelectScene(engine.Scene):
 
     def start_ranked_searching(self):
         self.clicked_search = True
-        image = {"mode": self.player_profile.mode, "size": self.player_profile.size, "pixels": self.player_profile.tobytes()}
-        player_pouch = [self.player_name, self.player_wins, self.player_losses, image["mode"], image["size"], image["pixels"]]
+        player_pouch = [self.player_name, self.player_wins, self.player_losses, *pouch_avatar(self.player_profile)]
         self.scene_manager.connection.send_ranked_match_start_package(player_pouch)
         self.window_up = True
         self.render_search_panel()
@@ -974,32 +955,19 @@ class CharacterSelectScene(engine.Scene):
         play_sound(self.scene_manager.sounds["page"])
         self.clicked_search = True
         names = [x.name for x in self.selected_team]
-        image = {"mode": self.player_profile.mode, "size": self.player_profile.size, "pixels": self.player_profile.tobytes()}
-        player_pouch = [self.player_name, self.player_wins, self.player_losses, image["mode"], image["size"], image["pixels"]]
+        player_pouch = [self.player_name, self.player_wins, self.player_losses, *pouch_avatar(self.player_profile)]
         self.scene_manager.connection.send_quick_match_start_package(names, player_pouch)
         self.window_up = True
         self.render_search_panel()
     
     def get_filtered_characters_list(self) -> list[Character]:
-        if not self.unlock_filtering:
-            filtered_characters = [character for character in get_character_db().values() if not character.hidden]
-        else:
-            filtered_characters = [char for char in get_character_db().values() if self.player.missions[char.name][5] and not char.hidden]
-            
-
-        if not self.exclusive_filtering:
-            for i, filter in enumerate(self.energy_filtering):
-                if filter:
-                    filtered_characters = [char for char in filtered_characters if char.uses_energy(i)]
-        else:
-            excluded_types = []
-            for i, filter in enumerate(self.energy_filtering):
-                if not filter:
-                    excluded_types.append(i)
-            filtered_characters = [char for char in filtered_characters if not char.uses_energy_mult(excluded_types)]
-            for i, filter in enumerate(self.energy_filtering):
-                if filter:
-                    filtered_characters = [char for char in filtered_characters if char.uses_energy(i)]
+        required = sum(1 << i for i, filter in enumerate(self.energy_filtering) if filter)
+        excluded = 0
+        if self.exclusive_filtering:
+            excluded = sum(1 << i for i, filter in enumerate(self.energy_filtering) if not filter)
+        filtered_characters = get_roster_index().filter(required, excluded, self.name_filter_text)
+        if self.unlock_filtering:
+            filtered_characters = [char for char in filtered_characters if self.player.missions[char.name][5]]
         return filtered_characters
     
     def auto_queue(self):
@@ -1021,21 +989,26 @@ class CharacterSelectScene(engine.Scene):
         self.player_wins = wins
         self.player_losses = losses
         self.player_medals = medals
-        reset_character_db()
         
         if ava_code:
-            
-            new_image = pickle.loads(ava_code)
-
-            self.player_profile = Image.frombytes(mode = new_image["mode"], size = new_image["size"], data=new_image["pixels"])
+            try:
+                self.player_profile = decode_avatar(bytes(ava_code))
+            except (OSError, ValueError) as e:
+                logging.warning("Could not read the stored avatar: %s", e)
         
         self.player = Player(self.player_name, self.player_wins, self.player_losses, self.player_profile, mission_data, self.player_medals, missions_complete=mission_complete)
         
         self.full_render()
 
+    def read_enemy_avatar(self, enemy_pouch) -> Image:
+        try:
+            return read_pouch_avatar(enemy_pouch[3], (enemy_pouch[4], enemy_pouch[5]), enemy_pouch[6])
+        except (OSError, ValueError) as e:
+            logging.warning("Could not read the opponent's avatar: %s", e)
+            return self.scene_manager.surfaces["default_prof"]
+
     def start_ranked_battle(self, enemy_pouch):
-        enemy_pouch[6] = bytes(enemy_pouch[6])
-        enemy_ava = Image.frombytes(enemy_pouch[3], (enemy_pouch[4], enemy_pouch[5]), enemy_pouch[6])
+        enemy_ava = self.read_enemy_avatar(enemy_pouch)
         
         enemy = Player(enemy_pouch[0], enemy_pouch[1], enemy_pouch[2], enemy_ava)
         self.scene_manager.start_draft(self.player, enemy)
@@ -1046,22 +1019,17 @@ class CharacterSelectScene(engine.Scene):
            In-Game Scene after receiving an enemy start package from the server"""
         enemy_team = [Character(name) for name in enemy_names]
         
-        enemy_pouch[6] = bytes(enemy_pouch[6])
-
-        enemy_ava = Image.frombytes(enemy_pouch[3], (enemy_pouch[4], enemy_pouch[5]), enemy_pouch[6])
+        enemy_ava = self.read_enemy_avatar(enemy_pouch)
 
         enemy = Player(enemy_pouch[0], enemy_pouch[1], enemy_pouch[2], enemy_ava)
 
         
 
-        for character in self.selected_team:
-            character.dead = False
-            character.hp = 200
-            character.current_effects = []
-            character.targeted = False
-            character.acted = False
+        # The selected characters are the roster's own and stay display-only;
+        # mission progress and battle state go on fresh copies.
+        player_team = [Character(character.name) for character in self.selected_team]
 
-        self.scene_manager.start_battle(self.selected_team, enemy_team, self.player, enemy, energy, seed)
+        self.scene_manager.start_battle(player_team, enemy_team, self.player, enemy, energy, seed)
 
 
     
@@ -1,11 +1,12 @@
 from asyncio.streams import StreamReader, StreamWriter
+import asyncio
 import socket
 import threading
 import os
 import pathlib
 import sys
 import requests
-from animearena.byte_buffer import ByteBuffer
+from animearena import protocol
 from animearena.character import Character
 from typing import Callable
 import typing
@@ -39,6 +40,7 @@ class ConnectionHandler:
 
     writer: StreamWriter
     reader: StreamReader
+    framing: protocol.Framing
     waiting_for_opponent: bool
     waiting_for_login: bool
     waiting_for_registration: bool
@@ -49,6 +51,7 @@ class ConnectionHandler:
         self.scene_manager = scene_manager
         self.waiting_for_opponent = False
         self.waiting_for_login = False
+        self.framing = protocol.Framing.SENTINEL
         self.packets: dict[int, Callable] = {
             0: self.handle_quick_match_start_package,
             1: self.handle_match_communication,
@@ -66,6 +69,23 @@ class ConnectionHandler:
             13: self.handle_draft_timeout,
             14: self.handle_draft_disconnection
         }
+
+    def send_packet(self, schema: protocol.PacketSchema, *args, **kwargs):
+        return self.writer.write(protocol.frame(schema.encode(*args, **kwargs), self.framing))
+
+    def run_off_loop(self, func: Callable, args: tuple, on_result: Callable, on_error: Callable):
+        """Run blocking work (the scrypt hashes) in the event loop's default
+        executor, so frames keep drawing, and hand the result back to
+        on_result on the loop."""
+        def finish(future: asyncio.Future):
+            try:
+                result = future.result()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("%s failed", func.__name__)
+                on_error()
+            else:
+                on_result(result)
+        asyncio.get_running_loop().run_in_executor(None, func, *args).add_done_callback(finish)
     
     def handle_draft_disconnection(self, data:list[bytes]):
         self.scene_manager.draft_scene.handle_disconnect()
@@ -98,10 +118,7 @@ class ConnectionHandler:
         os.execve(final_path, [final_path,], new_env)
         
     def handle_version_check(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        newest_version = buffer.read_string()
+        newest_version = protocol.SERVER_VERSION_CHECK.decode(data).version
         print(f"Running on version: {VERSION}. Newest version: {newest_version}")
         if VERSION != newest_version:
             
@@ -120,23 +137,12 @@ class ConnectionHandler:
                     old_file = f.read().strip()
                 os.remove("animearenatemp.config")
                 os.remove(abs_path / old_file)
-        buffer.clear()
 
     def send_version_request(self):
-        buffer = ByteBuffer()
-        buffer.write_int(10)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_VERSION_REQUEST)
 
     def handle_surrender_notification(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        mission_packages = []
-        for _ in range(3):
-            mission_package = [buffer.read_int() for i in range(5)]
-            mission_packages.append(mission_package)
+        mission_packages = protocol.SERVER_SURRENDER_NOTIFICATION.decode(data).mission_packages
         self.scene_manager.battle_scene.ingest_mission_packages(mission_packages)
         self.scene_manager.battle_scene.win_game(surrendered = True)
 
@@ -149,305 +155,129 @@ class ConnectionHandler:
             pass
 
     def send_search_cancellation(self):
-        buffer = ByteBuffer()
-        buffer.write_int(7)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_SEARCH_CANCELLATION)
 
     def send_surrender(self, mission_progress_packages):
-        buffer = ByteBuffer()
-        buffer.write_int(6)
-
-        for mission_progress_package in mission_progress_packages:
-            for mission_progress in mission_progress_package:
-                buffer.write_int(mission_progress)
-
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_SURRENDER, mission_progress_packages)
 
     def update_avatar(self, avatar: bytes):
-        buffer = ByteBuffer()
-        buffer.write_int(4)
-        buffer.write_int(len(list(avatar)))
-        buffer.write_bytes(list(avatar))
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_AVATAR_UPDATE, avatar)
     
     def handle_registration(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        message = buffer.read_string()
-        buffer.clear()
+        message = protocol.SERVER_REGISTRATION.decode(data).message
         self.scene_manager.login_scene.receive_message(message)
         self.scene_manager.login_scene.clicked_register = False
 
     def handle_login_failure(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        message = buffer.read_string()
-        buffer.clear()
+        message = protocol.SERVER_LOGIN_FAILURE.decode(data).message
         self.scene_manager.login_scene.receive_message(message)
         self.scene_manager.login_scene.clicked_login = False
+        self.scene_manager.password_digest = ""
 
     def handle_login_success(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        wins = buffer.read_int()
-        losses = buffer.read_int()
-        medals = buffer.read_int()
-        mission_data = buffer.read_string()
-        ava_code = None
-        has_avatar = buffer.read_int()
-        if has_avatar:
-            length = buffer.read_int()
-            ava_code = bytes(buffer.read_bytes(length))
-    
-        self.scene_manager.login(self.scene_manager.username_raw, wins, losses, medals, mission_data, ava_code)
-
-        buffer.clear()
+        packet = protocol.SERVER_LOGIN_SUCCESS.decode(data)
+        self.scene_manager.login(self.scene_manager.username_raw, packet.wins, packet.losses, packet.medals, packet.mission_data, packet.avatar)
 
     def send_player_update(self, player):
-        buffer = ByteBuffer()
-        buffer.write_int(5)
-        buffer.write_int(player.wins)
-        buffer.write_int(player.losses)
-        buffer.write_int(player.medals)
         mission_strings = []
         for name, nums in player.missions.items():
             mission_strings.append(f"{name}/{nums[0]}/{nums[1]}/{nums[2]}/{nums[3]}/{nums[4]}/{nums[5]}")
         mission_string = "|".join(mission_strings)
-        buffer.write_string(mission_string)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_PLAYER_UPDATE, player.wins, player.losses, player.medals, mission_string)
 
     def handle_match_communication(self, data:list[bytes]):
 
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        timeout = bool(buffer.read_int())
-        used_ability_count = buffer.read_int()
-        executed_abilities = list()
-        for i in range(used_ability_count):
-            executed_ability = AbilityMessage()
-            executed_ability.assign_user_id(buffer.read_int())
-            executed_ability.assign_ability_id(buffer.read_int())
-            executed_ability.set_primary_target(buffer.read_int())
-            ally_targets = buffer.read_int()
-            for j in range(ally_targets):
-                executed_ability.add_to_ally_targets(buffer.read_int())
-            enemy_targets = buffer.read_int()
-            for j in range(enemy_targets):
-                executed_ability.add_to_enemy_targets(buffer.read_int())
-            executed_abilities.append(executed_ability)
-        execution_order = list()
-        execution_order_count = buffer.read_int()
-        for i in range(execution_order_count):
-            execution_order.append(buffer.read_int())
-        for i in range(4):
-            buffer.read_int()
-        
-        potential_energy = list()
-
-        for i in range(6):
-            potential_energy.append(buffer.read_int())
+        packet = protocol.SERVER_MATCH_COMMUNICATION.decode(data)
+        timeout = bool(packet.timeout)
+        executed_abilities = packet.abilities
+        execution_order = packet.execution_order
+        potential_energy = packet.potential_energy
 
-        
         if self.scene_manager.battle_scene.skipping_animations:
             self.scene_manager.battle_scene.enemy_execution_loop(executed_abilities, execution_order, potential_energy, timeout)
         else:
             self.scene_manager.battle_scene.start_enemy_execution(executed_abilities, execution_order, potential_energy, timeout)
-        buffer.clear()
   
     def send_registration(self, username: str, password: str):
-        buffer = ByteBuffer()
-        
-        buffer.write_int(3)
-        buffer.write_string(username)
-        
-        digest = hash_the_password(password)
-        buffer.write_string(digest)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        if self.writer.write(buffer.get_byte_array()):
+        self.run_off_loop(hash_the_password, (password,),
+                          lambda digest: self.send_registration_digest(username, digest),
+                          self.registration_hash_failed)
+
+    def send_registration_digest(self, username: str, digest: str):
+        self.scene_manager.password_digest = digest
+        if self.send_packet(protocol.CLIENT_REGISTRATION, username, digest):
             self.waiting_for_registration = True
-        buffer.clear()
+
+    def registration_hash_failed(self):
+        self.scene_manager.login_scene.clicked_register = False
 
     def request_login_nonce(self):
-        buffer = ByteBuffer()
-        buffer.write_int(11)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_LOGIN_NONCE_REQUEST)
     
     def handle_login_nonce(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        nonce_key = buffer.read_int()
-        digest = hash_the_password(self.scene_manager.password_raw)
-        nonced_digest = nonce_the_digest(digest, nonce_key)
-        self.send_login_attempt(nonced_digest)
+        nonce_key = protocol.SERVER_LOGIN_NONCE.decode(data).nonce
+        password = self.scene_manager.password_raw
+        if password:
+            # A newly entered password is salted and hashed once, and only
+            # the digest is kept; later logins this session, such as after a
+            # reconnect, only pay for the nonce round.
+            self.scene_manager.password_raw = ""
+            self.run_off_loop(hash_the_password, (password,),
+                              lambda digest: self.send_login_digest(digest, nonce_key),
+                              self.login_hash_failed)
+        elif self.scene_manager.password_digest:
+            self.send_login_digest(self.scene_manager.password_digest, nonce_key)
+        else:
+            self.login_hash_failed()
+
+    def send_login_digest(self, digest: str, nonce: int):
+        self.scene_manager.password_digest = digest
+        self.run_off_loop(nonce_the_digest, (digest, nonce),
+                          self.send_login_attempt, self.login_hash_failed)
+
+    def login_hash_failed(self):
+        self.scene_manager.login_scene.clicked_login = False
         
     def send_login_attempt(self, password_digest: str):
-        buffer = ByteBuffer()
-        buffer.write_int(2)
-        buffer.write_string(self.scene_manager.username_raw)
-        buffer.write_string(password_digest)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        if self.writer.write(buffer.get_byte_array()):
+        if self.send_packet(protocol.CLIENT_LOGIN_ATTEMPT, self.scene_manager.username_raw, password_digest):
             self.waiting_for_login = True
-        buffer.clear()
 
     def send_match_ending(self, won: bool):
-        buffer = ByteBuffer()
-        buffer.write_int(8)
-        if won:
-            buffer.write_int(1)
-        else:
-            buffer.write_int(0)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_MATCH_ENDING, int(won))
 
     def send_ranked_match_start_package(self, player_pouch: bytes):
-        buffer = ByteBuffer()
-        buffer.write_int(12)
-        
-        buffer.write_string(player_pouch[0])
-        buffer.write_int(player_pouch[1])
-        buffer.write_int(player_pouch[2])
-        buffer.write_string(player_pouch[3])
-        buffer.write_int(player_pouch[4][0])
-        buffer.write_int(player_pouch[4][1])
-        buffer.write_int(len(player_pouch[5]))
-        buffer.write_bytes(player_pouch[5])
-        
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        if self.writer.write(buffer.get_byte_array()):
+        if self.send_packet(protocol.CLIENT_RANKED_MATCH_START, *player_pouch):
             self.waiting_for_opponent = True
-        buffer.clear()
 
     def send_quick_match_start_package(self, names: list[str], player_pouch: bytes):
-        buffer = ByteBuffer()
-        buffer.write_int(0)
-        for name in names:
-            buffer.write_string(name)
-        
-        buffer.write_string(player_pouch[0])
-        buffer.write_int(player_pouch[1])
-        buffer.write_int(player_pouch[2])
-        buffer.write_string(player_pouch[3])
-        buffer.write_int(player_pouch[4][0])
-        buffer.write_int(player_pouch[4][1])
-        buffer.write_int(len(player_pouch[5]))
-        buffer.write_bytes(player_pouch[5])
-
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        if self.writer.write(buffer.get_byte_array()):
+        if self.send_packet(protocol.CLIENT_QUICK_MATCH_START, names, *player_pouch):
             self.waiting_for_opponent = True
-        buffer.clear()
     
     def send_match_communication(self, ability_messages: list[AbilityMessage], execution_order: list[int], random_spent: list[int]):
-        buffer = ByteBuffer()
-        buffer.write_int(1)
-        buffer.write_int(0)
-        buffer.write_int(len(ability_messages))
-        for message in ability_messages:
-            buffer.write_int(message.user_id)
-            buffer.write_int(message.ability_id)
-            buffer.write_int(message.primary_id)
-            buffer.write_int(len(message.ally_targets))
-            for ally in message.ally_targets:
-                buffer.write_int(ally)
-            buffer.write_int(len(message.enemy_targets))
-            for enemy in message.enemy_targets:
-                buffer.write_int(enemy)
-        buffer.write_int(len(execution_order))
-        for message in execution_order:
-            buffer.write_int(message)
-        for i in random_spent:
-            buffer.write_int(i)
-        
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_MATCH_COMMUNICATION, 0, ability_messages, execution_order, random_spent)
 
     def handle_reconnection(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        seed = buffer.read_int()
+        packet = protocol.SERVER_RECONNECTION.decode(data)
+        seed = packet.seed
         # get player team names
-        player_character_names = [buffer.read_string().strip() for i in range(3)]
+        player_character_names = [name.strip() for name in packet.player_names]
         self.scene_manager.auto_queue = False
 
         # read enemy player package
 
-        enemy_pouch = list()
-
-        enemy_name = buffer.read_string()
-        enemy_wins = buffer.read_int()
-        enemy_losses = buffer.read_int()
-        enemy_image_mode = buffer.read_string()
-        enemy_image_width = buffer.read_int()
-        enemy_image_height = buffer.read_int()
-        enemy_image_bytes_len = buffer.read_int()
-        enemy_image_bytes = buffer.read_bytes(enemy_image_bytes_len)
-
-        enemy_pouch = [enemy_name, enemy_wins, enemy_losses, enemy_image_mode, enemy_image_width, enemy_image_height, enemy_image_bytes]
-
-        enemy_character_names = [buffer.read_string().strip() for i in range(3)]
-
-        first_turn = buffer.read_int()
-
-        time_remaining = buffer.read_int()
-
-        turn_count = buffer.read_int()
-        all_turns = list()
-        all_execution = list()
-        all_random_expenditure = list()
-        for _ in range(turn_count):
-            used_ability_count = buffer.read_int()
-            executed_abilities = list()
-            for _ in range(used_ability_count):
-                executed_ability = AbilityMessage()
-                executed_ability.assign_user_id(buffer.read_int())
-                executed_ability.assign_ability_id(buffer.read_int())
-                executed_ability.set_primary_target(buffer.read_int())
-                ally_targets = buffer.read_int()
-                for _ in range(ally_targets):
-                    executed_ability.add_to_ally_targets(buffer.read_int())
-                enemy_targets = buffer.read_int()
-                for _ in range(enemy_targets):
-                    executed_ability.add_to_enemy_targets(buffer.read_int())
-                executed_abilities.append(executed_ability)
-            execution_order = list()
-            execution_order_count = buffer.read_int()
-            for _ in range(execution_order_count):
-                execution_order.append(buffer.read_int())
-            random_spent = list()
-            for _ in range(4):
-                random_spent.append(buffer.read_int())
-            
-            all_random_expenditure.append(random_spent)    
-            all_turns.append(executed_abilities)
-            all_execution.append(execution_order)
-
-        pool_count = buffer.read_int()
-        energy_pools = list()
-        for _ in range(pool_count):
-            energy_pool = list()
-            for _ in range(6):
-                energy_pool.append(buffer.read_int())
-            energy_pools.append(energy_pool)
+        enemy_pouch = [packet.name, packet.wins, packet.losses, packet.image_mode, *packet.image_size, packet.image]
+
+        enemy_character_names = [name.strip() for name in packet.enemy_names]
+
+        first_turn = packet.first_turn
+
+        time_remaining = packet.time_remaining
+
+        all_turns = [turn.abilities for turn in packet.turns]
+        all_execution = [turn.execution_order for turn in packet.turns]
+        all_random_expenditure = [turn.random_spent for turn in packet.turns]
+
+        energy_pools = packet.energy_pools
 
         energy = [0, 0, 0, 0]
         if first_turn:
@@ -475,73 +305,34 @@ class ConnectionHandler:
         self.scene_manager.battle_scene.handle_reconnection_catchup(first_turn, all_turns, all_execution, energy_pools, all_random_expenditure, time_remaining)
 
     def send_match_statistics(self, characters, won):
-        buffer = ByteBuffer()
-        buffer.write_int(9)
-        for name in characters:
-            buffer.write_string(name)
-        if won:
-            buffer.write_int(1)
-        else:
-            buffer.write_int(0)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_MATCH_STATISTICS, characters, int(won))
 
     def send_draft_message(self, character):
-        buffer = ByteBuffer()
-        buffer.write_int(13)
-        buffer.write_string(character)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_DRAFT_MESSAGE, character)
         
     def handle_draft_message(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        packet_id = buffer.read_int()
-        drafted_character = buffer.read_string()
+        drafted_character = protocol.SERVER_DRAFT_MESSAGE.decode(data).character
         self.scene_manager.draft_scene.receive_message(drafted_character)
         
     def send_draft_finalization(self, character_list):
-        buffer = ByteBuffer()
-        buffer.write_int(14)
-        for character in character_list:
-            buffer.write_string(character)
-        buffer.write_byte(b'\x1f\x1f\x1f')
-        self.writer.write(buffer.get_byte_array())
-        buffer.clear()
+        self.send_packet(protocol.CLIENT_DRAFT_FINALIZATION, character_list)
 
     def handle_ranked_match_start_package(self, data:list[bytes]):
         if self.waiting_for_opponent:
             self.waiting_for_opponent = False
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        packet_id = buffer.read_int()
-        first_turn = buffer.read_int()
+        packet = protocol.SERVER_RANKED_MATCH_START.decode(data)
+        first_turn = packet.first_turn
         
         self.scene_manager.draft_scene.waiting_for_turn = not first_turn
         self.scene_manager.draft_scene.moving_first = not(not first_turn)
         
-        player_pouch = list()
-
-        player_name = buffer.read_string()
-        player_wins = buffer.read_int()
-        player_losses = buffer.read_int()
-        player_image_mode = buffer.read_string()
-        player_image_width = buffer.read_int()
-        player_image_height = buffer.read_int()
-        player_image_bytes_len = buffer.read_int()
-        player_image_bytes = buffer.read_bytes(player_image_bytes_len)
-
-        player_pouch = [player_name, player_wins, player_losses, player_image_mode, player_image_width, player_image_height, player_image_bytes]
+        player_pouch = [packet.name, packet.wins, packet.losses, packet.image_mode, *packet.image_size, packet.image]
 
         self.scene_manager.char_select.start_ranked_battle(player_pouch)
 
     def handle_draft_finalization(self, data:list[bytes]):
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        buffer.read_int()
-        seed = buffer.read_int()
+        packet = protocol.SERVER_DRAFT_FINALIZATION.decode(data)
+        seed = packet.seed
         first_turn = not self.scene_manager.draft_scene.waiting_for_turn
         
         if first_turn:
@@ -551,7 +342,7 @@ class ConnectionHandler:
             self.scene_manager.battle_scene.waiting_for_turn = True
             self.scene_manager.battle_scene.moving_first = False
         
-        start_pool = [buffer.read_int() for i in range(6)]
+        start_pool = packet.start_pool
         energy = [0, 0, 0, 0]
         if first_turn:
             energy[start_pool[0]] += 1
@@ -563,11 +354,9 @@ class ConnectionHandler:
     def handle_quick_match_start_package(self, data: list[bytes]):
         if self.waiting_for_opponent:
             self.waiting_for_opponent = False
-        buffer = ByteBuffer()
-        buffer.write_bytes(data)
-        packet_id = buffer.read_int()
-        seed = buffer.read_int()
-        first_turn = buffer.read_int()
+        packet = protocol.SERVER_QUICK_MATCH_START.decode(data)
+        seed = packet.seed
+        first_turn = packet.first_turn
         if first_turn:
             self.scene_manager.battle_scene.waiting_for_turn = False
             self.scene_manager.battle_scene.moving_first = True
@@ -575,26 +364,15 @@ class ConnectionHandler:
             self.scene_manager.battle_scene.waiting_for_turn = True
             self.scene_manager.battle_scene.moving_first = False
         
-        start_pool = [buffer.read_int() for i in range(6)]
+        start_pool = packet.start_pool
         energy = [0, 0, 0, 0]
         if first_turn:
             energy[start_pool[0]] += 1
         else:
             for i in range(3):
                 energy[start_pool[i]] += 1
-        names = [buffer.read_string().strip() for i in range(3)]
-        player_pouch = list()
-
-        player_name = buffer.read_string()
-        player_wins = buffer.read_int()
-        player_losses = buffer.read_int()
-        player_image_mode = buffer.read_string()
-        player_image_width = buffer.read_int()
-        player_image_height = buffer.read_int()
-        player_image_bytes_len = buffer.read_int()
-        player_image_bytes = buffer.read_bytes(player_image_bytes_len)
-
-        player_pouch = [player_name, player_wins, player_losses, player_image_mode, player_image_width, player_image_height, player_image_bytes]
+        names = [name.strip() for name in packet.names]
+        player_pouch = [packet.name, packet.wins, packet.losses, packet.image_mode, *packet.image_size, packet.image]
 
 
         self.scene_manager.char_select.start_quick_battle(names, player_pouch, energy, seed)
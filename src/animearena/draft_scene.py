@@ -7,9 +7,9 @@ import sdl2.ext
 import sdl2.surface
 import sdl2.sdlttf
 import logging
-from playsound import playsound
 from animearena import engine
 from animearena import resource_manager
+from animearena.catalog import roster_thumbnail
 from animearena.character import get_character_db, Character
 from animearena.color import *
 from animearena.text_formatter import get_string_width
@@ -56,7 +56,7 @@ class DraftScene(engine.Scene):
             if not v.hidden:
                 sprite = self.ui_factory.from_surface(
                     sdl2.ext.BUTTON,
-                    self.get_scaled_surface(self.border_image(self.scene_manager.surfaces[k+"allyprof"], 2), 75, 75), free=True)
+                    self.get_scaled_surface(roster_thumbnail(k), 75, 75), free=True)
                 sprite.click += self.character_click
                 sprite.character = v
                 self.character_sprites[k] = sprite
@@ -72,6 +72,7 @@ class DraftScene(engine.Scene):
         self.ban_region = self.region.subregion(200, 575, 500, 120)
         self.button_region = self.region.subregion(420, 5, 60, 40)
         self.timer_region = self.region.subregion(x=269, y=95, width=362, height=12)
+        self.drawn_time_left = None
         self.disconnect_region = self.region.subregion(100, 100, 700, 500)
         
     def full_render(self):
@@ -96,7 +97,7 @@ class DraftScene(engine.Scene):
         self.character_sprites.clear()
         for k, v in get_character_db().items():
             if not v.hidden:
-                image = self.border_image(self.scene_manager.surfaces[k + "allyprof"].resize( ( 75, 75 )), 1)
+                image = roster_thumbnail(k)
                 sprite = self.ui_factory.from_surface(
                     sdl2.ext.BUTTON,
                     self.get_scaled_surface(image), free=True )
@@ -148,7 +149,7 @@ class DraftScene(engine.Scene):
             ROW_BOTTOM = BASE_ROW_TOP + BUTTON_SPACE
             
             if (row + 1) * BUTTON_SPACE > VERT_OFFSET and ROW_TOP < VIEWPORT_HEIGHT:
-                image = self.border_image(self.scene_manager.surfaces[character.name + "allyprof"].resize((75, 75)), 1)
+                image = roster_thumbnail(character.name)
                 if ROW_TOP < 0:
                     image = image.crop( (0, abs(ROW_TOP), 75, 75))
                     ROW_TOP = 0
@@ -168,13 +169,17 @@ class DraftScene(engine.Scene):
             self.scroll_bar_region.add_sprite(self.scroll_button, 1, self.scroll_bar_y)
         
     def render_timer_region(self):
+        time_left = self.timer.time_left if self.timer else 0
+        if time_left == self.drawn_time_left and not self.timer_region.is_empty():
+            return
+        self.drawn_time_left = time_left
         self.timer_region.clear()
         bar_height = self.timer_region.size()[1] - 2
         bar_width = self.timer_region.size()[0] - 2
         self.timer_region.add_sprite(self.sprite_factory.from_color(AQUA, size=(self.timer_region.size())), 0, 0)
         self.timer_region.add_sprite(self.sprite_factory.from_color(MENU_TRANSPARENT, size=(bar_width, bar_height)), 1, 1)
-        if self.timer and self.timer.time_left > 0:
-            self.timer_region.add_sprite(self.sprite_factory.from_color(DULL_AQUA, size=(self.timer.time_left * 4, bar_height)), 1, 1)
+        if time_left > 0:
+            self.timer_region.add_sprite(self.sprite_factory.from_color(DULL_AQUA, size=(time_left * 4, bar_height)), 1, 1)
     
     
     def render_char_select(self):
@@ -226,7 +231,7 @@ class DraftScene(engine.Scene):
             ROW_BOTTOM = BASE_ROW_TOP + BUTTON_SPACE
             
             if (row + 1) * BUTTON_SPACE > VERT_OFFSET and ROW_TOP < VIEWPORT_HEIGHT:
-                image = self.border_image(self.scene_manager.surfaces[character.name + "allyprof"].resize((75, 75)), 1)
+                image = roster_thumbnail(character.name)
                 if ROW_TOP < 0:
                     image = image.crop( (0, abs(ROW_TOP), 75, 75))
                     ROW_TOP = 0
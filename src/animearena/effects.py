@@ -1,10 +1,8 @@
 import enum
+import itertools
 import typing
 
-from typing import Union, Tuple
-
-import sdl2
-import sdl2.ext
+from typing import Optional, Union, Tuple
 
 from animearena.ability_type import AbilityType
 
@@ -77,7 +75,6 @@ class Effect:
     duration: int
     source: Union["Ability", str]
     user: "CharacterManager"
-    eff_img: sdl2.SDL_Surface
     name: str
     waiting: bool
     user_id: int
@@ -114,7 +111,6 @@ class Effect:
             self.name = source.name
             self.db_name = source.db_name
             self.source = source
-            self.eff_img = source.image
             
             if AbilityType.ACTION in source.types:
                 self.action = True
@@ -134,7 +130,7 @@ class Effect:
         
 
     def __eq__(self, __o: object) -> bool:
-        if isinstance(__o, Tuple):
+        if isinstance(__o, tuple):
             return (self.eff_type == __o[0] and self.name == __o[1])
         if isinstance(__o, Effect):
             return (self.eff_type == __o.eff_type and self.name == __o.name)
@@ -142,6 +138,10 @@ class Effect:
     def __str__(self) -> str:
         return self.name + "(" + self.eff_type.name + ") <User: " + self.user.id + " " + self.user.source.name + ">"
 
+    @property
+    def eff_img(self):
+        return self.source.image
+
     @property
     def signature(self) -> tuple:
         return (self.eff_type, self.name, self.user.char_id, self.user.id, self.duration)
@@ -173,4 +173,173 @@ class Effect:
         if self.waiting:
             self.waiting = False
             return False
-        return True
\ No newline at end of file
+        return True
+
+# Shared by every EffectList so that a version number is never reused, even
+# by a list that replaces another.
+_versions = itertools.count()
+
+
+class EffectListSnapshot:
+    """The contents of an EffectList at one point in time.
+
+    A snapshot shares the list's storage until the list next changes, and
+    only then takes a copy of its own."""
+    __slots__ = ("effects", "by_key", "by_name")
+
+    def __init__(self, effects: list[Effect], by_key: dict, by_name: dict):
+        self.effects = effects
+        self.by_key = by_key
+        self.by_name = by_name
+
+    def detach(self):
+        self.effects = list(self.effects)
+        self.by_key = {key: list(bucket) for key, bucket in self.by_key.items()}
+        self.by_name = {key: list(bucket) for key, bucket in self.by_name.items()}
+
+
+class EffectList:
+    """Effects on a character, indexed by (type, name) and by name.
+
+    Iteration runs over the list as it stood when the loop began plus any
+    effects appended since, and removing effects swaps in a new backing list,
+    so effects may be added and removed while a loop over them is running."""
+    _effects: list[Effect]
+    _by_key: dict[Tuple[EffectType, str], list[Effect]]
+    _by_name: dict[str, list[Effect]]
+    # Snapshots still sharing this list's storage
+    _sharers: list[EffectListSnapshot]
+    version: int
+
+    def __init__(self, effects: typing.Iterable[Effect] = ()):
+        self._effects = []
+        self._by_key = {}
+        self._by_name = {}
+        self._sharers = []
+        self.version = next(_versions)
+        for effect in effects:
+            self.append(effect)
+
+    def __iter__(self):
+        return iter(self._effects)
+
+    def __len__(self) -> int:
+        return len(self._effects)
+
+    def __getitem__(self, index):
+        return self._effects[index]
+
+    def __contains__(self, __x: object) -> bool:
+        if isinstance(__x, tuple):
+            return (__x[0], __x[1]) in self._by_key
+        if isinstance(__x, Effect):
+            return (__x.eff_type, __x.name) in self._by_key
+        return False
+
+    def __repr__(self) -> str:
+        return f"EffectList({self._effects!r})"
+
+    def snapshot(self) -> EffectListSnapshot:
+        snapshot = EffectListSnapshot(self._effects, self._by_key, self._by_name)
+        self._sharers.append(snapshot)
+        return snapshot
+
+    def restore(self, snapshot: EffectListSnapshot):
+        """Take on the contents of a snapshot, sharing its storage until the
+        next change."""
+        # Earlier sharers keep the old storage to themselves.
+        self._sharers = [snapshot]
+        self._effects = snapshot.effects
+        self._by_key = snapshot.by_key
+        self._by_name = snapshot.by_name
+        self.version = next(_versions)
+
+    def _unshare(self):
+        # The list keeps its storage, so loops already running over it
+        # still see what is appended; the snapshots copy theirs instead.
+        for snapshot in self._sharers:
+            snapshot.detach()
+        self._sharers.clear()
+
+    def append(self, effect: Effect):
+        if self._sharers:
+            self._unshare()
+        self._effects.append(effect)
+        self._by_key.setdefault((effect.eff_type, effect.name), []).append(effect)
+        self._by_name.setdefault(effect.name, []).append(effect)
+        self.version = next(_versions)
+
+    def extend(self, effects: typing.Iterable[Effect]):
+        for effect in effects:
+            self.append(effect)
+
+    def clear(self):
+        if self._sharers:
+            self._unshare()
+        self._effects.clear()
+        self._by_key.clear()
+        self._by_name.clear()
+        self.version = next(_versions)
+
+    def get(self, eff_type: EffectType, name: str) -> Optional[Effect]:
+        matches = self._by_key.get((eff_type, name))
+        if matches:
+            return matches[0]
+        return None
+
+    def get_with_user(self, eff_type: EffectType, name: str,
+                      user: "CharacterManager") -> Optional[Effect]:
+        for effect in self._by_key.get((eff_type, name), ()):
+            if effect.user == user:
+                return effect
+        return None
+
+    def contains_sig(self, effect: Effect) -> bool:
+        signature = effect.signature
+        for eff in self._by_key.get((effect.eff_type, effect.name), ()):
+            if eff.signature == signature:
+                return True
+        return False
+
+    def discard(self, eff_type: EffectType, name: str):
+        """Remove every effect with the given type and name."""
+        removed = self._by_key.get((eff_type, name))
+        if removed:
+            self._remove(removed)
+
+    def discard_with_user(self, name: str, user: "CharacterManager"):
+        """Remove every effect with the given name applied by user."""
+        removed = [
+            eff for eff in self._by_name.get(name, ()) if eff.user == user
+        ]
+        if removed:
+            self._remove(removed)
+
+    def retain(self, predicate: typing.Callable[[Effect], bool]):
+        """Keep only the effects for which predicate is true."""
+        removed = [eff for eff in self._effects if not predicate(eff)]
+        if removed:
+            self._remove(removed)
+
+    def _remove(self, removed: list[Effect]):
+        if self._sharers:
+            self._unshare()
+        removed_ids = {id(eff) for eff in removed}
+        self._effects = [
+            eff for eff in self._effects if id(eff) not in removed_ids
+        ]
+        for eff in removed:
+            self._unindex(self._by_key, (eff.eff_type, eff.name), removed_ids)
+            self._unindex(self._by_name, eff.name, removed_ids)
+        self.version = next(_versions)
+
+    @staticmethod
+    def _unindex(index: dict, key, removed_ids: set[int]):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        remaining = [eff for eff in bucket if id(eff) not in removed_ids]
+        if remaining:
+            index[key] = remaining
+        else:
+            del index[key]
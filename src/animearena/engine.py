@@ -1,10 +1,13 @@
 """Core game engine logic."""
+import collections
 import ctypes
 import enum
+import functools
 import logging
 import operator
 import textwrap
 import importlib.resources
+from typing import Iterable
 from typing import Iterator
 from typing import Literal
 from typing import MutableMapping
@@ -17,6 +20,7 @@ import sdl2.ext
 import sdl2.sdlttf
 import sdl2.surface
 import itertools
+import weakref
 from sdl2 import endian
 from pathlib import Path
 from animearena.animation import JoinAnimation, SplitAnimation
@@ -29,6 +33,230 @@ RESOURCES = Path(__file__).parent.parent.parent / "resources"
 WHITE = sdl2.SDL_Color(255, 255, 255)
 
 
+SCALED_SURFACE_CACHE_SIZE = 256
+TEXT_SURFACE_CACHE_SIZE = 512
+
+
+def scale_image(img, width: int = 0, height: int = 0, flipped=False):
+    """Resize and flip an image, returning its pixels and SDL surface format."""
+    image = img
+    if width != 0 or height != 0:
+        image = image.resize((width, height))
+    else:
+        width, height = (image.size)
+    mode = image.mode
+    if flipped:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+    rmask = gmask = bmask = amask = 0
+    if mode in ("1", "L", "P"):
+        # 1 = B/W, 1 bit per byte
+        # "L" = greyscale, 8-bit
+        # "P" = palette-based, 8-bit
+        pitch = width
+        depth = 8
+    elif mode == "RGB":
+        # 3x8-bit, 24bpp
+
+        if endian.SDL_BYTEORDER == endian.SDL_LIL_ENDIAN:
+            rmask = 0x0000FF
+            gmask = 0x00FF00
+            bmask = 0xFF0000
+        else:
+            rmask = 0xFF0000
+            gmask = 0x00FF00
+            bmask = 0x0000FF
+        depth = 24
+        pitch = width * 3
+    elif mode in ("RGBA", "RGBX"):
+        # RGBX: 4x8-bit, no alpha
+        # RGBA: 4x8-bit, alpha
+
+        if endian.SDL_BYTEORDER == endian.SDL_LIL_ENDIAN:
+            rmask = 0x000000FF
+            gmask = 0x0000FF00
+            bmask = 0x00FF0000
+            if mode == "RGBA":
+                amask = 0xFF000000
+        else:
+            rmask = 0xFF000000
+            gmask = 0x00FF0000
+            bmask = 0x0000FF00
+            if mode == "RGBA":
+                amask = 0x000000FF
+        depth = 32
+        pitch = width * 4
+    else:
+        # We do not support CMYK or YCbCr for now
+        raise TypeError("unsupported image format")
+    return image.tobytes(), width, height, depth, pitch, (rmask, gmask, bmask, amask)
+
+
+def border_image(image: Image.Image, thickness: int) -> Image.Image:
+    new = image.copy()
+    w, h = image.size
+    
+    brush = ImageDraw.Draw(new)
+    brush.rectangle([(0, 0), (w, thickness)], fill="black", outline = "black")
+    brush.rectangle([(0, 0), (thickness, h)], fill="black", outline = "black")
+    brush.rectangle([(w - 2, 0), (w, h)], fill="black", outline = "black")
+    brush.rectangle([(0, h - 2), (w, h)], fill="black", outline = "black")
+    
+    return new
+
+
+def surface_from_pixels(pxbuf: bytes, width: int, height: int, depth: int, pitch: int,
+                        masks: Tuple[int, int, int, int]) -> sdl2.SDL_Surface:
+    # Callers blit onto the surfaces they get back, so every surface gets its
+    # own copy of the pixels. The surface only borrows them from Python, so
+    # the copy is kept alive on the surface itself.
+    pixels = ctypes.create_string_buffer(pxbuf, len(pxbuf))
+    imgsurface = sdl2.ext.surface.SDL_CreateRGBSurfaceFrom(pixels, width, height, depth, pitch, *masks)
+    imgsurface = imgsurface.contents
+    imgsurface._pxbuf = pixels
+    return imgsurface
+
+
+class ScaledSurfaceCache():
+    """LRU cache of resized and flipped image pixels, keyed by source image."""
+
+    max_entries: int
+    entries: "collections.OrderedDict[Tuple[int, int, int, bool], tuple]"
+
+    def __init__(self, max_entries: int = SCALED_SURFACE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    def get(self, img, width: int = 0, height: int = 0, flipped=False) -> sdl2.SDL_Surface:
+        # PIL images compare by content and can't be hashed, so entries are
+        # keyed by identity and dropped as soon as the source image dies.
+        key = (id(img), width, height, flipped)
+        entry = self.entries.get(key)
+        if entry is None or entry[0]() is not img:
+            ref = weakref.ref(img, lambda ref, key=key: self.discard(key, ref))
+            entry = (ref, scale_image(img, width, height, flipped))
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surface_from_pixels(*entry[1])
+
+    def discard(self, key: Tuple[int, int, int, bool], ref: weakref.ref):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is ref:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+
+scaled_surfaces = ScaledSurfaceCache()
+
+
+def font_key(font: sdl2.sdlttf.TTF_Font) -> int:
+    # Each TTF_Font is opened at one size, so its address stands for both.
+    return ctypes.cast(font, ctypes.c_void_p).value
+
+
+def color_key(color: sdl2.SDL_Color) -> Tuple[int, int, int, int]:
+    return (color.r, color.g, color.b, color.a)
+
+
+class TextSurfaceCache():
+    """LRU of strings rasterized by SDL_ttf, keyed by font, color and text.
+
+    The cache owns the surfaces and frees them on eviction, so callers blit
+    what they get back straight away and never free it."""
+
+    max_entries: int
+    entries: "collections.OrderedDict[tuple, ctypes.POINTER(sdl2.SDL_Surface)]"
+
+    def __init__(self, max_entries: int = TEXT_SURFACE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    def get(self, font: sdl2.sdlttf.TTF_Font, text: str,
+            color: sdl2.SDL_Color) -> Optional["ctypes.POINTER(sdl2.SDL_Surface)"]:
+        """The rendered text, or None for text SDL_ttf draws nothing for."""
+        key = (font_key(font), color_key(color), text)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+        surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(text), color)
+        if not surface:
+            return None
+        self.entries[key] = surface
+        while len(self.entries) > self.max_entries:
+            sdl2.SDL_FreeSurface(self.entries.popitem(last=False)[1])
+        return surface
+
+    def clear(self):
+        while self.entries:
+            sdl2.SDL_FreeSurface(self.entries.popitem()[1])
+
+
+text_surfaces = TextSurfaceCache()
+
+
+class GlyphAtlas():
+    """Single characters rasterized once per font and color, with their
+    advances. Strings that change all the time but draw from a few
+    characters, such as hp and energy counts, are laid out from these
+    instead of filling the text cache with every value."""
+
+    glyphs: dict[tuple, Tuple["ctypes.POINTER(sdl2.SDL_Surface)", int]]
+
+    def __init__(self):
+        self.glyphs = {}
+
+    def glyph(self, font: sdl2.sdlttf.TTF_Font, char: str,
+              color: sdl2.SDL_Color) -> Tuple["ctypes.POINTER(sdl2.SDL_Surface)", int]:
+        key = (font_key(font), color_key(color), char)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            metrics = [ctypes.c_int(0) for _ in range(5)]
+            sdl2.sdlttf.TTF_GlyphMetrics(font, ord(char), *map(ctypes.byref, metrics))
+            surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(char), color)
+            glyph = self.glyphs[key] = (surface, metrics[4].value)
+        return glyph
+
+    def draw(self, font: sdl2.sdlttf.TTF_Font, text: str, color: sdl2.SDL_Color,
+             target: sdl2.SDL_Surface, x: int, y: int):
+        for char in text:
+            surface, advance = self.glyph(font, char, color)
+            if surface:
+                sdl2.surface.SDL_BlitSurface(surface, None, target, sdl2.SDL_Rect(x, y))
+            x += advance
+
+
+glyph_atlas = GlyphAtlas()
+
+
+def draw_text(font: sdl2.sdlttf.TTF_Font, text: str, color: sdl2.SDL_Color,
+              target: sdl2.SDL_Surface, x: int, y: int):
+    """Blit text from the glyph atlas when it is a number, or from the text
+    cache otherwise."""
+    if text.isdigit():
+        glyph_atlas.draw(font, text, color, target, x, y)
+        return
+    surface = text_surfaces.get(font, text, color)
+    if surface is not None:
+        sdl2.surface.SDL_BlitSurface(surface, None, target, sdl2.SDL_Rect(x, y))
+
+
+# (x, y) offsets of the border passes drawn under bordered text
+BORDER_OFFSETS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def draw_bordered_text(font: sdl2.sdlttf.TTF_Font, text: str, color: sdl2.SDL_Color,
+                       border_color: sdl2.SDL_Color, target: sdl2.SDL_Surface, x: int, y: int,
+                       thickness: int):
+    for dx, dy in BORDER_OFFSETS:
+        draw_text(font, text, border_color, target, x + dx * thickness, y + dy * thickness)
+    draw_text(font, text, color, target, x, y)
+
+
 def sat_subtract(subtractor: int, subtractee: int) -> int:
     subtractee -= subtractor
     if subtractee < 0:
@@ -45,6 +273,7 @@ class Scene:
     """Scene assets, draw regions, and associated game state."""
     surfaces: MutableMapping[str, sdl2.SDL_Surface]
     region: "Region"
+    damage: "Damage"
     sprite_factory: sdl2.ext.SpriteFactory
     ui_factory: sdl2.ext.UIFactory
     triggered_event: bool
@@ -59,8 +288,9 @@ class Scene:
         self.animation_lock = []
         self.skipping_animations = False
         self.animation_locked = False
-        self.region = Region()
-        self.animation_region = Region()
+        self.damage = Damage()
+        self.region = Region(damage=self.damage)
+        self.animation_region = Region(damage=self.damage)
         self.sprite_factory = sdl2.ext.SpriteFactory(sprite_type, free=True)
         self.ui_factory = sdl2.ext.UIFactory(self.sprite_factory, free=True)
         self.surfaces = dict()
@@ -125,67 +355,27 @@ class Scene:
 
     def render_text(self, font, text, color, target, x, y, flow = False, target_width = 0, fontsize = 0):
         if not flow:
-            text_surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(text), color)
-            sdl2.surface.SDL_BlitSurface(text_surface, None, target.surface, sdl2.SDL_Rect(x, y))
-            sdl2.SDL_FreeSurface(text_surface)
+            draw_text(font, text, color, target.surface, x, y)
         else:
             lines = get_lines(text, target_width, fontsize)
             line_height = get_font_height(fontsize)
             for i, line in enumerate(lines):
-                text_surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), color)
-                sdl2.surface.SDL_BlitSurface(text_surface, None, target.surface, sdl2.SDL_Rect(x, y + (i * line_height)))
-                sdl2.SDL_FreeSurface(text_surface)
+                draw_text(font, line, color, target.surface, x, y + (i * line_height))
         return target
     
     def render_bordered_text(self, font, text, color, border_color, target, x, y, thickness, flow = False, target_width = 0, fontsize = 0):
         if not flow:
-            text_surf = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(text), border_color)
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x-thickness, y-thickness))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x,           y-thickness))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x+thickness, y-thickness))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x-thickness, y))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x+thickness, y))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x-thickness, y+thickness))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x,           y+thickness))
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x+thickness, y+thickness))
-            sdl2.SDL_FreeSurface(text_surf)
-            
-            text_surf = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(text), color)
-            sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x, y))
-            sdl2.SDL_FreeSurface(text_surf)
+            draw_bordered_text(font, text, color, border_color, target.surface, x, y, thickness)
         else:
             lines = get_lines(text, target_width, fontsize)
             line_height = get_font_height(fontsize)
             for i, line in enumerate(lines):
-                mod_y = y + (i * line_height)
-                text_surf = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), border_color)
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x-thickness, mod_y-thickness))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x,           mod_y-thickness))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x+thickness, mod_y-thickness))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x-thickness, mod_y))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x+thickness, mod_y))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x-thickness, mod_y+thickness))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x,           mod_y+thickness))
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x+thickness, mod_y+thickness))
-                sdl2.SDL_FreeSurface(text_surf)
-                
-                text_surf = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), color)
-                sdl2.surface.SDL_BlitSurface(text_surf, None, target.surface, sdl2.SDL_Rect(x, mod_y))
-                sdl2.SDL_FreeSurface(text_surf)
+                draw_bordered_text(font, line, color, border_color, target.surface, x, y + (i * line_height), thickness)
         
         return target
     
     def border_image(self, image, thickness):
-        new = image.copy()
-        w, h = image.size
-        
-        brush = ImageDraw.Draw(new)
-        brush.rectangle([(0, 0), (w, thickness)], fill="black", outline = "black")
-        brush.rectangle([(0, 0), (thickness, h)], fill="black", outline = "black")
-        brush.rectangle([(w - 2, 0), (w, h)], fill="black", outline = "black")
-        brush.rectangle([(0, h - 2), (w, h)], fill="black", outline = "black")
-        
-        return new
+        return border_image(image, thickness)
         
     
     def border_sprite(self, sprite, color, thickness):
@@ -216,62 +406,10 @@ class Scene:
         
         return sprite
 
-    def get_scaled_surface(self, img, width: int = 0, height: int = 0, flipped=False) -> sdl2.SDL_Surface:
-        image = img
-        if width != 0 or height != 0:
-            image = image.resize((width, height))
-        else:
-            width, height = (image.size)
-        mode = image.mode
-        if flipped:
-            image = image.transpose(Image.FLIP_LEFT_RIGHT)
-        rmask = gmask = bmask = amask = 0
-        if mode in ("1", "L", "P"):
-            # 1 = B/W, 1 bit per byte
-            # "L" = greyscale, 8-bit
-            # "P" = palette-based, 8-bit
-            pitch = width
-            depth = 8
-        elif mode == "RGB":
-            # 3x8-bit, 24bpp
-            
-            if endian.SDL_BYTEORDER == endian.SDL_LIL_ENDIAN:
-                rmask = 0x0000FF
-                gmask = 0x00FF00
-                bmask = 0xFF0000
-            else:
-                rmask = 0xFF0000
-                gmask = 0x00FF00
-                bmask = 0x0000FF
-            depth = 24
-            pitch = width * 3
-        elif mode in ("RGBA", "RGBX"):
-            # RGBX: 4x8-bit, no alpha
-            # RGBA: 4x8-bit, alpha
-            
-            if endian.SDL_BYTEORDER == endian.SDL_LIL_ENDIAN:
-                rmask = 0x000000FF
-                gmask = 0x0000FF00
-                bmask = 0x00FF0000
-                if mode == "RGBA":
-                    amask = 0xFF000000
-            else:
-                rmask = 0xFF000000
-                gmask = 0x00FF0000
-                bmask = 0x0000FF00
-                if mode == "RGBA":
-                    amask = 0x000000FF
-            depth = 32
-            pitch = width * 4
-        else:
-            # We do not support CMYK or YCbCr for now
-            raise TypeError("unsupported image format")
-        pxbuf = image.tobytes()
-        
-        imgsurface = sdl2.ext.surface.SDL_CreateRGBSurfaceFrom(pxbuf, width, height, depth, pitch, rmask, gmask, bmask, amask)
-        imgsurface = imgsurface.contents
-        imgsurface._pxbuf = pxbuf
-        return imgsurface
+    def get_scaled_surface(self, img, width: int = 0, height: int = 0, flipped=False, cache=True) -> sdl2.SDL_Surface:
+        if not cache:
+            return surface_from_pixels(*scale_image(img, width, height, flipped))
+        return scaled_surfaces.get(img, width, height, flipped)
 
     def create_selected_version(self, surface: sdl2.SDL_Surface,
                                 filter_type: "FilterType") -> sdl2.ext.SoftwareSprite:
@@ -301,8 +439,7 @@ class Scene:
         lines = textwrap.wrap(text, chars_per_line)
         sdl2.surface.SDL_BlitSurface(self.get_scaled_surface(blotter), sdl2.SDL_Rect(0, 0, blotter.size[0], blotter.size[1]), display.surface, sdl2.SDL_Rect(0, 0, 0, 0))
         for row, line in enumerate(lines):
-            sdl2.surface.SDL_BlitSurface(sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), text_color), None, display.surface,
-                                         sdl2.SDL_Rect(x, y + (row * 15), 0, 0))
+            draw_text(font, line, text_color, display.surface, x, y + (row * 15))
     
     
 
@@ -343,10 +480,7 @@ class Scene:
                                                 size=(width, true_height))
         # for each line in the list of lines, render that line on the sprite's surface
         for row, line in enumerate(lines):
-            text_surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), text_color)
-            sdl2.surface.SDL_BlitSurface(text_surface, None, new_sprite.surface,
-                                         sdl2.SDL_Rect(x, y + (row * y_offset), 0, 0))
-            sdl2.SDL_FreeSurface(text_surface)
+            draw_text(font, line, text_color, new_sprite.surface, x, y + (row * y_offset))
 
         return new_sprite
 
@@ -387,37 +521,104 @@ class Scene:
                                                 size=(width, true_height))
         # for each line in the list of lines, render that line on the sprite's surface
         for row, line in enumerate(lines):
-            border_text_surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), text_color)
-            text_surface = sdl2.sdlttf.TTF_RenderText_Blended(font, str.encode(line), WHITE)
-            sdl2.surface.SDL_BlitSurface(border_text_surface, None, new_sprite.surface,
-                                        sdl2.SDL_Rect(x - 1, y + (row * y_offset) - 1, 0, 0))
-            sdl2.surface.SDL_BlitSurface(border_text_surface, None, new_sprite.surface,
-                                        sdl2.SDL_Rect(x - 1, y + (row * y_offset) + 1, 0, 0))
-            sdl2.surface.SDL_BlitSurface(border_text_surface, None, new_sprite.surface,
-                                        sdl2.SDL_Rect(x + 1, y + (row * y_offset) - 1, 0, 0))
-            sdl2.surface.SDL_BlitSurface(border_text_surface, None, new_sprite.surface,
-                                        sdl2.SDL_Rect(x + 1, y + (row * y_offset) + 1, 0, 0))
-            
-            sdl2.surface.SDL_BlitSurface(text_surface, None, new_sprite.surface,
-                                         sdl2.SDL_Rect(x, y + (row * y_offset), 0, 0))
-            sdl2.SDL_FreeSurface(text_surface)
+            line_y = y + (row * y_offset)
+            for dx, dy in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+                draw_text(font, line, text_color, new_sprite.surface, x + dx, line_y + dy)
+            draw_text(font, line, WHITE, new_sprite.surface, x, line_y)
 
         return new_sprite
 
+# Past this many separate rectangles a redraw is clipped to their bounds
+MAX_DAMAGE_RECTS = 16
+
+
+def overlaps(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def bounds(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+    left, top = min(a[0], b[0]), min(a[1], b[1])
+    right, bottom = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+    return (left, top, right - left, bottom - top)
+
+
+class Damage:
+    """Screen rectangles a scene has drawn over or uncovered since it was
+    last presented."""
+    rects: list[Tuple[int, int, int, int]]
+    full: bool
+
+    def __init__(self):
+        self.rects = []
+        self.full = True
+
+    def __bool__(self) -> bool:
+        return self.full or bool(self.rects)
+
+    def add(self, sprite: sdl2.ext.Sprite):
+        if self.full:
+            return
+        width, height = sprite.size
+        if width and height:
+            self.rects.append((sprite.x, sprite.y, width, height))
+
+    def invalidate(self):
+        """Mark the whole window for redrawing."""
+        self.full = True
+        self.rects.clear()
+
+    def reset(self):
+        self.full = False
+        self.rects.clear()
+
+    def merged(self) -> list[Tuple[int, int, int, int]]:
+        """The damaged rectangles with overlapping ones combined."""
+        pending = list(self.rects)
+        merged = []
+        while pending:
+            rect = pending.pop()
+            for i, other in enumerate(merged):
+                if overlaps(rect, other):
+                    # The grown rectangle may overlap others, so place it again.
+                    pending.append(bounds(rect, merged.pop(i)))
+                    break
+            else:
+                merged.append(rect)
+        if len(merged) > MAX_DAMAGE_RECTS:
+            return [functools.reduce(bounds, merged)]
+        return merged
+
+
+def render_damage(surface: sdl2.SDL_Surface, sprites: Iterable[sdl2.ext.Sprite],
+                  rects: list[Tuple[int, int, int, int]]):
+    """Redraw only the sprites that meet each rectangle, clipped to it."""
+    sprites = list(sprites)
+    for rect in rects:
+        sdl2.SDL_SetClipRect(surface, sdl2.SDL_Rect(*rect))
+        for sprite in sprites:
+            width, height = sprite.size
+            if overlaps(rect, (sprite.x, sprite.y, width, height)):
+                sdl2.SDL_BlitSurface(sprite.surface, None, surface, sdl2.SDL_Rect(sprite.x, sprite.y))
+    sdl2.SDL_SetClipRect(surface, None)
+
+
 class Region:
     """Spatial region on the screen with relative coordinate offsets & spinning rims."""
     x: int
     y: int
     width: int
     height: int
+    damage: Damage
     _regions: list["Region"]
     _sprites: list[sdl2.ext.Sprite]
 
-    def __init__(self, x: int = 0, y: int = 0, width: int = 0, height: int = 0):
+    def __init__(self, x: int = 0, y: int = 0, width: int = 0, height: int = 0,
+                 damage: Optional[Damage] = None):
         self.x = x
         self.y = y
         self.width = width
         self.height = height
+        self.damage = damage if damage is not None else Damage()
         self._regions = []
         self._sprites = []
 
@@ -427,39 +628,53 @@ class Region:
             yield from subregion
 
     def subregion(self, x: int, y: int, width: int, height: int) -> "Region":
-        subreg = Region(self.x + x, self.y + y, width, height)
+        subreg = Region(self.x + x, self.y + y, width, height, self.damage)
         self._regions.append(subreg)
         return subreg
 
-    def add_sprite(self, sprite: sdl2.ext.Sprite, x: int, y: int, depth: int = 0):
-        sprite.x = self.x + x
-        sprite.y = self.y + y
+    def place_sprite(self, sprite: sdl2.ext.Sprite, x: int, y: int, depth: int):
+        # A sprite moved while still shown elsewhere uncovers its old spot.
+        if getattr(sprite, "placed", False):
+            self.damage.add(sprite)
+        sprite.x = x
+        sprite.y = y
         sprite.depth = depth
+        sprite.placed = True
+        self.damage.add(sprite)
         self._sprites.append(sprite)
         self._sprites.sort(key=operator.attrgetter('depth'))
 
-    def add_sprite_vertical_center(self, sprite: sdl2.ext.Sprite, x: int, depth: int = 0):
-        sprite.x = self.x + x
-        sprite.depth = depth
+    def add_sprite(self, sprite: sdl2.ext.Sprite, x: int, y: int, depth: int = 0):
+        self.place_sprite(sprite, self.x + x, self.y + y, depth)
 
+    def add_sprite_vertical_center(self, sprite: sdl2.ext.Sprite, x: int, depth: int = 0):
         region_center = self.height // 2
         sprite_center = sprite.size[1] // 2
 
-        sprite.y = self.y + region_center - sprite_center
-
-        self._sprites.append(sprite)
-        self._sprites.sort(key=operator.attrgetter('depth'))
+        self.place_sprite(sprite, self.x + x, self.y + region_center - sprite_center, depth)
 
     def size(self) -> Tuple[int, int]:
         return (self.width, self.height)
 
+    def remove_sprite(self, sprite: sdl2.ext.Sprite):
+        """Removes one sprite from this region"""
+        self._sprites.remove(sprite)
+        sprite.placed = False
+        self.damage.add(sprite)
+
     def clear(self):
         """Removes all sprites from this region and all sub-regions"""
+        for sprite in self._sprites:
+            sprite.placed = False
+            self.damage.add(sprite)
         self._sprites.clear()
         
         for subregion in self._regions:
             subregion.clear()
 
+    def is_empty(self) -> bool:
+        return not self._sprites and all(subregion.is_empty() for subregion in self._regions)
+
     def from_bottom(self, y: int) -> int:
         return self.height - y
 
@@ -0,0 +1,222 @@
+import typing
+from typing import Optional
+
+from animearena.ability import Ability
+from animearena.battle_scene import AbilityMessage, BattleScene, Team
+from animearena.character import Character
+from animearena.energy import Energy
+from animearena.player import Player
+
+if typing.TYPE_CHECKING:
+    from animearena.character_manager import CharacterManager
+
+
+class HeadlessTeamDisplay():
+    """Team holder standing in for the on-screen team displays."""
+
+    team: Team
+
+    def __init__(self):
+        self.team = None
+
+    def assign_team(self, team: Team):
+        self.team = team
+
+    def update_display(self):
+        # The rendered displays refresh ability swaps, targeting types and
+        # costs as a side effect of drawing, so the same work is done here.
+        for manager in self.team.character_managers:
+            manager.update_state()
+
+
+class HeadlessEnemyTeamDisplay(HeadlessTeamDisplay):
+    """The enemy display only redraws profiles, effects and hp bars. Enemy
+    swaps and targeting are worked out on the enemy's own client, and rules
+    such as Mental Out - Order only resolve from that side of the board."""
+
+    def update_display(self):
+        pass
+
+
+class HeadlessBattleScene(BattleScene):
+    """Battle rules state with no window, sprite factory or scene manager."""
+    # pylint: disable=super-init-not-called
+    player_display: HeadlessTeamDisplay
+    enemy_display: HeadlessEnemyTeamDisplay
+    game_over: bool
+    game_won: bool
+
+    headless = True
+
+    def __init__(self):
+        self.scene_manager = None
+        self.animations = []
+        self.animation_lock = []
+        self.animation_locked = False
+        self.skipping_animations = True
+        self.window_up = False
+        self.triggered_event = False
+        self.player = None
+        self.enemy = None
+        self.timer = None
+        self.game_over = False
+        self.game_won = False
+        self.player_display = HeadlessTeamDisplay()
+        self.enemy_display = HeadlessEnemyTeamDisplay()
+        self.init_battle_state()
+
+    def setup_scene(self,
+                    ally_team: list[Character],
+                    enemy_team: list[Character],
+                    player: Player = None,
+                    enemy: Player = None,
+                    energy=[0, 0, 0, 0], seed: int = 0):
+        self.game_over = False
+        self.game_won = False
+        self.window_up = False
+        self.setup_battle_state(ally_team, enemy_team, player, enemy, energy, seed)
+        self.full_update()
+
+    def start_timer(self, time: int = 90) -> None:
+        return None
+
+    def full_update(self):
+        self.player_display.update_display()
+        self.enemy_display.update_display()
+
+    def draw_timer_region(self):
+        pass
+
+    def draw_turn_end_region(self):
+        pass
+
+    def update_energy_region(self):
+        pass
+
+    def lose_game(self):
+        self.record_result(won=False, surrendered=self.clicked_surrender)
+        self.lose_game_mission_check()
+        self.window_up = True
+        self.game_over = True
+        self.game_won = False
+
+    def win_game(self, surrendered=False):
+        self.record_result(won=True, surrendered=surrendered)
+        self.win_game_mission_check()
+        self.window_up = True
+        self.game_over = True
+        self.game_won = True
+
+    def usable_abilities(self, user: "CharacterManager") -> list[Ability]:
+        return [ability for ability in user.source.current_abilities
+                if ability.can_use(self, user)]
+
+    def legal_targets(self, user: "CharacterManager",
+                      ability: Ability) -> list["CharacterManager"]:
+        """Every manager the ability could be aimed at, ally side first."""
+        ability.target(user, self.pteam, self.eteam)
+        targets = [manager for manager in self.pteam + self.eteam
+                   if manager.targeted]
+        self.reset_targeting()
+        return targets
+
+    def queue_ability(self, user: "CharacterManager", ability: Ability,
+                      primary_target: Optional["CharacterManager"] = None):
+        """Queue an ability as if it had been selected and targeted in the UI."""
+        self.acting_character = user
+        self.selected_ability = ability
+        ability.target(user, self.pteam, self.eteam)
+        if primary_target is None:
+            primary_target = next(manager
+                                  for manager in self.pteam + self.eteam
+                                  if manager.targeted)
+        self.expend_energy(ability)
+        self.apply_targeting(primary_target)
+
+    def spend_random_energy(self):
+        """Pay the round's random energy costs from the most plentiful pools."""
+        pool = self.player_display.team.energy_pool
+        while self.round_any_cost > 0:
+            energy = max((Energy(i) for i in range(4)), key=lambda e: pool[e])
+            pool[energy] -= 1
+            self.random_spent[energy.value] += 1
+            self.round_any_cost -= 1
+
+    def execute_turn(self) -> list[AbilityMessage]:
+        """Resolve the ally turn and return the messages a client would send."""
+        self.spend_random_energy()
+        self.get_execution_order_base("ally")
+        if self.recorder:
+            self.get_ability_messages()
+            self.recorder.record_player_turn(self.ability_messages, self.execution_order,
+                                             self.random_spent, self.player_display.team.energy_pool)
+            self.ability_messages.clear()
+        self.execution_loop()
+        messages = list(self.ability_messages)
+        self.ability_messages.clear()
+        self.random_spent = [0, 0, 0, 0]
+        return messages
+
+    def execute_enemy_turn(self, executed_abilities: list[AbilityMessage],
+                           potential_energy: list[int]):
+        """Resolve the enemy's turn and start the next ally turn."""
+        self.acting_order = [
+            self.eteam[ability.user_id] for ability in executed_abilities
+        ]
+        self.get_execution_order_base("enemy")
+        execution_order = list(self.execution_order)
+        self.acting_order.clear()
+        self.enemy_execution_loop(executed_abilities, execution_order,
+                                  potential_energy)
+
+
+    def requeue_ability(self, message: AbilityMessage):
+        """Queue a recorded ally ability on the targets it was sent with."""
+        user = self.pteam[message.user_id]
+        ability = user.source.current_abilities[message.ability_id]
+        primary_target = None
+        if message.primary_id != 69:
+            primary_target = (self.pteam + self.eteam)[message.primary_id]
+        targets = ([self.pteam[i] for i in message.ally_targets] +
+                   [self.eteam[i] for i in message.enemy_targets])
+        for target in targets:
+            user.add_current_target(target)
+            target.add_received_ability(ability)
+        ability.primary_target = primary_target
+        ability.user = user
+        user.primary_target = primary_target
+        user.used_ability = ability
+        self.acting_order.append(user)
+        user.acted = True
+
+    def restore_energy_pool(self, energy_pool: list[int]):
+        """Set the pool a recorded turn was confirmed with, exchanges and
+        random costs included."""
+        for i, amount in enumerate(energy_pool):
+            self.player_display.team.energy_pool[Energy(i)] = amount
+        self.round_any_cost = 0
+
+    def replay_turn(self, executed_abilities: list[AbilityMessage], execution_order: list[int],
+                    energy_pool: list[int]):
+        """Resolve a recorded ally turn the way it was confirmed."""
+        for message in executed_abilities:
+            self.requeue_ability(message)
+        self.restore_energy_pool(energy_pool)
+        self.get_execution_order_base("ally")
+        self.execution_order = list(execution_order)
+        self.execution_loop()
+        self.ability_messages.clear()
+
+    def replay_timeout(self, executed_abilities: list[AbilityMessage], energy_pool: list[int]):
+        """Let a recorded ally turn run out with its queued abilities."""
+        for message in executed_abilities:
+            self.requeue_ability(message)
+        self.restore_energy_pool(energy_pool)
+        self.handle_timeout()
+
+
+def make_headless_battle_scene() -> HeadlessBattleScene:
+
+    scene = HeadlessBattleScene()
+
+    return scene
@@ -7,18 +7,13 @@ import sdl2.ext
 import sdl2.surface
 import sdl2.sdlttf
 import logging
-from playsound import playsound
+from animearena.audio import play_sound
 from animearena import engine
 from animearena import resource_manager
 from animearena.color import *
 
 FONTSIZE = 16
 
-def play_sound(file_name: str):
-    # with importlib.resources.path('animearena.resources', file_name) as path:
-    #     playsound(str(path), False)
-    pass
-
 class LoginScene(engine.Scene):
 
     def __init__(self, scene_manager, *args, **kwargs):
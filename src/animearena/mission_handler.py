@@ -411,6 +411,131 @@ class KillingBlowSelfTrigger(KillingBlowTrigger):
             return False
         return super().conditions_met(character, target, source)
 
+class EffectMission:
+    
+    mission_num: int
+    mission_increment: int
+    eff_type: Optional[EffectType]
+    target_states: list[Callable]
+    target_progress: bool
+    
+    def __init__(self, mission_num: int, mission_increment: int = 1, eff_type: Optional[EffectType] = None, target_states: list[Callable] = [], target_progress: bool = False):
+        self.mission_num = mission_num
+        self.mission_increment = mission_increment
+        self.eff_type = eff_type
+        self.target_states = target_states
+        self.target_progress = target_progress
+    
+    def conditions_met(self, effect: Effect, target: "CharacterManager") -> bool:
+        if self.eff_type is not None and effect.eff_type != self.eff_type:
+            return False
+        return all([state(target) for state in self.target_states])
+    
+    def complete_mission(self, effect: Effect, target: "CharacterManager"):
+        if self.target_progress:
+            target.progress_mission(self.mission_num, self.mission_increment)
+        else:
+            effect.user.progress_mission(self.mission_num, self.mission_increment)
+
+class EffectCountMission(EffectMission):
+    
+    tracker_name: str
+    success_name: str
+    threshold: int
+    
+    def __init__(self, tracker_name: str, success_name: str, threshold: int, eff_type: Optional[EffectType] = None):
+        super().__init__(0, 0, eff_type)
+        self.tracker_name = tracker_name
+        self.success_name = success_name
+        self.threshold = threshold
+    
+    def conditions_met(self, effect: Effect, target: "CharacterManager") -> bool:
+        if effect.user.has_effect(EffectType.SYSTEM, self.success_name):
+            return False
+        return super().conditions_met(effect, target)
+    
+    def complete_mission(self, effect: Effect, target: "CharacterManager"):
+        user = effect.user
+        if not user.has_effect(EffectType.SYSTEM, self.tracker_name):
+            user.add_effect(Effect(self.tracker_name, EffectType.SYSTEM, user, 280000, lambda eff: "", mag=0, system=True))
+            return
+        tracker = user.get_effect(EffectType.SYSTEM, self.tracker_name)
+        tracker.alter_mag(1)
+        if tracker.mag >= self.threshold:
+            user.add_effect(Effect(self.success_name, EffectType.SYSTEM, user, 280000, lambda eff: "", system=True))
+            user.remove_effect(tracker)
+
+class EffectConsecutiveMission(EffectMission):
+    
+    tracker_name: str
+    threshold: int
+    extension: int
+    
+    def __init__(self, mission_num: int, tracker_name: str, threshold: int, extension: int = 2):
+        super().__init__(mission_num)
+        self.tracker_name = tracker_name
+        self.threshold = threshold
+        self.extension = extension
+    
+    def conditions_met(self, effect: Effect, target: "CharacterManager") -> bool:
+        return target.has_effect(EffectType.SYSTEM, self.tracker_name) and not getattr(effect.user.source, f"mission{self.mission_num}complete")
+    
+    def complete_mission(self, effect: Effect, target: "CharacterManager"):
+        tracker = target.get_effect(EffectType.SYSTEM, self.tracker_name)
+        tracker.alter_mag(1)
+        if tracker.mag >= self.threshold:
+            setattr(effect.user.source, f"mission{self.mission_num}complete", True)
+            effect.user.progress_mission(self.mission_num, 1)
+        else:
+            tracker.duration += self.extension
+
+class EffectFailureTrigger(EffectMission):
+    
+    failure_name: str
+    eff_req: EffectRequirement
+    
+    def __init__(self, failure_name: str, eff_req: EffectRequirement):
+        super().__init__(0, 0)
+        self.failure_name = failure_name
+        self.eff_req = eff_req
+    
+    def conditions_met(self, effect: Effect, target: "CharacterManager") -> bool:
+        return not effect.user.has_effect(self.eff_req.eff_type, self.eff_req.name)
+    
+    def complete_mission(self, effect: Effect, target: "CharacterManager"):
+        effect.user.add_effect(Effect(self.failure_name, EffectType.SYSTEM, effect.user, 280000, lambda eff: "", system=True))
+
+class EffectResetTrigger(EffectMission):
+    
+    eff_req: EffectRequirement
+    
+    def __init__(self, eff_req: EffectRequirement):
+        super().__init__(0, 0)
+        self.eff_req = eff_req
+    
+    def conditions_met(self, effect: Effect, target: "CharacterManager") -> bool:
+        return effect.user.has_effect(self.eff_req.eff_type, self.eff_req.name)
+    
+    def complete_mission(self, effect: Effect, target: "CharacterManager"):
+        effect.user.remove_effect(effect.user.get_effect(self.eff_req.eff_type, self.eff_req.name))
+
+class NemurinNapTrigger(EffectMission):
+    
+    def __init__(self):
+        super().__init__(5, 0, EffectType.CONT_UNIQUE)
+    
+    def conditions_met(self, effect: Effect, target: "CharacterManager") -> bool:
+        return target.source.name == "nemurin" and effect.mag <= 0 and super().conditions_met(effect, target)
+    
+    def complete_mission(self, effect: Effect, target: "CharacterManager"):
+        if not (target.has_effect(EffectType.SYSTEM, "NemurinMission5Tracker") or target.has_effect(EffectType.SYSTEM, "NemurinMission5Failure")):
+            target.add_effect(Effect("NemurinMission5Tracker", EffectType.SYSTEM, target, 280000, lambda eff: "", mag=1, system=True))
+        else:
+            target.add_effect(Effect("NemurinMission5Failure", EffectType.SYSTEM, target, 280000, lambda eff: "", system=True))
+
+def stunned(target: "CharacterManager") -> bool:
+    return target.is_stunned()
+
 def invuln(target: "CharacterManager") -> bool:
     return target.check_invuln()
 
@@ -461,6 +586,12 @@ class MissionHandler:
         except KeyError:
             pass
 
+    @classmethod
+    def handle_effect_mission(self, effect: Effect, target: "CharacterManager", event: str):
+        for mission in effect_mission_handler.get((effect.name, event), ()):
+            if mission.conditions_met(effect, target):
+                mission.complete_mission(effect, target)
+
 class TriggerHandler:
     
     @classmethod
@@ -500,6 +631,35 @@ killing_blow_trigger_handler: dict[str, list[KillingBlowTrigger]] = {
     
 }
       
+# Keyed by (effect name, event). "tick" runs for effects on the player's team
+# at the end of the player's turn, "expire" when those effects run out, and
+# "enemy_tick"/"enemy_expire" do the same for effects on the enemy team.
+# "turn_start" runs for effects on the player's team as their turn begins.
+effect_mission_handler: dict[Tuple[str, str], list[EffectMission]] = {
+    ("Tsukuyomi", "tick"): [EffectMission(2, eff_type=EffectType.ALL_STUN, target_states=[stunned,])],
+    ("Alaudi's Handcuffs", "tick"): [EffectMission(4, eff_type=EffectType.ALL_STUN, target_states=[stunned,])],
+    ("Active Combat Mode", "tick"): [EffectMission(2, eff_type=EffectType.CONT_DEST_DEF)],
+    ("Dive", "tick"): [EffectMission(4)],
+    ("Ally Mobilization", "tick"): [EffectMission(2)],
+    ("Loyal Guard", "tick"): [EffectMission(3, target_states=[invuln,], target_progress=True)],
+    ("Fog of London", "tick"): [EffectCountMission("JackMission5Tracker", "JackMission5Success", 10, eff_type=EffectType.MARK)],
+    ("Shadow Clones", "tick"): [EffectMission(1, eff_type=EffectType.ALL_DR)],
+    ("Asari Ugetsu", "tick"): [EffectMission(5, eff_type=EffectType.ALL_DR)],
+    ("Flying Raijin", "tick"): [EffectMission(5, eff_type=EffectType.ALL_INVULN)],
+    ("Kamui", "tick"): [EffectMission(5, eff_type=EffectType.IGNORE)],
+    ("Ice, Make Unlimited", "tick"): [EffectMission(1)],
+    ("Summon Gyudon", "tick"): [EffectMission(5, eff_type=EffectType.MARK)],
+    ("Bridal Chest", "expire"): [EffectResetTrigger(EffectRequirement(EffectType.SYSTEM, "FrankensteinMission2Counter"))],
+    ("Lightning Palm", "expire"): [EffectFailureTrigger("KilluaMission5Failure", EffectRequirement(EffectType.SYSTEM, "KilluaMission5Tracker"))],
+    ("Narukami", "expire"): [EffectFailureTrigger("KilluaMission5Failure", EffectRequirement(EffectType.SYSTEM, "KilluaMission5Tracker"))],
+    ("Whirlwind Rush", "expire"): [EffectFailureTrigger("KilluaMission5Failure", EffectRequirement(EffectType.SYSTEM, "KilluaMission5Tracker"))],
+    ("Consecutive Normal Punches", "enemy_tick"): [EffectConsecutiveMission(2, "SaitamaMission2Tracker", 7)],
+    ("In The Name Of Ruler!", "enemy_expire"): [EffectMission(1, eff_type=EffectType.ALL_STUN)],
+    ("Hidden Mine", "enemy_expire"): [EffectMission(5, eff_type=EffectType.UNIQUE)],
+    ("Illusory Disorientation", "enemy_expire"): [EffectMission(5)],
+    ("Nemurin Nap", "turn_start"): [NemurinNapTrigger()],
+}
+
 killing_blow_mission_handler: dict[str, list[KillingBlowMission]] = {
     "all": [KillingBlowHandoffMission(1, user_eff_req=EffectRequirement(EffectType.ALL_DR, "Flag of the Ruler")),
             KillingBlowHandoffMission(3, target_effect_req=EffectRequirement(EffectType.ALL_STUN, "Shadow Bind Jutsu"), user_eff_handoff=False, required_handoff=True),
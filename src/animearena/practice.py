@@ -0,0 +1,122 @@
+"""Local practice matches against the search AI.
+
+A PracticeOpponent stands in for the server connection of a battle scene.
+The player's confirmed turns are played on the opponent's own headless
+scene, the same way two connected clients each run the match, and a
+SearchPlayer answers with a turn of its own:
+
+    scene_manager.start_practice(player, player_team, enemy_team)
+
+Practice matches are not reported to the server, and the player's record
+and missions are left as they were.
+"""
+import asyncio
+import logging
+import random
+import typing
+from typing import Optional, Tuple
+
+from animearena.ai import SearchPlayer
+from animearena.battle_scene import AbilityMessage
+from animearena.character import Character
+from animearena.headless import HeadlessBattleScene, make_headless_battle_scene
+
+if typing.TYPE_CHECKING:
+    from animearena.battle_scene import BattleScene
+    from animearena.player import Player
+
+# Seconds the opponent thinks per turn
+PRACTICE_BUDGET = 3.0
+
+
+def roll_energy(rng: random.Random) -> list[int]:
+    return [rng.randint(0, 3) for _ in range(6)]
+
+
+class PracticeOpponent():
+    """Plays the enemy side of a local match against a battle scene."""
+
+    battle_scene: "BattleScene"
+    stored_player: "Player"
+    scene: HeadlessBattleScene
+    searcher: SearchPlayer
+    rng: random.Random
+
+    def __init__(self, battle_scene: "BattleScene", player: "Player",
+                 budget: float = PRACTICE_BUDGET, processes: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.battle_scene = battle_scene
+        self.stored_player = player
+        self.rng = random.Random(seed)
+        self.searcher = SearchPlayer(budget, processes=processes, seed=self.rng.getrandbits(32))
+        self.scene = make_headless_battle_scene()
+        self.searcher.attach(self.scene)
+
+    def start(self, player_team: list[Character], enemy_team: list[Character]) -> Tuple[list[int], int]:
+        """Set up the opponent's side, with the player moving first, and
+        return the player's starting energy and the match seed."""
+        seed = self.rng.getrandbits(32)
+        start_pool = roll_energy(self.rng)
+        player_energy = [0, 0, 0, 0]
+        player_energy[start_pool[0]] += 1
+        energy = [0, 0, 0, 0]
+        for i in range(3):
+            energy[start_pool[i]] += 1
+        self.scene.moving_first = False
+        self.scene.waiting_for_turn = True
+        self.scene.setup_scene([Character(character.name) for character in enemy_team],
+                               [Character(character.name) for character in player_team],
+                               energy=energy, seed=seed)
+        self.searcher.start()
+        return player_energy, seed
+
+    def send_match_communication(self, ability_messages: list[AbilityMessage],
+                                 execution_order: list[int], random_spent: list[int]):
+        # The scene clears its messages once they are sent.
+        args = (list(ability_messages), list(execution_order))
+        asyncio.get_running_loop().run_in_executor(None, self.play_turn, *args) \
+            .add_done_callback(self.deliver_turn)
+
+    def play_turn(self, ability_messages: list[AbilityMessage],
+                  execution_order: list[int]) -> Optional[Tuple[list[AbilityMessage], list[int]]]:
+        """Play the player's turn on the opponent's scene, then search for
+        and play the answer. Runs off the game loop."""
+        self.scene.enemy_execution_loop(ability_messages, execution_order, roll_energy(self.rng))
+        if self.scene.game_over:
+            return None
+        self.searcher.take_turn(self.scene)
+        self.scene.get_execution_order_base("ally")
+        execution_order = list(self.scene.execution_order)
+        return self.scene.execute_turn(), execution_order
+
+    def deliver_turn(self, future: asyncio.Future):
+        if self.battle_scene.practice is not self:
+            return
+        try:
+            turn = future.result()
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("The practice opponent could not play its turn")
+            turn = ([], [])
+        if turn is None:
+            return
+        ability_messages, execution_order = turn
+        potential_energy = roll_energy(self.rng)
+        if self.battle_scene.skipping_animations:
+            self.battle_scene.enemy_execution_loop(ability_messages, execution_order, potential_energy)
+        else:
+            self.battle_scene.start_enemy_execution(ability_messages, execution_order, potential_energy)
+
+    def send_surrender(self, mission_packages: list[list[int]]):
+        self.close()
+
+    def send_match_ending(self, won: bool):
+        self.close()
+
+    def send_player_update(self, player: "Player"):
+        pass
+
+    def send_match_statistics(self, names: list[str], won: bool):
+        pass
+
+    def close(self):
+        self.searcher.close()
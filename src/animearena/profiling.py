@@ -0,0 +1,187 @@
+"""Timing hooks for turn resolution.
+
+The rules code marks its expensive steps with @timed. While the profiler is
+on, each call is timed into a histogram keyed by the step and a label, such
+as the character acting or being hit. Nested calls are also folded into
+stacks, which flame graph tools read directly:
+
+    profiler.enable()
+    ... play some turns ...
+    profiler.dump(Path("profiles") / "match")   # match.json and match.folded
+
+    flamegraph.pl profiles/match.folded > match.svg
+
+Set ANIMEARENA_PROFILE=1 to profile from startup. Every finished match is
+then written to the profiles directory, and F12 writes what has been
+collected so far. With the profiler off, a timed call costs one attribute
+check.
+"""
+import contextlib
+import functools
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+PROFILE_ENV = "ANIMEARENA_PROFILE"
+PROFILE_DIR = Path("profiles")
+# Bucket i counts calls of under 2 ** i microseconds; the last bucket takes
+# everything from about 8 seconds up.
+BUCKETS = 24
+
+
+class Histogram():
+    """Call count, total, maximum and a log2 histogram of call times."""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.buckets[min(int(elapsed * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """An upper bound, in seconds, on the given fraction of call times."""
+        wanted = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1e3,
+            "mean_ms": self.total * 1e3 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5) * 1e3,
+            "p99_ms": self.percentile(0.99) * 1e3,
+            "max_ms": self.max * 1e3,
+            "buckets_us": {f"<{2 ** i}": count for i, count in enumerate(self.buckets) if count},
+        }
+
+
+class _Frame():
+    __slots__ = ("path", "start", "children")
+
+    def __init__(self, path: str, start: float):
+        self.path = path
+        self.start = start
+        self.children = 0.0
+
+
+class Profiler():
+    """Histograms of timed calls, by step and label, and their folded stacks."""
+
+    enabled: bool
+    histograms: dict[str, dict[str, Histogram]]
+    # folded call stack -> seconds spent in its innermost call itself
+    stacks: dict[str, float]
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.stacks = {}
+        self._frames: list[_Frame] = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.histograms.clear()
+        self.stacks.clear()
+
+    def enter(self, name: str, label: str) -> _Frame:
+        frame_name = f"{name}:{label}" if label else name
+        # ";" separates frames in the folded stacks.
+        frame_name = frame_name.replace(";", ",")
+        path = f"{self._frames[-1].path};{frame_name}" if self._frames else frame_name
+        frame = _Frame(path, time.perf_counter())
+        self._frames.append(frame)
+        return frame
+
+    def exit(self, frame: _Frame, name: str, label: str):
+        elapsed = time.perf_counter() - frame.start
+        # A frame left open by an exception is closed with its caller.
+        while self._frames and self._frames.pop() is not frame:
+            pass
+        if self._frames:
+            self._frames[-1].children += elapsed
+        histogram = self.histograms.setdefault(name, {}).get(label)
+        if histogram is None:
+            histogram = self.histograms[name][label] = Histogram()
+        histogram.add(elapsed)
+        self.stacks[frame.path] = self.stacks.get(frame.path, 0.0) + elapsed - frame.children
+
+    @contextlib.contextmanager
+    def span(self, name: str, label: str = "") -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        frame = self.enter(name, label)
+        try:
+            yield
+        finally:
+            self.exit(frame, name, label)
+
+    def to_json(self) -> dict:
+        return {
+            name: {label: histogram.to_json()
+                   for label, histogram in sorted(labels.items(), key=lambda item: -item[1].total)}
+            for name, labels in self.histograms.items()
+        }
+
+    def dump_json(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=1)
+
+    def dump_folded(self, path: Path):
+        """One line per stack with its self time in microseconds, the
+        format flamegraph.pl and speedscope read."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                micros = round(seconds * 1e6)
+                if micros > 0:
+                    f.write(f"{stack.replace(' ', '_')} {micros}\n")
+
+    def dump(self, stem: Path):
+        """Write stem.json and stem.folded."""
+        self.dump_json(stem.parent / f"{stem.name}.json")
+        self.dump_folded(stem.parent / f"{stem.name}.folded")
+
+
+profiler = Profiler(enabled=os.environ.get(PROFILE_ENV) == "1")
+
+
+def timed(name: Optional[str] = None, label: Optional[Callable[..., str]] = None):
+    """Time every call of the decorated function while the profiler is on.
+    label, given the call's arguments, names what the call is about."""
+    def decorate(func: Callable) -> Callable:
+        step = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            call_label = label(*args, **kwargs) if label else ""
+            frame = profiler.enter(step, call_label)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.exit(frame, step, call_label)
+        return wrapper
+    return decorate
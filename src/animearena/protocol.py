@@ -0,0 +1,419 @@
+"""Packet schemas and framing for the client/server protocol.
+
+Every packet is an int packet id followed by its fields, all big-endian.
+Schemas are declared once per packet id, and the encoder and decoder for
+each are generated from the declaration, with runs of fixed-size fields
+packed by a single precompiled struct.
+"""
+import asyncio
+import enum
+import struct
+from collections import namedtuple
+from typing import Any, Callable, Optional, Sequence, Tuple, Union
+
+from animearena.battle_scene import AbilityMessage
+
+FRAME_HEADER = struct.Struct(">I")
+SENTINEL = b'\x1f\x1f\x1f'
+MAX_FRAME_SIZE = 1024 * 256
+
+_COUNT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+
+
+class Framing(enum.IntEnum):
+    # The deployed server ends every packet with SENTINEL. Length-prefixed
+    # frames carry binary payloads (avatars) safely and can be read without
+    # scanning, but need a server that speaks them.
+    SENTINEL = 0
+    LENGTH_PREFIXED = 1
+
+
+#region Fields
+
+class Field:
+    """A single value in a packet."""
+
+    # struct format for fixed-size fields, empty for variable-size ones
+    fmt: str = ""
+    size: int = 1
+
+    def pack(self, value: Any, out: bytearray):
+        raise NotImplementedError
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[Any, int]:
+        raise NotImplementedError
+
+
+class Int(Field):
+
+    fmt = "i"
+
+    def pack(self, value: int, out: bytearray):
+        out += _COUNT.pack(value)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[int, int]:
+        return _COUNT.unpack_from(data, offset)[0], offset + 4
+
+
+class Long(Field):
+
+    fmt = "q"
+
+    def pack(self, value: int, out: bytearray):
+        out += _LONG.pack(value)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[int, int]:
+        return _LONG.unpack_from(data, offset)[0], offset + 8
+
+
+class Ints(Field):
+    """A fixed number of ints, as a list."""
+
+    def __init__(self, count: int):
+        self.size = count
+        self.fmt = f"{count}i"
+        self.struct = struct.Struct(">" + self.fmt)
+
+    def pack(self, value: Sequence[int], out: bytearray):
+        out += self.struct.pack(*value)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[list[int], int]:
+        return list(self.struct.unpack_from(data, offset)), offset + self.struct.size
+
+
+class String(Field):
+
+    def pack(self, value: str, out: bytearray):
+        encoded = value.encode('utf-8')
+        out += _COUNT.pack(len(encoded))
+        out += encoded
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[str, int]:
+        length, offset = _read_length(data, offset)
+        return str(data[offset:offset + length], 'utf-8'), offset + length
+
+
+class Bytes(Field):
+
+    def pack(self, value: bytes, out: bytearray):
+        out += _COUNT.pack(len(value))
+        out += value
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[bytes, int]:
+        length, offset = _read_length(data, offset)
+        return bytes(data[offset:offset + length]), offset + length
+
+
+class OptionalBytes(Bytes):
+    """An int flag, followed by the bytes when it is set."""
+
+    def pack(self, value: Optional[bytes], out: bytearray):
+        if value is None:
+            out += _COUNT.pack(0)
+            return
+        out += _COUNT.pack(1)
+        super().pack(value, out)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[Optional[bytes], int]:
+        present = _COUNT.unpack_from(data, offset)[0]
+        if not present:
+            return None, offset + 4
+        return super().unpack(data, offset + 4)
+
+
+class Array(Field):
+    """A fixed number of values of one field type."""
+
+    def __init__(self, field: Field, count: int):
+        self.field = field
+        self.count = count
+
+    def pack(self, value: Sequence, out: bytearray):
+        if len(value) != self.count:
+            raise ValueError(f"expected {self.count} values, got {len(value)}")
+        for item in value:
+            self.field.pack(item, out)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[list, int]:
+        values = []
+        for _ in range(self.count):
+            value, offset = self.field.unpack(data, offset)
+            values.append(value)
+        return values, offset
+
+
+class List(Array):
+    """An int count followed by that many values of one field type."""
+
+    def __init__(self, field: Field):
+        super().__init__(field, 0)
+
+    def pack(self, value: Sequence, out: bytearray):
+        out += _COUNT.pack(len(value))
+        for item in value:
+            self.field.pack(item, out)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[list, int]:
+        count, offset = _read_length(data, offset)
+        values = []
+        for _ in range(count):
+            value, offset = self.field.unpack(data, offset)
+            values.append(value)
+        return values, offset
+
+
+class Record(Field):
+    """Named fields packed in order.
+
+    Values are packed from attributes of the given object, and unpacked
+    into a namedtuple, or whatever build returns for the unpacked fields."""
+
+    def __init__(self, name: str, fields: list[Tuple[str, Field]],
+                 build: Optional[Callable[..., Any]] = None):
+        self.name = name
+        self.fields = fields
+        self.tuple = namedtuple(name, [field_name for field_name, _ in fields])
+        self.build = build or self.tuple
+        self.steps = _compile(fields)
+
+    def pack(self, value: Any, out: bytearray):
+        for step, names in self.steps:
+            if isinstance(step, struct.Struct):
+                values = []
+                for field_name, size in names:
+                    if size == 1:
+                        values.append(getattr(value, field_name))
+                    else:
+                        values.extend(getattr(value, field_name))
+                out += step.pack(*values)
+            else:
+                step.pack(getattr(value, names), out)
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[Any, int]:
+        values = {}
+        for step, names in self.steps:
+            if isinstance(step, struct.Struct):
+                unpacked = step.unpack_from(data, offset)
+                offset += step.size
+                i = 0
+                for field_name, size in names:
+                    if size == 1:
+                        values[field_name] = unpacked[i]
+                    else:
+                        values[field_name] = list(unpacked[i:i + size])
+                    i += size
+            else:
+                values[names], offset = step.unpack(data, offset)
+        return self.build(**values), offset
+
+
+def _read_length(data: memoryview, offset: int) -> Tuple[int, int]:
+    length = _COUNT.unpack_from(data, offset)[0]
+    if length < 0 or offset + 4 + length > len(data):
+        raise ValueError(f"bad length {length} at offset {offset}")
+    return length, offset + 4
+
+
+def _compile(fields: list[Tuple[str, Field]]) -> list[Tuple[Union[struct.Struct, Field], Any]]:
+    """Merge each run of fixed-size fields into one struct."""
+    steps = []
+    run_fmt = ""
+    run_names = []
+    for field_name, field in fields:
+        if field.fmt:
+            run_fmt += field.fmt
+            run_names.append((field_name, field.size))
+            continue
+        if run_names:
+            steps.append((struct.Struct(">" + run_fmt), run_names))
+            run_fmt, run_names = "", []
+        steps.append((field, field_name))
+    if run_names:
+        steps.append((struct.Struct(">" + run_fmt), run_names))
+    return steps
+
+#endregion
+
+#region Packets
+
+class PacketSchema(Record):
+    """A packet id and the fields that follow it."""
+
+    packet_id: int
+
+    def __init__(self, packet_id: int, name: str, fields: list[Tuple[str, Field]]):
+        super().__init__(name, [("packet_id", Int())] + fields)
+        self.packet_id = packet_id
+
+    def encode(self, *args, **kwargs) -> bytearray:
+        out = bytearray()
+        self.pack(self.tuple(self.packet_id, *args, **kwargs), out)
+        return out
+
+    def decode(self, data: bytes) -> tuple:
+        """Unpack a packet payload. Trailing bytes, like a sentinel, are ignored."""
+        packet, _ = self.unpack(memoryview(data), 0)
+        if packet.packet_id != self.packet_id:
+            raise ValueError(f"{self.name} has id {self.packet_id}, got {packet.packet_id}")
+        return packet
+
+
+def _build_ability_message(user_id: int, ability_id: int, primary_id: int,
+                           ally_targets: list[int], enemy_targets: list[int]) -> AbilityMessage:
+    message = AbilityMessage()
+    message.assign_user_id(user_id)
+    message.assign_ability_id(ability_id)
+    message.set_primary_target(primary_id)
+    message.ally_targets = ally_targets
+    message.enemy_targets = enemy_targets
+    return message
+
+
+ABILITY_MESSAGE = Record("ability_message", [
+    ("user_id", Int()),
+    ("ability_id", Int()),
+    ("primary_id", Int()),
+    ("ally_targets", List(Int())),
+    ("enemy_targets", List(Int())),
+], build=_build_ability_message)
+
+TURN = Record("turn", [
+    ("abilities", List(ABILITY_MESSAGE)),
+    ("execution_order", List(Int())),
+    ("random_spent", Ints(4)),
+])
+
+# The server relays pouches as sent. Current clients put "sha256:<hash>" in
+# image_mode and compressed avatar bytes in image (see animearena.avatar);
+# older clients send the PIL mode and raw pixels.
+PLAYER_POUCH = [
+    ("name", String()),
+    ("wins", Int()),
+    ("losses", Int()),
+    ("image_mode", String()),
+    ("image_size", Ints(2)),
+    ("image", Bytes()),
+]
+
+MISSION_PACKAGES = Array(Ints(5), 3)
+TEAM_NAMES = Array(String(), 3)
+
+# Sent by the server, keyed to ConnectionHandler.packets
+SERVER_QUICK_MATCH_START = PacketSchema(0, "quick_match_start", [
+    ("seed", Int()), ("first_turn", Int()), ("start_pool", Ints(6)),
+    ("names", TEAM_NAMES)] + PLAYER_POUCH)
+SERVER_MATCH_COMMUNICATION = PacketSchema(1, "match_communication", [
+    ("timeout", Int()),
+    ("abilities", List(ABILITY_MESSAGE)),
+    ("execution_order", List(Int())),
+    ("random_spent", Ints(4)),
+    ("potential_energy", Ints(6)),
+])
+SERVER_LOGIN_FAILURE = PacketSchema(2, "login_failure", [("message", String())])
+SERVER_LOGIN_SUCCESS = PacketSchema(3, "login_success", [
+    ("wins", Int()), ("losses", Int()), ("medals", Int()),
+    ("mission_data", String()), ("avatar", OptionalBytes())])
+SERVER_REGISTRATION = PacketSchema(4, "registration", [("message", String())])
+SERVER_SURRENDER_NOTIFICATION = PacketSchema(5, "surrender_notification", [
+    ("mission_packages", MISSION_PACKAGES)])
+SERVER_RECONNECTION = PacketSchema(6, "reconnection", [
+    ("seed", Int()), ("player_names", TEAM_NAMES)] + PLAYER_POUCH + [
+    ("enemy_names", TEAM_NAMES),
+    ("first_turn", Int()),
+    ("time_remaining", Int()),
+    ("turns", List(TURN)),
+    ("energy_pools", List(Ints(6))),
+])
+SERVER_VERSION_CHECK = PacketSchema(7, "version_check", [("version", String())])
+SERVER_TIMEOUT = PacketSchema(8, "timeout", [])
+SERVER_LOGIN_NONCE = PacketSchema(9, "login_nonce", [("nonce", Int())])
+SERVER_RANKED_MATCH_START = PacketSchema(10, "ranked_match_start", [
+    ("first_turn", Int())] + PLAYER_POUCH)
+SERVER_DRAFT_MESSAGE = PacketSchema(11, "draft_message", [("character", String())])
+SERVER_DRAFT_FINALIZATION = PacketSchema(12, "draft_finalization", [
+    ("seed", Int()), ("start_pool", Ints(6))])
+SERVER_DRAFT_TIMEOUT = PacketSchema(13, "draft_timeout", [])
+SERVER_DRAFT_DISCONNECTION = PacketSchema(14, "draft_disconnection", [])
+
+# Sent by the client
+CLIENT_QUICK_MATCH_START = PacketSchema(0, "quick_match_start", [
+    ("names", TEAM_NAMES)] + PLAYER_POUCH)
+CLIENT_MATCH_COMMUNICATION = PacketSchema(1, "match_communication", [
+    ("timeout", Int()),
+    ("abilities", List(ABILITY_MESSAGE)),
+    ("execution_order", List(Int())),
+    ("random_spent", Ints(4)),
+])
+CLIENT_LOGIN_ATTEMPT = PacketSchema(2, "login_attempt", [
+    ("username", String()), ("digest", String())])
+CLIENT_REGISTRATION = PacketSchema(3, "registration", [
+    ("username", String()), ("digest", String())])
+CLIENT_AVATAR_UPDATE = PacketSchema(4, "avatar_update", [("avatar", Bytes())])
+CLIENT_PLAYER_UPDATE = PacketSchema(5, "player_update", [
+    ("wins", Int()), ("losses", Int()), ("medals", Int()),
+    ("mission_data", String())])
+CLIENT_SURRENDER = PacketSchema(6, "surrender", [("mission_packages", MISSION_PACKAGES)])
+CLIENT_SEARCH_CANCELLATION = PacketSchema(7, "search_cancellation", [])
+CLIENT_MATCH_ENDING = PacketSchema(8, "match_ending", [("won", Int())])
+CLIENT_MATCH_STATISTICS = PacketSchema(9, "match_statistics", [
+    ("names", TEAM_NAMES), ("won", Int())])
+CLIENT_VERSION_REQUEST = PacketSchema(10, "version_request", [])
+CLIENT_LOGIN_NONCE_REQUEST = PacketSchema(11, "login_nonce_request", [])
+CLIENT_RANKED_MATCH_START = PacketSchema(12, "ranked_match_start", PLAYER_POUCH)
+CLIENT_DRAFT_MESSAGE = PacketSchema(13, "draft_message", [("character", String())])
+CLIENT_DRAFT_FINALIZATION = PacketSchema(14, "draft_finalization", [("names", TEAM_NAMES)])
+
+
+def _registry(*schemas: PacketSchema) -> dict[int, PacketSchema]:
+    registry = {}
+    for schema in schemas:
+        if schema.packet_id in registry:
+            raise ValueError(f"duplicate packet id {schema.packet_id}")
+        registry[schema.packet_id] = schema
+    return registry
+
+
+SERVER_PACKETS = _registry(
+    SERVER_QUICK_MATCH_START, SERVER_MATCH_COMMUNICATION, SERVER_LOGIN_FAILURE,
+    SERVER_LOGIN_SUCCESS, SERVER_REGISTRATION, SERVER_SURRENDER_NOTIFICATION,
+    SERVER_RECONNECTION, SERVER_VERSION_CHECK, SERVER_TIMEOUT, SERVER_LOGIN_NONCE,
+    SERVER_RANKED_MATCH_START, SERVER_DRAFT_MESSAGE, SERVER_DRAFT_FINALIZATION,
+    SERVER_DRAFT_TIMEOUT, SERVER_DRAFT_DISCONNECTION)
+
+CLIENT_PACKETS = _registry(
+    CLIENT_QUICK_MATCH_START, CLIENT_MATCH_COMMUNICATION, CLIENT_LOGIN_ATTEMPT,
+    CLIENT_REGISTRATION, CLIENT_AVATAR_UPDATE, CLIENT_PLAYER_UPDATE,
+    CLIENT_SURRENDER, CLIENT_SEARCH_CANCELLATION, CLIENT_MATCH_ENDING,
+    CLIENT_MATCH_STATISTICS, CLIENT_VERSION_REQUEST, CLIENT_LOGIN_NONCE_REQUEST,
+    CLIENT_RANKED_MATCH_START, CLIENT_DRAFT_MESSAGE, CLIENT_DRAFT_FINALIZATION)
+
+#endregion
+
+#region Framing
+
+def peek_packet_id(payload: bytes) -> int:
+    return _COUNT.unpack_from(payload, 0)[0]
+
+
+def frame(payload: bytes, framing: Framing) -> bytes:
+    if framing == Framing.LENGTH_PREFIXED:
+        return FRAME_HEADER.pack(len(payload)) + payload
+    return bytes(payload) + SENTINEL
+
+
+async def read_frame(reader: asyncio.StreamReader, framing: Framing) -> bytes:
+    """Read one packet payload, without its framing."""
+    if framing == Framing.LENGTH_PREFIXED:
+        length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))[0]
+        if length > MAX_FRAME_SIZE:
+            # Skip the payload so the next read starts on a frame header.
+            remaining = length
+            while remaining > 0:
+                remaining -= len(await reader.readexactly(min(remaining, MAX_FRAME_SIZE)))
+            raise ValueError(f"frame of {length} bytes is over the {MAX_FRAME_SIZE} byte limit")
+        return await reader.readexactly(length)
+    data = await reader.readuntil(SENTINEL)
+    return data[:-len(SENTINEL)]
+
+#endregion
@@ -0,0 +1,182 @@
+"""Compact binary match logs.
+
+A log is MAGIC followed by length-prefixed records, each a packet schema
+with a leading record id: one header, one record per turn, and the final
+state of every character once the match is over. Turn records hold what
+went over the wire that turn, plus the energy pool it was confirmed with,
+so a match can be re-executed from its log alone (see animearena.replay).
+"""
+import enum
+import typing
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from animearena.energy import Energy
+from animearena.protocol import (ABILITY_MESSAGE, FRAME_HEADER, TEAM_NAMES, Framing, Int, Ints,
+                                 List, Long, PacketSchema, Record, String, frame,
+                                 peek_packet_id)
+
+if typing.TYPE_CHECKING:
+    from animearena.battle_scene import AbilityMessage
+    from animearena.character_manager import CharacterManager
+
+MAGIC = b"AAREC\x01"
+NO_USER = -1
+
+
+class MatchOutcome(enum.IntEnum):
+    UNFINISHED = 0
+    WON = 1
+    LOST = 2
+    # Won because the opponent surrendered
+    SURRENDERED = 3
+    # Lost by surrendering
+    CONCEDED = 4
+
+
+EFFECT_STATE = Record("effect_state", [
+    ("name", String()),
+    ("eff_type", Int()),
+    ("user", Int()),
+    ("duration", Int()),
+    ("mag", Int()),
+])
+
+CHARACTER_STATE = Record("character_state", [
+    ("name", String()),
+    ("hp", Int()),
+    ("dead", Int()),
+    ("effects", List(EFFECT_STATE)),
+])
+
+RECORD_HEADER = PacketSchema(0, "header", [
+    ("seed", Long()),
+    ("moving_first", Int()),
+    ("energy", Ints(4)),
+    ("ally_names", TEAM_NAMES),
+    ("enemy_names", TEAM_NAMES),
+])
+RECORD_PLAYER_TURN = PacketSchema(1, "player_turn", [
+    ("abilities", List(ABILITY_MESSAGE)),
+    ("execution_order", List(Int())),
+    ("random_spent", Ints(4)),
+    ("energy_pool", Ints(5)),
+])
+RECORD_ENEMY_TURN = PacketSchema(2, "enemy_turn", [
+    ("abilities", List(ABILITY_MESSAGE)),
+    ("execution_order", List(Int())),
+    ("potential_energy", Ints(6)),
+])
+RECORD_TIMEOUT = PacketSchema(3, "timeout", [
+    ("abilities", List(ABILITY_MESSAGE)),
+    ("energy_pool", Ints(5)),
+])
+RECORD_RESULT = PacketSchema(4, "result", [
+    ("outcome", Int()),
+    ("characters", List(CHARACTER_STATE)),
+])
+
+RECORDS = {
+    schema.packet_id: schema
+    for schema in (RECORD_HEADER, RECORD_PLAYER_TURN, RECORD_ENEMY_TURN,
+                   RECORD_TIMEOUT, RECORD_RESULT)
+}
+
+
+def pool_values(energy_pool: dict[Energy, int]) -> list[int]:
+    return [energy_pool[Energy(i)] for i in range(5)]
+
+
+def capture_state(managers: Iterable["CharacterManager"]) -> list[tuple]:
+    """The hp and effects of each character, in the order given."""
+    states = []
+    for manager in managers:
+        effects = []
+        for effect in manager.source.current_effects:
+            user = NO_USER
+            if effect.user is not None:
+                user = effect.user.char_id + (3 if effect.user.id == "enemy" else 0)
+            effects.append(EFFECT_STATE.tuple(effect.name, effect.eff_type.value, user,
+                                              effect.duration, int(effect.mag or 0)))
+        states.append(CHARACTER_STATE.tuple(manager.source.name, manager.source.hp,
+                                            int(manager.source.dead), effects))
+    return states
+
+
+class MatchRecorder():
+    """Appends the records of one match to an in-memory log."""
+
+    log: bytearray
+    finished: bool
+
+    def __init__(self):
+        self.log = bytearray(MAGIC)
+        self.finished = False
+
+    def append(self, payload: bytes):
+        self.log += frame(payload, Framing.LENGTH_PREFIXED)
+
+    def start(self, ally_names: list[str], enemy_names: list[str], energy: list[int],
+              seed: int, moving_first: bool):
+        self.log = bytearray(MAGIC)
+        self.finished = False
+        self.append(RECORD_HEADER.encode(seed, int(moving_first), energy, ally_names,
+                                         enemy_names))
+
+    def record_player_turn(self, abilities: list["AbilityMessage"], execution_order: list[int],
+                           random_spent: list[int], energy_pool: dict[Energy, int]):
+        self.append(RECORD_PLAYER_TURN.encode(abilities, execution_order, random_spent,
+                                              pool_values(energy_pool)))
+
+    def record_enemy_turn(self, abilities: list["AbilityMessage"], execution_order: list[int],
+                          potential_energy: list[int]):
+        self.append(RECORD_ENEMY_TURN.encode(abilities, execution_order, potential_energy))
+
+    def record_timeout(self, abilities: list["AbilityMessage"], energy_pool: dict[Energy, int]):
+        self.append(RECORD_TIMEOUT.encode(abilities, pool_values(energy_pool)))
+
+    def finish(self, managers: Iterable["CharacterManager"], won: Optional[bool] = None,
+               surrendered: bool = False):
+        """Record the final state. won is None for a match cut short."""
+        if self.finished:
+            return
+        self.finished = True
+        if won is None:
+            outcome = MatchOutcome.UNFINISHED
+        elif surrendered:
+            outcome = MatchOutcome.SURRENDERED if won else MatchOutcome.CONCEDED
+        else:
+            outcome = MatchOutcome.WON if won else MatchOutcome.LOST
+        self.append(RECORD_RESULT.encode(int(outcome), capture_state(managers)))
+
+    def save(self, path: Union[str, Path]):
+        with open(path, "wb") as f:
+            f.write(self.log)
+
+
+def read_records(data: bytes) -> Iterator[tuple]:
+    """Decode every record in a match log, header first."""
+    if not data.startswith(MAGIC):
+        raise ValueError("not a match log")
+    view = memoryview(data)
+    offset = len(MAGIC)
+    while offset < len(view):
+        length = FRAME_HEADER.unpack_from(view, offset)[0]
+        offset += FRAME_HEADER.size
+        payload = view[offset:offset + length]
+        if len(payload) != length:
+            raise ValueError(f"truncated record at offset {offset}")
+        offset += length
+        yield RECORDS[peek_packet_id(payload)].decode(payload)
+
+
+def load_records(path: str) -> list[tuple]:
+    with open(path, "rb") as f:
+        return list(read_records(f.read()))
+
+
+def outcome_of(records: list[tuple]) -> Optional[tuple]:
+    """The result record of a log, if the match was finished."""
+    if records and records[-1].packet_id == RECORD_RESULT.packet_id:
+        return records[-1]
+    return None
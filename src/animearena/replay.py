@@ -0,0 +1,133 @@
+"""Headless re-execution of recorded matches.
+
+Replays each match log from its seed and recorded turns with nothing drawn,
+and checks that every character ends with the recorded hp and effects:
+
+    python -m animearena.replay replays/*.aar
+"""
+import argparse
+import logging
+import multiprocessing
+import sys
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from animearena.character import Character
+from animearena.headless import HeadlessBattleScene, make_headless_battle_scene
+from animearena.recording import (RECORD_ENEMY_TURN, RECORD_PLAYER_TURN, RECORD_TIMEOUT,
+                                  MatchOutcome, capture_state, load_records, outcome_of)
+
+
+class ReplayResult(NamedTuple):
+    path: str
+    turns: int
+    # "ok", "mismatch", "unfinished" or "error"
+    status: str
+    problems: list[str]
+
+
+def start_replay(header: tuple) -> HeadlessBattleScene:
+    scene = make_headless_battle_scene()
+    scene.moving_first = bool(header.moving_first)
+    scene.waiting_for_turn = not scene.moving_first
+    scene.setup_scene([Character(name) for name in header.ally_names],
+                      [Character(name) for name in header.enemy_names],
+                      energy=header.energy, seed=header.seed)
+    return scene
+
+
+def replay_record(scene: HeadlessBattleScene, record: tuple):
+    if record.packet_id == RECORD_PLAYER_TURN.packet_id:
+        scene.replay_turn(record.abilities, record.execution_order, record.energy_pool)
+    elif record.packet_id == RECORD_ENEMY_TURN.packet_id:
+        scene.enemy_execution_loop(record.abilities, record.execution_order,
+                                   record.potential_energy)
+    elif record.packet_id == RECORD_TIMEOUT.packet_id:
+        scene.replay_timeout(record.abilities, record.energy_pool)
+
+
+def compare_states(expected: Iterable[tuple], actual: Iterable[tuple]) -> list[str]:
+    problems = []
+    for slot, (recorded, replayed) in enumerate(zip(expected, actual)):
+        side = "ally" if slot < 3 else "enemy"
+        label = f"{side} {slot % 3} ({recorded.name})"
+        if recorded.hp != replayed.hp:
+            problems.append(f"{label}: hp {replayed.hp}, recorded {recorded.hp}")
+        if recorded.dead != replayed.dead:
+            problems.append(f"{label}: dead {bool(replayed.dead)}, recorded {bool(recorded.dead)}")
+        if recorded.effects != replayed.effects:
+            missing = [effect.name for effect in recorded.effects if effect not in replayed.effects]
+            extra = [effect.name for effect in replayed.effects if effect not in recorded.effects]
+            problems.append(f"{label}: effects differ, missing {missing}, extra {extra}")
+    return problems
+
+
+def compare_outcome(outcome: MatchOutcome, scene: HeadlessBattleScene) -> list[str]:
+    # A surrender ends the match wherever it stands, so only decided
+    # matches have to end the same way on replay.
+    if outcome == MatchOutcome.WON and not (scene.game_over and scene.game_won):
+        return ["recorded a win"]
+    if outcome == MatchOutcome.LOST and not (scene.game_over and not scene.game_won):
+        return ["recorded a loss"]
+    return []
+
+
+def replay_match(path: str) -> ReplayResult:
+    """Re-execute one match log and compare its final state."""
+    turns = 0
+    try:
+        records = load_records(path)
+        scene = start_replay(records[0])
+        for record in records[1:]:
+            if scene.game_over:
+                break
+            replay_record(scene, record)
+            turns += 1
+        result = outcome_of(records)
+        if result is None:
+            return ReplayResult(path, turns, "unfinished", [])
+        problems = compare_outcome(MatchOutcome(result.outcome), scene)
+        problems += compare_states(result.characters, capture_state(scene.pteam + scene.eteam))
+    except Exception as e:  # pylint: disable=broad-except
+        logging.debug("Replay of %s failed", path, exc_info=True)
+        return ReplayResult(path, turns, "error", [f"{type(e).__name__}: {e}"])
+    return ReplayResult(path, turns, "mismatch" if problems else "ok", problems)
+
+
+def replay_matches(paths: list[str], processes: Optional[int] = None) -> Iterator[ReplayResult]:
+    """Replay every log, across a process pool unless processes is 1."""
+    if processes == 1:
+        yield from map(replay_match, paths)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(replay_match, paths, chunksize=16)
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m animearena.replay",
+                                     description="Replay recorded matches and check their results.")
+    parser.add_argument("paths", nargs="+", help="match logs to replay")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes (defaults to the CPU count)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print the summary")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("PIL").setLevel(logging.ERROR)
+
+    counts = {"ok": 0, "mismatch": 0, "unfinished": 0, "error": 0}
+    for result in replay_matches(args.paths, args.processes):
+        counts[result.status] += 1
+        if result.status != "ok" and not args.quiet:
+            print(f"{result.path}: {result.status} after {result.turns} turns")
+            for problem in result.problems:
+                print(f"    {problem}")
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+    return 1 if counts["mismatch"] or counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
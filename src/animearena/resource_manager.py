@@ -1,10 +1,16 @@
-
 import importlib.resources
+import collections
+import collections.abc
+import functools
+import hashlib
 from pathlib import Path
+from typing import Tuple
+from PIL import Image
 import sdl2.sdlttf
 import os
 
 FONT_FILENAME = "Basic-Regular.ttf"
+ASSET_MEMORY_CAP = 96 * 1024 * 1024
 
 def init_font(size: int):
     with importlib.resources.path('animearena.resources',
@@ -13,4 +19,115 @@ def init_font(size: int):
 
 def get_path(file_name: str) -> Path:
     with importlib.resources.path('animearena.resources', file_name) as path:
-        return path
\ No newline at end of file
+        return path
+
+@functools.lru_cache(maxsize=None)
+def resource_files() -> frozenset[str]:
+    """Names of the files in the resource package, listed once per process."""
+    return frozenset(entry.name for entry in importlib.resources.files('animearena.resources').iterdir()
+                     if entry.is_file())
+
+@functools.lru_cache(maxsize=None)
+def resource_hash() -> str:
+    """Fingerprint of every resource file's name, size and modification
+    time, for keying caches built from the resources."""
+    digest = hashlib.sha1()
+    for file_name in sorted(resource_files()):
+        stat = get_path(file_name).stat()
+        digest.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def find_image_file(name: str) -> str:
+    """Return the resource file name for an image, without decoding it."""
+    files = resource_files()
+    for file_name in (name + ".png", name + ".PNG"):
+        if file_name in files:
+            return file_name
+    raise FileNotFoundError(f"No image resource named {name}")
+
+def image_size(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class AssetRegistry(collections.abc.MutableMapping):
+    """Images by asset name, decoded on first use and evicted least recently
+    used once the decoded images exceed the memory cap.
+
+    Every name that refers to the same file shares one decoded image. Images
+    stored directly with ``registry[name] = image`` are kept until removed."""
+    memory_cap: int
+    memory_used: int
+
+    def __init__(self, memory_cap: int = ASSET_MEMORY_CAP):
+        self.memory_cap = memory_cap
+        self.memory_used = 0
+        self._sources: dict[str, Tuple[str, bool]] = {}
+        self._pinned: dict[str, Image.Image] = {}
+        self._decoded: collections.OrderedDict[Tuple[str, bool], Image.Image] = collections.OrderedDict()
+
+    def register(self, name: str, file_name: str, flipped: bool = False):
+        if not get_path(file_name).is_file():
+            raise FileNotFoundError(f"No image resource named {file_name}")
+        self._pinned.pop(name, None)
+        self._sources[name] = (file_name, flipped)
+
+    def load(self, file_name: str, flipped: bool = False) -> Image.Image:
+        key = (file_name, flipped)
+        image = self._decoded.get(key)
+        if image is not None:
+            self._decoded.move_to_end(key)
+            return image
+        if flipped:
+            image = self.load(file_name).transpose(Image.FLIP_LEFT_RIGHT)
+        else:
+            image = Image.open(get_path(file_name))
+            image.load()
+        self._decoded[key] = image
+        self.memory_used += image_size(image)
+        self._evict(key)
+        return image
+
+    def _evict(self, keep: Tuple[str, bool]):
+        while self.memory_used > self.memory_cap and len(self._decoded) > 1:
+            key, image = next(iter(self._decoded.items()))
+            if key == keep:
+                self._decoded.move_to_end(key)
+                continue
+            del self._decoded[key]
+            self.memory_used -= image_size(image)
+
+    def __getitem__(self, name: str) -> Image.Image:
+        image = self._pinned.get(name)
+        if image is not None:
+            return image
+        try:
+            file_name, flipped = self._sources[name]
+        except KeyError:
+            raise KeyError(name) from None
+        return self.load(file_name, flipped)
+
+    def __setitem__(self, name: str, image: Image.Image):
+        self._sources.pop(name, None)
+        self._pinned[name] = image
+
+    def __delitem__(self, name: str):
+        if name in self._pinned:
+            del self._pinned[name]
+        else:
+            del self._sources[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._pinned or name in self._sources
+
+    def __iter__(self):
+        yield from self._sources
+        yield from self._pinned
+
+    def __len__(self) -> int:
+        return len(self._sources) + len(self._pinned)
+
+
+assets = AssetRegistry()
+
+def load_image(file_name: str, flipped: bool = False) -> Image.Image:
+    return assets.load(file_name, flipped)
@@ -1,16 +1,22 @@
+import asyncio
+import copy
 import sdl2
 import sdl2.ext
-from typing import Tuple
+from typing import Optional, Tuple
 import typing
 import importlib.resources
 from PIL import Image
+from animearena import audio, engine
 from animearena.character import get_character_db
+from animearena.resource_manager import AssetRegistry, assets
 from animearena.character_select_scene import CharacterSelectScene, make_character_select_scene
 from animearena.battle_scene import BattleScene, make_battle_scene
 from animearena.draft_scene import make_draft_scene
 from animearena.login_scene import LoginScene, make_login_scene
+from animearena.player import Player
+from animearena.practice import PracticeOpponent
+from animearena.recording import MatchRecorder
 from animearena.tutorial_scene import TutorialScene, make_tutorial_scene
-from playsound import playsound
 import sys
 import logging
 
@@ -22,13 +28,18 @@ def get_image_from_path(file_name: str) -> Image:
     with importlib.resources.path('animearena.resources', file_name) as path:
         return Image.open(path)
 
+# Packets read ahead of the game loop before the reader waits for it
+INBOUND_QUEUE_SIZE = 256
+
+
 class SceneManager:
     """Manager for all game scenes"""
     window: sdl2.ext.Window
     spriterenderer: sdl2.ext.SpriteRenderSystem
     factory: sdl2.ext.SpriteFactory
     connected: bool
-    surfaces: dict
+    inbound: Optional["asyncio.Queue[Tuple[int, bytes]]"]
+    surfaces: AssetRegistry
     sounds: dict
     char_select: CharacterSelectScene
     battle_scene: BattleScene
@@ -39,6 +50,8 @@ class SceneManager:
     current_scene: "Scene"
     username_raw: str
     password_raw: str
+    # Salted digest of the password last logged in or registered with
+    password_digest: str
     uiprocessor: sdl2.ext.UIProcessor
     mouse_x: int
     mouse_y: int
@@ -46,8 +59,9 @@ class SceneManager:
     def __init__(self, window: sdl2.ext.Window = None):
         self.username_raw = ""
         self.password_raw = ""
+        self.password_digest = ""
         self.frame_count = 0
-        self.surfaces = dict()
+        self.surfaces = assets
         self.sounds = dict()
         self.connection = None
         self.uiprocessor = sdl2.ext.UIProcessor()
@@ -60,20 +74,20 @@ class SceneManager:
             self.factory = sdl2.ext.SpriteFactory(sdl2.ext.SOFTWARE, free=False)
             self.spriterenderer = self.factory.create_sprite_render_system(window)
         for char in get_character_db().keys():
-            self.surfaces[char + "allyprof"] = get_image_from_path(char + "prof.png")
-            self.surfaces[char + "enemyprof"] = get_image_from_path(char + "prof.png").transpose(Image.FLIP_LEFT_RIGHT)
-            self.surfaces[char + "banner"] = get_image_from_path(char + "banner.png")
+            self.surfaces.register(char + "allyprof", char + "prof.png")
+            self.surfaces.register(char + "enemyprof", char + "prof.png", flipped=True)
+            self.surfaces.register(char + "banner", char + "banner.png")
             for i in range(4):
-                self.surfaces[char + str(i + 1)] = get_image_from_path(char + str(i + 1) + ".png")
+                self.surfaces.register(char + str(i + 1), char + str(i + 1) + ".png")
             for i in range(4):
                 try:
-                    self.surfaces[char + "alt" + str(i + 1)] = get_image_from_path(char + "alt" + str(i + 1) + ".png")
+                    self.surfaces.register(char + "alt" + str(i + 1), char + "alt" + str(i + 1) + ".png")
                 except FileNotFoundError:
                     break
             for i in range(2):
                 try:
-                    self.surfaces[char + "altprof" + str(i + 1)] = get_image_from_path(char + "altprof" + str(i + 1) + ".png")
-                    self.surfaces[char + "enemyaltprof" + str(i + 1)] = get_image_from_path(char + "altprof" + str(i + 1) + ".png").transpose(Image.FLIP_LEFT_RIGHT)
+                    self.surfaces.register(char + "altprof" + str(i + 1), char + "altprof" + str(i + 1) + ".png")
+                    self.surfaces.register(char + "enemyaltprof" + str(i + 1), char + "altprof" + str(i + 1) + ".png", flipped=True)
                 except FileNotFoundError:
                     break
         self.sounds["page"] = "page_turn.wav"
@@ -84,59 +98,74 @@ class SceneManager:
         self.sounds["login"] = "log_in.wav"
         self.sounds["turnstart"] = "turn_back.wav"
         self.sounds["turnend"] = "turn_send.wav"
-        self.surfaces["banner"] = get_image_from_path("banner_bar.png")
-        self.surfaces["won"] = get_image_from_path("youwon.png")
-        self.surfaces["lost"] = get_image_from_path("youlost.png")
-        self.surfaces["add"] = get_image_from_path("add_button.png")
-        self.surfaces["remove"] = get_image_from_path("remove_button.png")
-        self.surfaces["quit"] = get_image_from_path("quit_button.png")
-        self.surfaces["end"] = get_image_from_path("end_button.png")
-        self.surfaces["default_prof"] = get_image_from_path("default.png")
-        self.surfaces["start"] = get_image_from_path("start_button.png")
-        self.surfaces["search"] = get_image_from_path("searching_panel.png")
-        self.surfaces["background"] = get_image_from_path("bright_background.png")
-        self.surfaces["right_arrow"] = get_image_from_path("arrow_right.png")
-        self.surfaces["left_arrow"] = get_image_from_path("arrow_left.png")
-        self.surfaces["RANDOM"] = get_image_from_path("randomEnergy.png")
-        self.surfaces["PHYSICAL"] = get_image_from_path("physicalEnergy.png")
-        self.surfaces["SPECIAL"] = get_image_from_path("specialEnergy.png")
-        self.surfaces["MENTAL"] = get_image_from_path("mentalEnergy.png")
-        self.surfaces["WEAPON"] = get_image_from_path("weaponEnergy.png")
-        self.surfaces["selected"] = get_image_from_path("selected_pane.png")
-        self.surfaces["locked"] = get_image_from_path("null_pane.png")
-        self.surfaces["char_select_blotter"] = get_image_from_path("blotter.png")
-        self.surfaces["in_game_background"] = get_image_from_path("in_game_background.png")
-        self.surfaces["lock_icon"] = get_image_from_path("lock_icon.png")
-        self.surfaces["phys_icon"] = get_image_from_path("phys_icon.png")
-        self.surfaces["spec_icon"] = get_image_from_path("spec_icon.png")
-        self.surfaces["wep_icon"] = get_image_from_path("wep_icon.png")
-        self.surfaces["ment_icon"] = get_image_from_path("ment_icon.png")
-        self.surfaces["rand_icon"] = get_image_from_path("rand_icon.png")
-        self.surfaces["exclusive_icon"] = get_image_from_path("exclusive_icon.png")
-        self.surfaces["how_to"] = get_image_from_path("how_to.png")
-        self.surfaces["scroll_wheel"] = get_image_from_path("scroll_wheel.png")
-        self.surfaces["used_slot"] = get_image_from_path("used_ability.png")
-        self.surfaces["profile_frame"] = get_image_from_path("portrait_template.png")
-        self.surfaces["stun_icon"] = get_image_from_path("stun_icon.png")
-        self.surfaces["invuln_icon"] = get_image_from_path("invuln_icon.png")
-        self.surfaces["dead_icon"] = get_image_from_path("dead_icon.png")
-        self.surfaces["exchange_icon"] = get_image_from_path("exchange_icon.png")
-        self.surfaces["disconnect"] = get_image_from_path("disconnection_panel.png")
+        self.surfaces.register("banner", "banner_bar.png")
+        self.surfaces.register("won", "youwon.png")
+        self.surfaces.register("lost", "youlost.png")
+        self.surfaces.register("add", "add_button.png")
+        self.surfaces.register("remove", "remove_button.png")
+        self.surfaces.register("quit", "quit_button.png")
+        self.surfaces.register("end", "end_button.png")
+        self.surfaces.register("default_prof", "default.png")
+        self.surfaces.register("start", "start_button.png")
+        self.surfaces.register("search", "searching_panel.png")
+        self.surfaces.register("background", "bright_background.png")
+        self.surfaces.register("right_arrow", "arrow_right.png")
+        self.surfaces.register("left_arrow", "arrow_left.png")
+        self.surfaces.register("RANDOM", "randomEnergy.png")
+        self.surfaces.register("PHYSICAL", "physicalEnergy.png")
+        self.surfaces.register("SPECIAL", "specialEnergy.png")
+        self.surfaces.register("MENTAL", "mentalEnergy.png")
+        self.surfaces.register("WEAPON", "weaponEnergy.png")
+        self.surfaces.register("selected", "selected_pane.png")
+        self.surfaces.register("locked", "null_pane.png")
+        self.surfaces.register("char_select_blotter", "blotter.png")
+        self.surfaces.register("in_game_background", "in_game_background.png")
+        self.surfaces.register("lock_icon", "lock_icon.png")
+        self.surfaces.register("phys_icon", "phys_icon.png")
+        self.surfaces.register("spec_icon", "spec_icon.png")
+        self.surfaces.register("wep_icon", "wep_icon.png")
+        self.surfaces.register("ment_icon", "ment_icon.png")
+        self.surfaces.register("rand_icon", "rand_icon.png")
+        self.surfaces.register("exclusive_icon", "exclusive_icon.png")
+        self.surfaces.register("how_to", "how_to.png")
+        self.surfaces.register("scroll_wheel", "scroll_wheel.png")
+        self.surfaces.register("used_slot", "used_ability.png")
+        self.surfaces.register("profile_frame", "portrait_template.png")
+        self.surfaces.register("stun_icon", "stun_icon.png")
+        self.surfaces.register("invuln_icon", "invuln_icon.png")
+        self.surfaces.register("dead_icon", "dead_icon.png")
+        self.surfaces.register("exchange_icon", "exchange_icon.png")
+        self.surfaces.register("disconnect", "disconnection_panel.png")
         self.connected = False
+        self.inbound = None
 
     def __enter__(self):
+        audio.open_mixer(self.sounds.values())
         return self
     
     def __exit__(self, type, value, traceback):
         self.battle_scene.timer.cancel()
+        audio.close_mixer()
 
     def dispatch_message(self, packet_id: int, data: list[bytes]):
         self.connection.packets[packet_id](data)
 
+    def open_inbound_queue(self) -> "asyncio.Queue[Tuple[int, bytes]]":
+        """Create the queue the server reader fills; call from inside the
+        running event loop."""
+        self.inbound = asyncio.Queue(INBOUND_QUEUE_SIZE)
+        return self.inbound
+
+    def dispatch_inbound(self):
+        """Handle every packet read since the last frame."""
+        if self.inbound is None:
+            return
+        while not self.inbound.empty():
+            packet_id, data = self.inbound.get_nowait()
+            self.dispatch_message(packet_id, data)
+
     def play_sound(self, file_name: str):
-        # with importlib.resources.path('animearena.resources', file_name) as path:
-        #     playsound(str(path), False)
-        pass
+        audio.play_sound(file_name)
 
     def update_mouse_position(self, x: int, y: int):
         self.mouse_x = x
@@ -147,13 +176,29 @@ class SceneManager:
         self.draft_scene = make_draft_scene(self)
         self.char_select = make_character_select_scene(self)
         self.battle_scene = make_battle_scene(self)
+        self.battle_scene.recorder = MatchRecorder()
         self.login_scene = make_login_scene(self)
         self.tutorial_scene = make_tutorial_scene(self)
 
     def set_scene_to_current(self, scene: "Scene"):
         self.current_scene = scene
-        self.spriterenderer.render(self.current_scene.renderables())
-        
+        self.current_scene.damage.invalidate()
+
+    def present(self):
+        """Redraw and show whatever the current scene changed since the last
+        frame. Frames where nothing changed draw nothing."""
+        damage = self.current_scene.damage
+        if not damage:
+            return
+        if damage.full:
+            self.spriterenderer.render(self.current_scene.renderables())
+            self.window.refresh()
+        else:
+            rects = damage.merged()
+            engine.render_damage(self.spriterenderer.surface, self.current_scene.renderables(), rects)
+            sdl_rects = (sdl2.SDL_Rect * len(rects))(*(sdl2.SDL_Rect(*rect) for rect in rects))
+            sdl2.SDL_UpdateWindowSurfaceRects(self.window.window, sdl_rects, len(rects))
+        damage.reset()
 
     def bind_connection(self, connection):
         self.connection = connection
@@ -178,8 +223,20 @@ class SceneManager:
     def start_battle(self, player_team, enemy_team, player, enemy, energy, seed):
         self.play_sound(self.sounds["game_start"])
         self.change_window_size(900, 700)
+        self.battle_scene.practice = None
         self.battle_scene.setup_scene(player_team, enemy_team, player, enemy, energy, seed)
         self.set_scene_to_current(self.battle_scene)
+
+    def start_practice(self, player, player_team, enemy_team):
+        """Start a local match against the search AI. The match is played
+        by a copy of the player, so its result is not kept."""
+        practice = PracticeOpponent(self.battle_scene, player)
+        energy, seed = practice.start(player_team, enemy_team)
+        self.battle_scene.moving_first = True
+        self.battle_scene.waiting_for_turn = False
+        enemy = Player("Practice", 0, 0, self.surfaces["default_prof"])
+        self.start_battle(player_team, enemy_team, copy.deepcopy(player), enemy, energy, seed)
+        self.battle_scene.practice = practice
         
     def start_draft(self, player, enemy):
         self.change_window_size(900, 700)
@@ -194,12 +251,14 @@ class SceneManager:
     def change_window_size(self, new_width: int, new_height: int):
         sdl2.SDL_SetWindowSize(self.window.window, new_width, new_height)
         self.spriterenderer = self.factory.create_sprite_render_system(self.window)
+        self.current_scene.damage.invalidate()
 
     def create_new_window(self, size: Tuple[int, int], name: str):
         self.window.close()
         self.window = sdl2.ext.Window(name, size)
         self.window.show()
         self.spriterenderer = self.factory.create_sprite_render_system(self.window)
+        self.current_scene.damage.invalidate()
         
     def reset_event_trigger(self):
         self.current_scene.triggered_event = False  
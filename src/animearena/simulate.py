@@ -0,0 +1,395 @@
+"""Batch self-play simulator for balance testing.
+
+Runs headless matches between fixed or sampled teams across a process pool
+and reports win rates, turn counts and ability usage as CSV or JSON:
+
+    python -m animearena.simulate --games 100000 --policy greedy -o out.csv
+"""
+import argparse
+import collections
+import csv
+import functools
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+from typing import Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+from animearena.ability import Ability
+from animearena.ai import search_policy
+from animearena.character import Character, get_character_db
+from animearena.headless import HeadlessBattleScene, make_headless_battle_scene
+from animearena.recording import MatchRecorder
+
+TEAM_SIZE = 3
+MAX_TURNS = 200
+BATCH_SIZE = 64
+
+# A match is (seed, first team, second team, first policy, second policy).
+MatchSpec = Tuple[int, Tuple[str, ...], Tuple[str, ...], str, str]
+
+
+#region Policies
+
+def random_policy(scene: HeadlessBattleScene, rng: random.Random) -> list[Ability]:
+    """Each living character uses a random usable ability, or passes."""
+    used = []
+    for manager in rng.sample(scene.pteam, len(scene.pteam)):
+        options = scene.usable_abilities(manager)
+        ability = rng.choice(options + [None])
+        if ability is None:
+            continue
+        targets = scene.legal_targets(manager, ability)
+        if not targets:
+            continue
+        scene.queue_ability(manager, ability, rng.choice(targets))
+        used.append(ability)
+    return used
+
+
+def greedy_policy(scene: HeadlessBattleScene, rng: random.Random) -> list[Ability]:
+    """Each character uses its most expensive usable ability on the weakest target."""
+    used = []
+    for manager in rng.sample(scene.pteam, len(scene.pteam)):
+        options = scene.usable_abilities(manager)
+        if not options:
+            continue
+        rng.shuffle(options)
+        ability = max(options, key=lambda ability: ability.total_cost)
+        targets = scene.legal_targets(manager, ability)
+        if not targets:
+            continue
+        enemies = [target for target in targets if target.id == "enemy"]
+        scene.queue_ability(manager, ability,
+                            min(enemies or targets, key=lambda target: target.source.hp))
+        used.append(ability)
+    return used
+
+
+POLICIES: dict[str, Callable[[HeadlessBattleScene, random.Random], list[Ability]]] = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "search": search_policy,
+}
+
+#endregion
+
+#region Matches
+
+class SimulationStats():
+    """Running totals for a batch of simulated matches."""
+
+    matches: int
+    draws: int
+    errors: int
+    turns: collections.Counter
+    games: collections.Counter
+    wins: collections.Counter
+    losses: collections.Counter
+    ability_uses: collections.Counter
+
+    def __init__(self):
+        self.matches = 0
+        self.draws = 0
+        self.errors = 0
+        self.turns = collections.Counter()
+        self.games = collections.Counter()
+        self.wins = collections.Counter()
+        self.losses = collections.Counter()
+        self.ability_uses = collections.Counter()
+
+    def record(self, teams: Tuple[Tuple[str, ...], Tuple[str, ...]],
+               winner: Optional[int], turns: int, ability_uses: collections.Counter):
+        self.matches += 1
+        self.turns[turns] += 1
+        self.ability_uses.update(ability_uses)
+        for side, team in enumerate(teams):
+            self.games.update(team)
+            if winner is None:
+                continue
+            if side == winner:
+                self.wins.update(team)
+            else:
+                self.losses.update(team)
+        if winner is None:
+            self.draws += 1
+
+    def merge(self, other: "SimulationStats"):
+        self.matches += other.matches
+        self.draws += other.draws
+        self.errors += other.errors
+        self.turns.update(other.turns)
+        self.games.update(other.games)
+        self.wins.update(other.wins)
+        self.losses.update(other.losses)
+        self.ability_uses.update(other.ability_uses)
+
+    @property
+    def mean_turns(self) -> float:
+        if not self.matches:
+            return 0.0
+        return sum(turns * count for turns, count in self.turns.items()) / self.matches
+
+    def character_rows(self) -> Iterator[dict]:
+        for name in sorted(self.games):
+            games = self.games[name]
+            yield {
+                "character": name,
+                "games": games,
+                "wins": self.wins[name],
+                "losses": self.losses[name],
+                "draws": games - self.wins[name] - self.losses[name],
+                "win_rate": round(self.wins[name] / games, 4),
+            }
+
+    def to_dict(self) -> dict:
+        return {
+            "matches": self.matches,
+            "draws": self.draws,
+            "errors": self.errors,
+            "mean_turns": round(self.mean_turns, 2),
+            "turns": {str(turns): count for turns, count in sorted(self.turns.items())},
+            "characters": list(self.character_rows()),
+            "abilities": dict(self.ability_uses.most_common()),
+        }
+
+
+def start_scene(team: Iterable[str], enemy_team: Iterable[str], energy: list[int],
+                seed: int, moving_first: bool,
+                recorder: Optional[MatchRecorder] = None) -> HeadlessBattleScene:
+    scene = make_headless_battle_scene()
+    scene.recorder = recorder
+    scene.moving_first = moving_first
+    scene.waiting_for_turn = not moving_first
+    scene.setup_scene([Character(name) for name in team],
+                      [Character(name) for name in enemy_team],
+                      energy=energy, seed=seed)
+    return scene
+
+
+def roll_energy(rng: random.Random) -> list[int]:
+    return [rng.randint(0, 3) for _ in range(6)]
+
+
+def play_match(spec: MatchSpec, max_turns: int = MAX_TURNS, record_dir: Optional[str] = None,
+               search_processes: int = 1) -> Tuple[Optional[int], int, collections.Counter]:
+    """Play one match to completion.
+
+    Each side runs its own scene over its own copies of the characters, the
+    same way two connected clients do, and the inactive side replays the
+    active side's ability messages. Returns the winning side (None for a
+    draw), the number of turns played and how often each ability was used.
+    With a record_dir, the first side's match log is saved there. With more
+    than one search_processes, search turns are spread over that many
+    workers, which rebuild each side's scene from its match log.
+    """
+    seed, first_team, second_team, first_policy, second_policy = spec
+    searching = search_processes > 1
+    recorder = MatchRecorder() if record_dir or searching else None
+    rng = random.Random(seed)
+    start_pool = roll_energy(rng)
+    first_energy = [0, 0, 0, 0]
+    first_energy[start_pool[0]] += 1
+    second_energy = [0, 0, 0, 0]
+    for i in range(3):
+        second_energy[start_pool[i]] += 1
+    scenes = [start_scene(first_team, second_team, first_energy, seed, True, recorder),
+              start_scene(second_team, first_team, second_energy, seed, False,
+                          MatchRecorder() if searching else None)]
+    policies = [POLICIES[first_policy], POLICIES[second_policy]]
+    if searching:
+        policies = [functools.partial(search_policy, processes=search_processes)
+                    if policy is search_policy else policy for policy in policies]
+    ability_uses = collections.Counter()
+    winner, turns = None, max_turns
+
+    for turn in range(max_turns):
+        side = turn % 2
+        active, waiting = scenes[side], scenes[1 - side]
+        for ability in policies[side](active, rng):
+            ability_uses[ability.db_name] += 1
+        messages = active.execute_turn()
+        if active.game_over:
+            winner, turns = (side if active.game_won else 1 - side), turn + 1
+            break
+        waiting.execute_enemy_turn(messages, roll_energy(rng))
+        if waiting.game_over:
+            winner, turns = ((1 - side) if waiting.game_won else side), turn + 1
+            break
+
+    if record_dir:
+        # Only draws are still unfinished here.
+        recorder.finish(scenes[0].pteam + scenes[0].eteam)
+        recorder.save(os.path.join(record_dir, f"{seed}.aar"))
+    return winner, turns, ability_uses
+
+
+def run_batch(batch: list[MatchSpec], max_turns: int = MAX_TURNS,
+              record_dir: Optional[str] = None, search_processes: int = 1) -> SimulationStats:
+    stats = SimulationStats()
+    for spec in batch:
+        try:
+            winner, turns, ability_uses = play_match(spec, max_turns, record_dir,
+                                                     search_processes)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Simulated match %s failed", spec)
+            stats.errors += 1
+            continue
+        stats.record((spec[1], spec[2]), winner, turns, ability_uses)
+    return stats
+
+
+def _run_batch(args: Tuple[list[MatchSpec], int, Optional[str], int]) -> SimulationStats:
+    return run_batch(*args)
+
+#endregion
+
+#region Match generation
+
+def sample_team(rng: random.Random, roster: list[str]) -> Tuple[str, ...]:
+    return tuple(rng.sample(roster, TEAM_SIZE))
+
+
+def get_roster() -> list[str]:
+    return sorted(name for name, character in get_character_db().items()
+                  if not character.hidden)
+
+
+def make_match_specs(games: int, seed: int,
+                     team_a: Optional[Tuple[str, ...]] = None,
+                     team_b: Optional[Tuple[str, ...]] = None,
+                     policy_a: str = "random",
+                     policy_b: str = "random") -> Iterator[MatchSpec]:
+    rng = random.Random(seed)
+    roster = get_roster() if team_a is None or team_b is None else []
+    for i in range(games):
+        first = team_a or sample_team(rng, roster)
+        second = team_b or sample_team(rng, roster)
+        match_seed = rng.getrandbits(32)
+        # Alternate who moves first so neither side keeps the tempo advantage.
+        if i % 2:
+            yield match_seed, second, first, policy_b, policy_a
+        else:
+            yield match_seed, first, second, policy_a, policy_b
+
+
+def batched(specs: Iterable[MatchSpec], size: int) -> Iterator[list[MatchSpec]]:
+    iterator = iter(specs)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def simulate(specs: Iterable[MatchSpec], processes: Optional[int] = None,
+             batch_size: int = BATCH_SIZE, max_turns: int = MAX_TURNS,
+             record_dir: Optional[str] = None, search_processes: int = 1) -> SimulationStats:
+    """Play every match, across a process pool unless processes is 1. Pool
+    workers cannot start pools of their own, so matches whose search runs
+    over search_processes workers are played in this process."""
+    stats = SimulationStats()
+    jobs = ((batch, max_turns, record_dir, search_processes)
+            for batch in batched(specs, batch_size))
+    if processes == 1 or search_processes > 1:
+        for job in jobs:
+            stats.merge(_run_batch(job))
+        return stats
+    with multiprocessing.Pool(processes) as pool:
+        for partial in pool.imap_unordered(_run_batch, jobs):
+            stats.merge(partial)
+    return stats
+
+#endregion
+
+#region Output
+
+CSV_FIELDS = ["kind", "name", "games", "wins", "losses", "draws", "win_rate", "value"]
+
+
+def write_csv(stats: SimulationStats, output: TextIO):
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    summary = stats.to_dict()
+    for name in ("matches", "draws", "errors", "mean_turns"):
+        writer.writerow({"kind": "summary", "name": name, "value": summary[name]})
+    for row in stats.character_rows():
+        row["name"] = row.pop("character")
+        writer.writerow({"kind": "character", **row})
+    for ability, uses in stats.ability_uses.most_common():
+        writer.writerow({"kind": "ability", "name": ability, "value": uses})
+
+
+def write_json(stats: SimulationStats, output: TextIO):
+    json.dump(stats.to_dict(), output, indent=2)
+    output.write("\n")
+
+#endregion
+
+
+def parse_team(value: str) -> Tuple[str, ...]:
+    team = tuple(name.strip() for name in value.split(",") if name.strip())
+    if len(team) != TEAM_SIZE:
+        raise argparse.ArgumentTypeError(f"a team needs exactly {TEAM_SIZE} characters")
+    unknown = [name for name in team if name not in get_character_db()]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown characters: {', '.join(unknown)}")
+    return team
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m animearena.simulate",
+                                     description="Run headless self-play matches.")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--team-a", type=parse_team,
+                        help="comma separated character names; sampled per match if omitted")
+    parser.add_argument("--team-b", type=parse_team,
+                        help="comma separated character names; sampled per match if omitted")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random",
+                        help="policy for both teams")
+    parser.add_argument("--policy-b", choices=sorted(POLICIES),
+                        help="policy for team b, if different")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes (defaults to the CPU count)")
+    parser.add_argument("--search-processes", type=int, default=1,
+                        help="worker processes for each search turn; matches then run "
+                             "one at a time in this process")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS,
+                        help="matches still running after this many turns are draws")
+    parser.add_argument("-f", "--format", choices=["csv", "json"],
+                        help="output format; inferred from --output, else json")
+    parser.add_argument("-o", "--output", help="output file (defaults to stdout)")
+    parser.add_argument("--record", metavar="DIR",
+                        help="save a match log of every match to DIR, for animearena.replay")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("PIL").setLevel(logging.ERROR)
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.endswith(".csv") else "json"
+
+    specs = make_match_specs(args.games, args.seed, args.team_a, args.team_b,
+                             args.policy, args.policy_b or args.policy)
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    stats = simulate(specs, args.processes, args.batch_size, args.max_turns, args.record,
+                     args.search_processes)
+
+    write = write_csv if output_format == "csv" else write_json
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            write(stats, output)
+    else:
+        write(stats, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import functools
 import importlib.resources
 from PIL import ImageFont
 
@@ -7,37 +8,63 @@ with importlib.resources.path('animearena.resources', "Basic-Regular.ttf") as pa
     FONT = ImageFont.truetype(str(path), size = 16)
 
 loaded_fonts = {}
+# Wrapped layouts kept by (text, width, fontsize)
+LINE_CACHE_SIZE = 512
 
 @dataclass
 class WordData:
     length: int
     word: str
 
+
+class GlyphAdvances(dict):
+    """Widths of single characters in one font size, measured on first use."""
+
+    def __init__(self, font: ImageFont.FreeTypeFont):
+        super().__init__()
+        self.font = font
+
+    def __missing__(self, char: str) -> int:
+        # getbbox's right edge is what getsize reported as the width; getsize
+        # is gone from current Pillow.
+        width = self[char] = self.font.getbbox(char)[2]
+        return width
+
+
+glyph_advances: dict[int, GlyphAdvances] = {}
+
 def load_fontsize(fontsize):
     with importlib.resources.path('animearena.resources', "Basic-Regular.ttf") as path:
         loaded_fonts[fontsize] = ImageFont.truetype(str(path), size = fontsize)
+    glyph_advances[fontsize] = GlyphAdvances(loaded_fonts[fontsize])
 
-def get_character_width(fontsize, char):
-    if not fontsize in loaded_fonts:
+def get_glyph_advances(fontsize) -> GlyphAdvances:
+    if not fontsize in glyph_advances:
         load_fontsize(fontsize)
-    font = loaded_fonts[fontsize]
-    return font.getsize(char)[0]
+    return glyph_advances[fontsize]
+
+def get_character_width(fontsize, char):
+    return get_glyph_advances(fontsize)[char]
 
 def get_string_width(fontsize, string):
-    width = 0
-    for char in string:
-        width += get_character_width(fontsize, char)
-    return width
+    advances = get_glyph_advances(fontsize)
+    return sum(map(advances.__getitem__, string))
 
+@functools.lru_cache(maxsize=None)
 def get_font_height(fontsize):
     if not fontsize in loaded_fonts:
         load_fontsize(fontsize)
     font = loaded_fonts[fontsize]
-    height = font.getsize("G")[1]
+    height = font.getbbox("G")[3]
     height += int(height * 0.15)
     return height
 
 def get_lines(input: str, max_width: int, fontsize: int) -> list[str]:
+    # Callers get their own list; the cached layout is shared.
+    return list(wrap_lines(input, max_width, fontsize))
+
+@functools.lru_cache(maxsize=LINE_CACHE_SIZE)
+def wrap_lines(input: str, max_width: int, fontsize: int) -> tuple[str, ...]:
     
 
     words = input.split()
@@ -63,6 +90,4 @@ def get_lines(input: str, max_width: int, fontsize: int) -> list[str]:
     
     lines.append(" ".join(word for word in line))
 
-    return lines
-    
-
+    return tuple(lines)
@@ -0,0 +1,79 @@
+import pytest
+
+from animearena.ability import TargetRule
+from animearena.effects import Effect, EffectType
+from animearena.headless import HeadlessBattleScene
+
+
+def add_effect(target, name: str, eff_type: EffectType, user):
+    target.source.current_effects.append(Effect(name, eff_type, user, 2, lambda eff: ""))
+
+
+@pytest.fixture
+def counted_masks(monkeypatch):
+    """Count the masks worked out by a TargetRule rather than read from an
+    ability's cache."""
+    calls = []
+    target_mask = TargetRule.target_mask
+
+    def counting_target_mask(self, user, playerTeam, enemyTeam):
+        calls.append(user)
+        return target_mask(self, user, playerTeam, enemyTeam)
+
+    monkeypatch.setattr(TargetRule, "target_mask", counting_target_mask)
+    return calls
+
+
+def rasengan_mask(scene: HeadlessBattleScene) -> int:
+    naruto = scene.pteam[0]
+    return naruto.source.current_abilities[0].target_mask(naruto, scene.pteam, scene.eteam)
+
+
+def test_target_mask_reused(headless_scene: HeadlessBattleScene, counted_masks):
+    assert rasengan_mask(headless_scene) == 0b111000
+    assert rasengan_mask(headless_scene) == 0b111000
+    assert len(counted_masks) == 1
+
+
+def test_target_mask_effect_change(headless_scene: HeadlessBattleScene, counted_masks):
+    scene = headless_scene
+    hinata = scene.eteam[1]
+    assert rasengan_mask(scene) == 0b111000
+
+    add_effect(hinata, "Byakugan", EffectType.ALL_INVULN, hinata)
+    assert rasengan_mask(scene) == 0b101000
+
+    hinata.source.current_effects.discard(EffectType.ALL_INVULN, "Byakugan")
+    assert rasengan_mask(scene) == 0b111000
+    assert len(counted_masks) == 3
+
+
+def test_target_mask_user_effect_change(headless_scene: HeadlessBattleScene, counted_masks):
+    scene = headless_scene
+    naruto = scene.pteam[0]
+    assert rasengan_mask(scene) == 0b111000
+
+    add_effect(naruto, "Shadow Pin", EffectType.UNIQUE, scene.eteam[2])
+    assert rasengan_mask(scene) == 0
+    assert len(counted_masks) == 2
+
+
+def test_target_mask_death(headless_scene: HeadlessBattleScene, counted_masks):
+    scene = headless_scene
+    assert rasengan_mask(scene) == 0b111000
+
+    scene.eteam[0].source.dead = True
+    assert rasengan_mask(scene) == 0b110000
+
+    scene.eteam[0].source.dead = False
+    assert rasengan_mask(scene) == 0b111000
+    assert len(counted_masks) == 3
+
+
+def test_target_mask_untargetable(headless_scene: HeadlessBattleScene, counted_masks):
+    scene = headless_scene
+    assert rasengan_mask(scene) == 0b111000
+
+    scene.eteam[2].source.untargetable = True
+    assert rasengan_mask(scene) == 0b011000
+    assert len(counted_masks) == 2
@@ -0,0 +1,56 @@
+import pickle
+
+import pytest
+from PIL import Image
+
+from animearena import avatar
+
+
+@pytest.fixture
+def avatar_cache(tmp_path, monkeypatch):
+    """An empty avatar cache of our own."""
+    monkeypatch.setattr(avatar, "AVATAR_DIR", tmp_path / "avatars")
+    monkeypatch.setattr(avatar, "_avatars", {})
+    return tmp_path / "avatars"
+
+
+def legacy_pickle(fields) -> bytes:
+    return pickle.dumps(fields)
+
+
+MALFORMED = [
+    legacy_pickle({}),
+    legacy_pickle([1, 2, 3]),
+    legacy_pickle({"mode": "RGB", "size": 5, "pixels": b""}),
+    legacy_pickle({"mode": 3, "size": (2, 2), "pixels": b"\x00" * 12}),
+    legacy_pickle({"mode": "RGB", "size": (2, 2, 2), "pixels": b"\x00" * 12}),
+    legacy_pickle({"mode": "RGB", "size": ("2", "2"), "pixels": b"\x00" * 12}),
+    legacy_pickle({"mode": "RGB", "size": (2, 2), "pixels": "\x00" * 12}),
+    legacy_pickle({"mode": "RGB", "size": (2, 2), "pixels": b"\x00"}),
+    legacy_pickle({"mode": "XYZ", "size": (2, 2), "pixels": b"\x00" * 12}),
+    legacy_pickle({"mode": "RGB", "size": (1000, 1000), "pixels": b""}),
+    pickle.dumps(Image.new("RGB", (2, 2))),
+    pickle.PROTO + b"\x02",
+]
+
+
+@pytest.mark.parametrize("code", MALFORMED)
+def test_malformed_legacy_avatar(code: bytes):
+    with pytest.raises(ValueError):
+        avatar.decode_avatar(code)
+
+
+@pytest.mark.parametrize("code", MALFORMED)
+def test_malformed_legacy_avatar_in_pouch(avatar_cache, code: bytes):
+    with pytest.raises(ValueError):
+        avatar.read_pouch_avatar(avatar.HASH_PREFIX + avatar.avatar_hash(code), (100, 100), code)
+    assert not list(avatar_cache.glob("*"))
+
+
+def test_legacy_avatar():
+    image = Image.new("RGBA", (3, 2), (1, 2, 3, 4))
+    code = legacy_pickle({"mode": image.mode, "size": list(image.size), "pixels": image.tobytes()})
+
+    read = avatar.decode_avatar(code)
+
+    assert (read.mode, read.size, read.tobytes()) == (image.mode, image.size, image.tobytes())
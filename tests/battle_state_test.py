@@ -0,0 +1,79 @@
+from animearena.battle_state import SCENE_FIELDS, BattleState
+from animearena.energy import Energy
+from animearena.headless import HeadlessBattleScene
+
+
+def fingerprint(scene: HeadlessBattleScene) -> list:
+    """The rules state of a scene as plain values."""
+    teams = []
+    for team in (scene.player_display.team, scene.enemy_display.team):
+        teams.append(dict(team.energy_pool))
+        for manager in team.character_managers:
+            character = manager.source
+            teams.append((character.name, character.hp, character.dead, character.energy_contribution,
+                          [(ability.name, ability.cooldown_remaining, dict(ability.cost))
+                           for ability in character.current_abilities],
+                          [(effect.signature, effect.mag, effect.waiting)
+                           for effect in character.current_effects]))
+    scene_fields = {}
+    for name in SCENE_FIELDS:
+        value = getattr(scene, name, None)
+        scene_fields[name] = value.copy() if isinstance(value, (list, dict, set)) else value
+    return [teams, scene_fields, scene.d20.getstate()]
+
+
+def captured_values(state: BattleState) -> list:
+    return [(id(attributes.target), attributes.values) for attributes in state.objects]
+
+
+def play_rasengan(scene: HeadlessBattleScene):
+    naruto = scene.pteam[0]
+    scene.queue_ability(naruto, naruto.source.current_abilities[0], scene.eteam[1])
+    scene.execute_turn()
+
+
+def test_capture_restore_capture(headless_scene: HeadlessBattleScene):
+    scene = headless_scene
+    before = fingerprint(scene)
+    state = BattleState.capture(scene)
+
+    play_rasengan(scene)
+    scene.d20.randint(1, 20)
+    assert fingerprint(scene) != before
+
+    state.restore()
+    assert fingerprint(scene) == before
+
+    again = BattleState.capture(scene)
+    assert captured_values(again) == captured_values(state)
+    assert again.rng_state == state.rng_state
+    assert [list(effects) for effects, _ in again.effect_lists] == \
+           [list(effects) for effects, _ in state.effect_lists]
+
+
+def test_restore_replays_the_same_turn(headless_scene: HeadlessBattleScene):
+    scene = headless_scene
+    state = BattleState.capture(scene)
+
+    play_rasengan(scene)
+    played = fingerprint(scene)
+
+    for _ in range(2):
+        state.restore()
+        play_rasengan(scene)
+        assert fingerprint(scene) == played
+
+
+def test_restore_after_enemy_turn(headless_scene: HeadlessBattleScene):
+    scene = headless_scene
+    play_rasengan(scene)
+    before = fingerprint(scene)
+    pool = dict(scene.player_display.team.energy_pool)
+    state = BattleState.capture(scene)
+
+    scene.execute_enemy_turn([], [1, 1, 0, 0, 2, 0])
+    assert scene.player_display.team.energy_pool != pool
+
+    state.restore()
+    assert fingerprint(scene) == before
+    assert scene.player_display.team.energy_pool[Energy.PHYSICAL] == pool[Energy.PHYSICAL]
@@ -0,0 +1,81 @@
+from animearena.byte_buffer import ByteBuffer
+
+
+def test_byte_buffer_round_trip():
+    buffer = ByteBuffer()
+    buffer.write_int(7)
+    buffer.write_int(-2)
+    buffer.write_string("Mental Out")
+    buffer.write_string("")
+    buffer.write_string("御坂美琴")
+    buffer.write_bytes(b"\x00\x01\x02")
+    buffer.write_byte(b"\xff")
+
+    data = bytes(buffer.get_byte_array())
+    assert data[:8] == b"\x00\x00\x00\x07\xff\xff\xff\xfe"
+    assert data[8:22] == b"\x00\x00\x00\x0aMental Out"
+
+    reader = ByteBuffer(data)
+    assert reader.read_int() == 7
+    assert reader.read_int() == -2
+    assert reader.read_string() == "Mental Out"
+    assert reader.read_string() == ""
+    assert reader.read_string() == "御坂美琴"
+    assert bytes(reader.read_bytes(3)) == b"\x00\x01\x02"
+    assert bytes(reader.read_bytes(1)) == b"\xff"
+    assert reader.length() == 0
+    assert reader.read_int() is None
+    assert reader.read_bytes(1) is None
+
+
+def test_byte_buffer_read_without_advancing():
+    buffer = ByteBuffer()
+    buffer.write_int(42)
+    buffer.write_bytes(b"abc")
+
+    assert buffer.read_int(False) == 42
+    assert buffer.get_read_pos() == 0
+    assert buffer.read_int() == 42
+    assert bytes(buffer.read_bytes(3, False)) == b"abc"
+    assert buffer.get_read_pos() == 4
+    assert bytes(buffer.read_bytes(3)) == b"abc"
+    assert buffer.get_read_pos() == 7
+
+
+def test_byte_buffer_counts():
+    buffer = ByteBuffer(b"\x00\x00\x00\x01rest")
+    assert buffer.count() == 8
+    assert buffer.length() == 8
+    buffer.read_int()
+    assert buffer.count() == 8
+    assert buffer.length() == 4
+    buffer.clear()
+    assert buffer.count() == 0
+    assert buffer.length() == 0
+    assert buffer.get_read_pos() == 0
+
+
+def test_byte_buffer_updated_flag():
+    buffer = ByteBuffer()
+    assert not buffer.buff_updated
+    buffer.write_int(1)
+    assert buffer.buff_updated
+    buffer.read_int()
+    assert not buffer.buff_updated
+
+
+def test_byte_buffer_views_outlive_writes():
+    buffer = ByteBuffer()
+    buffer.write_bytes(b"avatar")
+    view = buffer.read_bytes(6)
+
+    # Growing the array under an exported view must copy it rather than
+    # raise, and the view keeps reading the bytes it was handed.
+    buffer.write_bytes(b" and more")
+    assert bytes(view) == b"avatar"
+    assert bytes(buffer.read_bytes(9)) == b" and more"
+
+    buffer.clear()
+    buffer.write_string("next")
+    assert bytes(view) == b"avatar"
+    assert buffer.read_string() == "next"
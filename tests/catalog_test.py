@@ -0,0 +1,46 @@
+import pytest
+from PIL import Image
+
+from animearena import catalog
+from animearena.character import get_character_db
+
+
+@pytest.fixture
+def thumbnail_cache(tmp_path, monkeypatch):
+    """A cache file of our own, with thumbnails that need no resources."""
+    path = tmp_path / "thumbnails-test.bin"
+    monkeypatch.setattr(catalog, "_thumbnails", None)
+    monkeypatch.setattr(catalog, "cache_path", lambda: path)
+    monkeypatch.setattr(catalog, "make_thumbnail",
+                        lambda name: Image.new("RGBA", (2, 2), (len(name), 0, 0, 255)))
+    return path
+
+
+@pytest.mark.parametrize("contents", [
+    catalog.CACHE_MAGIC,
+    catalog.CACHE_MAGIC + b"\x00\x00",
+    catalog.CACHE_MAGIC + b"\x00\x00\x00\x10[[",
+    b"not a cache",
+])
+def test_unreadable_thumbnail_cache_rebuilt(thumbnail_cache, contents: bytes):
+    thumbnail_cache.write_bytes(contents)
+
+    thumbnails = catalog.load_thumbnails()
+
+    names = [name for name, character in get_character_db().items() if not character.hidden]
+    assert sorted(thumbnails) == sorted(names)
+    assert catalog.read_thumbnails(thumbnail_cache).keys() == thumbnails.keys()
+
+
+def test_thumbnail_cache_round_trip(thumbnail_cache):
+    thumbnails = {"naruto": Image.new("RGBA", (3, 2), (1, 2, 3, 4)),
+                  "toga": Image.new("RGB", (2, 3), (5, 6, 7))}
+    catalog.write_thumbnails(thumbnail_cache, thumbnails)
+
+    read = catalog.read_thumbnails(thumbnail_cache)
+
+    assert read.keys() == thumbnails.keys()
+    for name, image in thumbnails.items():
+        assert read[name].mode == image.mode
+        assert read[name].size == image.size
+        assert read[name].tobytes() == image.tobytes()
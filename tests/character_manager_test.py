@@ -0,0 +1,79 @@
+import types
+
+import pytest
+
+from animearena import engine
+from animearena.character_manager import CharacterManager
+from animearena.effects import Effect, EffectType
+from animearena.headless import HeadlessBattleScene
+
+
+@pytest.fixture
+def effect_region(headless_scene: HeadlessBattleScene, monkeypatch) -> engine.Region:
+    """Naruto's effect region, drawn with stand-in sprites, after a full
+    redraw has been presented."""
+    naruto = headless_scene.pteam[0]
+    screen = engine.Region()
+    naruto.character_region = screen.subregion(5, 5, 0, 0)
+    naruto.effect_region = screen.subregion(135, 95, 0, 25)
+    headless_scene.active_effect_buttons = []
+    monkeypatch.setattr(CharacterManager, "make_effect_sprite",
+                        lambda self, effect, stacks: (types.SimpleNamespace(size=(25, 25), stacks=stacks),
+                                                      types.SimpleNamespace(size=(29, 29))))
+    screen.damage.reset()
+    return naruto.effect_region
+
+
+def add_effect(manager, ability_index: int, mag: int = 0):
+    ability = manager.source.current_abilities[ability_index]
+    effect = Effect(ability, EffectType.ALL_BOOST, manager, 2, lambda eff: "", mag=mag, print_mag=True)
+    manager.source.current_effects.append(effect)
+    return effect
+
+
+def icons(region: engine.Region) -> list:
+    return [(sprite.x, sprite.stacks) for sprite in region if hasattr(sprite, "stacks")]
+
+
+def test_effect_region_redraws_changed_families(headless_scene: HeadlessBattleScene,
+                                                effect_region: engine.Region):
+    naruto = headless_scene.pteam[0]
+    damage = effect_region.damage
+    first = add_effect(naruto, 0, mag=1)
+    second = add_effect(naruto, 1, mag=1)
+    naruto.update_effect_region()
+    assert icons(effect_region) == [(135, 1), (166, 1)]
+    assert len(headless_scene.active_effect_buttons) == 2
+
+    damage.reset()
+    naruto.update_effect_region()
+    assert not damage
+    assert icons(effect_region) == [(135, 1), (166, 1)]
+
+    second.mag = 2
+    naruto.update_effect_region()
+    assert icons(effect_region) == [(135, 1), (166, 2)]
+    assert all(rect[0] >= 164 for rect in damage.rects)
+    assert len(headless_scene.active_effect_buttons) == 2
+
+    damage.reset()
+    naruto.remove_effect(first)
+    naruto.update_effect_region()
+    assert icons(effect_region) == [(135, 2)]
+    assert headless_scene.active_effect_buttons == [sprite for sprite in effect_region
+                                                    if hasattr(sprite, "stacks")]
+
+
+def test_effect_region_after_full_redraw(headless_scene: HeadlessBattleScene,
+                                         effect_region: engine.Region):
+    naruto = headless_scene.pteam[0]
+    add_effect(naruto, 0, mag=1)
+    naruto.update_effect_region()
+    sprites = list(effect_region)
+
+    effect_region.clear()
+    headless_scene.active_effect_buttons.clear()
+    naruto.update_effect_region()
+
+    assert list(effect_region) == sprites
+    assert headless_scene.active_effect_buttons == sprites[1:]
@@ -0,0 +1,81 @@
+import asyncio
+import types
+
+from animearena import client, protocol
+
+
+class FakeWriter:
+
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data: bytes):
+        self.frames.append(data)
+
+
+def make_connection() -> client.ConnectionHandler:
+    scene_manager = types.SimpleNamespace(username_raw="misaki", password_raw="",
+                                          password_digest="",
+                                          login_scene=types.SimpleNamespace(clicked_login=True))
+    connection = client.ConnectionHandler(scene_manager)
+    connection.writer = FakeWriter()
+    return connection
+
+
+def receive_nonce(connection: client.ConnectionHandler, nonce: int):
+    """Hand the connection a login nonce and wait for its hashing to finish."""
+    async def run():
+        connection.handle_login_nonce(protocol.SERVER_LOGIN_NONCE.encode(nonce))
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if connection.waiting_for_login or not connection.scene_manager.login_scene.clicked_login:
+                return
+    connection.waiting_for_login = False
+    asyncio.run(run())
+
+
+def sent_digest(connection: client.ConnectionHandler) -> str:
+    return protocol.CLIENT_LOGIN_ATTEMPT.decode(connection.writer.frames[-1]).digest
+
+
+def test_login_hashes_password_once(monkeypatch):
+    hashed = []
+    hash_the_password = client.hash_the_password
+
+    def counting_hash(password: str) -> str:
+        hashed.append(password)
+        return hash_the_password(password)
+
+    monkeypatch.setattr(client, "hash_the_password", counting_hash)
+    connection = make_connection()
+    connection.scene_manager.password_raw = "hunter2"
+
+    receive_nonce(connection, 17)
+    assert hashed == ["hunter2"]
+    assert connection.scene_manager.password_raw == ""
+    assert connection.scene_manager.password_digest == hash_the_password("hunter2")
+    assert sent_digest(connection) == client.nonce_the_digest(hash_the_password("hunter2"), 17)
+
+    # A re-login, such as after a reconnect, only runs the nonce round.
+    receive_nonce(connection, 18)
+    assert hashed == ["hunter2"]
+    assert sent_digest(connection) == client.nonce_the_digest(hash_the_password("hunter2"), 18)
+
+
+def test_login_without_password_or_digest():
+    connection = make_connection()
+
+    receive_nonce(connection, 17)
+
+    assert connection.writer.frames == []
+    assert not connection.scene_manager.login_scene.clicked_login
+
+
+def test_login_failure_forgets_digest():
+    connection = make_connection()
+    connection.scene_manager.password_digest = "stale"
+    connection.scene_manager.login_scene.receive_message = lambda message: None
+
+    connection.handle_login_failure(protocol.SERVER_LOGIN_FAILURE.encode("Wrong password"))
+
+    assert connection.scene_manager.password_digest == ""
@@ -1,13 +1,25 @@
 import logging
 from typing import Tuple
 from animearena.character_manager import CharacterManager
+from animearena.character import Character
 from animearena.effects import Effect
+from animearena.headless import HeadlessBattleScene, make_headless_battle_scene
 import pytest
 
 @pytest.fixture(autouse=True)
 def disable_PIL_logging(caplog):
     caplog.set_level(logging.ERROR, logger="PIL.PngImagePlugin")
 
+@pytest.fixture
+def headless_scene() -> HeadlessBattleScene:
+    scene = make_headless_battle_scene()
+    scene.moving_first = True
+    scene.waiting_for_turn = False
+    scene.setup_scene([Character(name) for name in ("naruto", "ichigo", "toga")],
+                      [Character(name) for name in ("misaki", "hinata", "neji")],
+                      energy=[2, 2, 2, 2], seed=1)
+    return scene
+
 def pytest_assertrepr_compare(op, left, right):
     if isinstance(left, Tuple) and isinstance(right, CharacterManager) and op == "in":
         list_of_effects = ""
@@ -0,0 +1,159 @@
+import pytest
+
+from animearena.effects import Effect, EffectList, EffectType
+from animearena.headless import HeadlessBattleScene
+
+
+def make_effect(name: str, eff_type: EffectType, user, duration: int = 2, mag: int = 0) -> Effect:
+    return Effect(name, eff_type, user, duration, lambda eff: "", mag=mag)
+
+
+@pytest.fixture
+def users(headless_scene: HeadlessBattleScene):
+    return headless_scene.pteam[0], headless_scene.eteam[0]
+
+
+def test_effect_list_lookup(users):
+    naruto, misaki = users
+    stun = make_effect("Rasengan", EffectType.ALL_STUN, naruto)
+    boost = make_effect("Rasengan", EffectType.ALL_BOOST, naruto, mag=10)
+    mark = make_effect("Mental Out", EffectType.MARK, misaki)
+    effects = EffectList([stun, boost, mark])
+
+    assert len(effects) == 3
+    assert list(effects) == [stun, boost, mark]
+    assert effects[1] is boost
+    assert (EffectType.ALL_STUN, "Rasengan") in effects
+    assert mark in effects
+    assert (EffectType.MARK, "Rasengan") not in effects
+    assert effects.get(EffectType.ALL_BOOST, "Rasengan") is boost
+    assert effects.get(EffectType.UNIQUE, "Rasengan") is None
+    assert effects.get_with_user(EffectType.MARK, "Mental Out", misaki) is mark
+    assert effects.get_with_user(EffectType.MARK, "Mental Out", naruto) is None
+    assert effects.contains_sig(make_effect("Mental Out", EffectType.MARK, misaki))
+    assert not effects.contains_sig(make_effect("Mental Out", EffectType.MARK, misaki, duration=4))
+
+
+def test_effect_list_get_returns_first_applied(users):
+    naruto, misaki = users
+    first = make_effect("Gentle Fist", EffectType.CONT_DMG, misaki, mag=10)
+    second = make_effect("Gentle Fist", EffectType.CONT_DMG, naruto, mag=20)
+    effects = EffectList([first, second])
+
+    assert effects.get(EffectType.CONT_DMG, "Gentle Fist") is first
+    assert effects.get_with_user(EffectType.CONT_DMG, "Gentle Fist", naruto) is second
+
+
+def test_effect_list_discard(users):
+    naruto, misaki = users
+    stun = make_effect("Rasengan", EffectType.ALL_STUN, naruto)
+    boost = make_effect("Rasengan", EffectType.ALL_BOOST, naruto)
+    other_stun = make_effect("Rasengan", EffectType.ALL_STUN, misaki)
+    effects = EffectList([stun, boost, other_stun])
+
+    effects.discard(EffectType.ALL_STUN, "Rasengan")
+
+    assert list(effects) == [boost]
+    assert (EffectType.ALL_STUN, "Rasengan") not in effects
+    assert effects.get(EffectType.ALL_BOOST, "Rasengan") is boost
+    effects.discard(EffectType.ALL_STUN, "Rasengan")
+    assert list(effects) == [boost]
+
+
+def test_effect_list_discard_with_user(users):
+    naruto, misaki = users
+    naruto_stun = make_effect("Rasengan", EffectType.ALL_STUN, naruto)
+    naruto_boost = make_effect("Rasengan", EffectType.ALL_BOOST, naruto)
+    misaki_stun = make_effect("Rasengan", EffectType.ALL_STUN, misaki)
+    mark = make_effect("Mental Out", EffectType.MARK, naruto)
+    effects = EffectList([naruto_stun, misaki_stun, naruto_boost, mark])
+
+    effects.discard_with_user("Rasengan", naruto)
+
+    assert list(effects) == [misaki_stun, mark]
+    assert effects.get(EffectType.ALL_STUN, "Rasengan") is misaki_stun
+    assert (EffectType.ALL_BOOST, "Rasengan") not in effects
+    assert mark in effects
+
+
+def test_effect_list_retain(users):
+    naruto, _ = users
+    effects = EffectList(make_effect(f"Effect {i}", EffectType.UNIQUE, naruto, duration=i)
+                         for i in range(5))
+
+    effects.retain(lambda eff: eff.duration % 2 == 0)
+
+    assert [eff.name for eff in effects] == ["Effect 0", "Effect 2", "Effect 4"]
+    assert (EffectType.UNIQUE, "Effect 1") not in effects
+    assert effects.get(EffectType.UNIQUE, "Effect 2").duration == 2
+
+
+def test_effect_list_clear(users):
+    naruto, _ = users
+    effects = EffectList([make_effect("Rasengan", EffectType.ALL_STUN, naruto)])
+
+    effects.clear()
+
+    assert len(effects) == 0
+    assert (EffectType.ALL_STUN, "Rasengan") not in effects
+    assert effects.get(EffectType.ALL_STUN, "Rasengan") is None
+
+
+def test_effect_list_changes_during_iteration(users):
+    naruto, misaki = users
+    stun = make_effect("Rasengan", EffectType.ALL_STUN, naruto)
+    boost = make_effect("Rasengan", EffectType.ALL_BOOST, naruto)
+    mark = make_effect("Mental Out", EffectType.MARK, misaki)
+    added = make_effect("Sage Mode", EffectType.ALL_BOOST, naruto)
+    effects = EffectList([stun, boost, mark])
+
+    seen = []
+    for eff in effects:
+        seen.append(eff)
+        if eff is stun:
+            effects.discard(EffectType.ALL_BOOST, "Rasengan")
+            effects.append(added)
+
+    assert seen == [stun, boost, mark]
+    assert list(effects) == [stun, mark, added]
+
+
+def test_effect_list_version(users):
+    naruto, _ = users
+    effects = EffectList()
+    stun = make_effect("Rasengan", EffectType.ALL_STUN, naruto)
+
+    versions = [effects.version]
+    effects.append(stun)
+    versions.append(effects.version)
+    effects.discard(EffectType.MARK, "Rasengan")
+    assert effects.version == versions[-1]
+    effects.discard(EffectType.ALL_STUN, "Rasengan")
+    versions.append(effects.version)
+
+    assert len(set(versions)) == 3
+    assert EffectList().version not in versions
+
+
+def test_effect_list_snapshot_restore(users):
+    naruto, misaki = users
+    stun = make_effect("Rasengan", EffectType.ALL_STUN, naruto)
+    mark = make_effect("Mental Out", EffectType.MARK, misaki)
+    effects = EffectList([stun])
+    snapshot = effects.snapshot()
+
+    effects.append(mark)
+    effects.discard(EffectType.ALL_STUN, "Rasengan")
+    assert list(effects) == [mark]
+
+    effects.restore(snapshot)
+    assert list(effects) == [stun]
+    assert mark not in effects
+    assert effects.get(EffectType.ALL_STUN, "Rasengan") is stun
+
+    # The restored list shares the snapshot's storage, so changing it must
+    # leave the snapshot as it was.
+    effects.append(mark)
+    effects.restore(snapshot)
+    assert list(effects) == [stun]
+    assert mark not in effects
@@ -0,0 +1,99 @@
+from animearena.battle_scene import AbilityMessage
+from animearena.effects import EffectType
+from animearena.energy import Energy
+from animearena.character import Character
+from animearena.headless import HeadlessBattleScene, make_headless_battle_scene
+from animearena.recording import MatchRecorder, read_records
+
+
+def enemy_message(user_id: int, ability_id: int, primary_target: int,
+                  ally_targets: list[int], enemy_targets: list[int]) -> AbilityMessage:
+    """An enemy ability as the enemy's client sends it, with slots from the
+    enemy's side of the board."""
+    message = AbilityMessage()
+    message.assign_user_id(user_id)
+    message.assign_ability_id(ability_id)
+    message.set_primary_target(primary_target)
+    message.ally_targets = ally_targets
+    message.enemy_targets = enemy_targets
+    return message
+
+
+def test_headless_setup_scene(headless_scene: HeadlessBattleScene):
+    scene = headless_scene
+    assert scene.scene_manager is None
+    assert [manager.source.name for manager in scene.pteam] == ["naruto", "ichigo", "toga"]
+    assert [manager.source.name for manager in scene.eteam] == ["misaki", "hinata", "neji"]
+    assert all(manager.source.hp == 200 for manager in scene.pteam + scene.eteam)
+    assert scene.player_display.team.energy_pool[Energy.PHYSICAL] == 2
+    assert not scene.game_over
+
+
+def test_headless_execute_turn(headless_scene: HeadlessBattleScene):
+    scene = headless_scene
+    naruto = scene.pteam[0]
+    rasengan = naruto.source.current_abilities[0]
+    assert rasengan in scene.usable_abilities(naruto)
+    assert scene.eteam[1] in scene.legal_targets(naruto, rasengan)
+
+    scene.queue_ability(naruto, rasengan, scene.eteam[1])
+    messages = scene.execute_turn()
+
+    assert len(messages) == 1
+    assert messages[0].user_id == 0
+    assert messages[0].ability_id == 0
+    assert scene.eteam[1].source.hp < 200
+    assert scene.eteam[1].is_stunned()
+    assert scene.eteam[0].source.hp == 200
+    assert scene.player_display.team.energy_pool[Energy.PHYSICAL] < 2
+
+
+def test_headless_execute_enemy_turn(headless_scene: HeadlessBattleScene):
+    scene = headless_scene
+    scene.execute_turn()
+
+    # Hinata uses Gentle Fist on Naruto.
+    scene.execute_enemy_turn([enemy_message(1, 0, 3, [], [0])], [0, 0, 0, 0, 0, 0])
+
+    assert scene.pteam[0].source.hp < 200
+    assert not scene.waiting_for_turn
+
+
+def test_headless_enemy_mental_out(headless_scene: HeadlessBattleScene):
+    # The enemy display used to resolve the enemy's ability swaps and
+    # targeting, which looks for Mental Out's thrall among the enemy's
+    # enemies and found nothing on this side of the board.
+    scene = headless_scene
+    scene.execute_turn()
+
+    scene.execute_enemy_turn([enemy_message(0, 0, 4, [], [1])], [0, 0, 0, 0, 0, 0])
+
+    assert (EffectType.ALL_STUN, "Mental Out") in scene.pteam[1]
+    assert scene.eteam[0].source.current_abilities[0].name == "Mental Out - Order"
+
+    scene.execute_turn()
+    scene.execute_enemy_turn([], [0, 0, 0, 0, 0, 0])
+
+    assert not scene.game_over
+
+
+def test_catch_up_records_player_turns(headless_scene: HeadlessBattleScene):
+    # A reconnecting client replays its own stored turns as well as the
+    # enemy's, and its log needs both to be replayed later.
+    scene = headless_scene
+    scene.recorder = MatchRecorder()
+    naruto = scene.pteam[0]
+    scene.queue_ability(naruto, naruto.source.current_abilities[0], scene.eteam[1])
+    scene.execute_turn()
+    [played] = read_records(bytes(scene.recorder.log))
+
+    caught_up = make_headless_battle_scene()
+    caught_up.setup_scene([Character(name) for name in ("naruto", "ichigo", "toga")],
+                          [Character(name) for name in ("misaki", "hinata", "neji")],
+                          energy=[2, 2, 2, 2], seed=1)
+    caught_up.recorder = MatchRecorder()
+    caught_up.fast_forward(True, [played.abilities], [played.execution_order], [],
+                           [played.random_spent])
+
+    assert caught_up.recorder.log == scene.recorder.log
+    assert caught_up.eteam[1].source.hp == scene.eteam[1].source.hp
@@ -0,0 +1,65 @@
+import asyncio
+
+from animearena.character import Character
+from animearena.headless import HeadlessBattleScene, make_headless_battle_scene
+from animearena.practice import PracticeOpponent
+
+PLAYER_TEAM = ("naruto", "ichigo", "toga")
+ENEMY_TEAM = ("misaki", "hinata", "neji")
+
+
+def start_practice() -> HeadlessBattleScene:
+    """A headless scene on the player's side of a practice match."""
+    scene = make_headless_battle_scene()
+    opponent = PracticeOpponent(scene, player=None, budget=0.2, processes=1, seed=5)
+    energy, seed = opponent.start([Character(name) for name in PLAYER_TEAM],
+                                  [Character(name) for name in ENEMY_TEAM])
+    scene.moving_first = True
+    scene.waiting_for_turn = False
+    scene.setup_scene([Character(name) for name in PLAYER_TEAM],
+                      [Character(name) for name in ENEMY_TEAM], energy=energy, seed=seed)
+    scene.practice = opponent
+    return scene
+
+
+def queue_turn(scene: HeadlessBattleScene):
+    """Queue the first usable ability of each character on its first target."""
+    for manager in scene.pteam:
+        for ability in scene.usable_abilities(manager):
+            targets = scene.legal_targets(manager, ability)
+            if targets:
+                scene.queue_ability(manager, ability, targets[0])
+                break
+
+
+def confirm_turn(scene: HeadlessBattleScene):
+    """Send the queued turn to the opponent the way the confirm button does,
+    and wait for the opponent's answer."""
+    scene.get_execution_order_base("ally")
+    execution_order = list(scene.execution_order)
+
+    async def run():
+        scene.opponent.send_match_communication(scene.execute_turn(), execution_order, [0, 0, 0, 0])
+        for _ in range(500):
+            await asyncio.sleep(0.01)
+            if not scene.waiting_for_turn:
+                return
+
+    asyncio.run(run())
+
+
+def test_practice_opponent_answers():
+    scene = start_practice()
+    opponent = scene.practice
+    assert opponent.scene.pteam[0].source.name == "misaki"
+    assert opponent.scene.eteam[0].source.name == "naruto"
+
+    for _ in range(3):
+        queue_turn(scene)
+        confirm_turn(scene)
+        assert not scene.waiting_for_turn
+
+    # Both sides have played the same match.
+    assert [manager.source.hp for manager in scene.pteam + scene.eteam] == \
+           [manager.source.hp for manager in opponent.scene.eteam + opponent.scene.pteam]
+    opponent.close()
@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+
+from animearena import protocol
+from animearena.battle_scene import AbilityMessage
+from animearena.byte_buffer import ByteBuffer
+
+
+def old_packet(*values) -> bytes:
+    """A packet written value by value onto a ByteBuffer, the way the client
+    built and read packets before the schemas: ints with write_int, strings
+    with write_string, and byte strings after an int length."""
+    buffer = ByteBuffer()
+    for value in values:
+        if isinstance(value, int):
+            buffer.write_int(value)
+        elif isinstance(value, str):
+            buffer.write_string(value)
+        else:
+            buffer.write_int(len(value))
+            buffer.write_bytes(value)
+    return bytes(buffer.get_byte_array())
+
+
+def ability_message(user_id, ability_id, primary_id, ally_targets, enemy_targets) -> AbilityMessage:
+    message = AbilityMessage()
+    message.assign_user_id(user_id)
+    message.assign_ability_id(ability_id)
+    message.set_primary_target(primary_id)
+    message.ally_targets = ally_targets
+    message.enemy_targets = enemy_targets
+    return message
+
+
+def old_ability_message(message: AbilityMessage) -> tuple:
+    return (message.user_id, message.ability_id, message.primary_id,
+            len(message.ally_targets), *message.ally_targets,
+            len(message.enemy_targets), *message.enemy_targets)
+
+
+def comparable(value):
+    """Decoded values with AbilityMessages swapped for their fields."""
+    if isinstance(value, AbilityMessage):
+        return ("ability", value.user_id, value.ability_id, value.primary_id,
+                list(value.ally_targets), list(value.enemy_targets))
+    if isinstance(value, dict):
+        return comparable(list(value.values()))
+    if isinstance(value, (list, tuple)):
+        return [comparable(item) for item in value]
+    return value
+
+
+MESSAGES = [ability_message(0, 1, 4, [], [1]), ability_message(2, 3, 69, [0, 1, 2], [0, 1, 2])]
+OLD_MESSAGES = [value for message in MESSAGES for value in old_ability_message(message)]
+AVATAR = b"RIFF\x00\x00\x00\x00WEBPVP8 \x1f\x1f\x1f"
+POUCH = dict(name="misaki", wins=12, losses=3, image_mode="sha256:" + "ab" * 32,
+             image_size=[100, 100], image=AVATAR)
+OLD_POUCH = ("misaki", 12, 3, "sha256:" + "ab" * 32, 100, 100, AVATAR)
+NAMES = ["naruto", "ichigo", "toga"]
+ENEMY_NAMES = ["misaki", "hinata", "neji"]
+MISSIONS = [[1, 0, 2, 0, 0], [0, 0, 0, 0, 1], [3, 3, 3, 3, 3]]
+TURN = dict(abilities=MESSAGES, execution_order=[1, 0], random_spent=[1, 0, 0, 1])
+
+CASES = [
+    (protocol.SERVER_QUICK_MATCH_START,
+     dict(seed=1234, first_turn=1, start_pool=[1, 0, 0, 0, 2, 0], names=NAMES, **POUCH),
+     old_packet(0, 1234, 1, 1, 0, 0, 0, 2, 0, *NAMES, *OLD_POUCH)),
+    (protocol.SERVER_MATCH_COMMUNICATION,
+     dict(timeout=0, abilities=MESSAGES, execution_order=[1, 0], random_spent=[0, 1, 0, 0],
+          potential_energy=[0, 1, 2, 0, 1, 0]),
+     old_packet(1, 0, 2, *OLD_MESSAGES, 2, 1, 0, 0, 1, 0, 0, 0, 1, 2, 0, 1, 0)),
+    (protocol.SERVER_LOGIN_FAILURE, dict(message="Wrong password"),
+     old_packet(2, "Wrong password")),
+    (protocol.SERVER_LOGIN_SUCCESS,
+     dict(wins=5, losses=2, medals=40, mission_data="naruto/0/0/0/0/0|", avatar=AVATAR),
+     old_packet(3, 5, 2, 40, "naruto/0/0/0/0/0|", 1, AVATAR)),
+    (protocol.SERVER_LOGIN_SUCCESS,
+     dict(wins=0, losses=0, medals=0, mission_data="", avatar=None),
+     old_packet(3, 0, 0, 0, "", 0)),
+    (protocol.SERVER_REGISTRATION, dict(message="Registration successful"),
+     old_packet(4, "Registration successful")),
+    (protocol.SERVER_SURRENDER_NOTIFICATION, dict(mission_packages=MISSIONS),
+     old_packet(5, *[value for package in MISSIONS for value in package])),
+    (protocol.SERVER_RECONNECTION,
+     dict(seed=99, player_names=NAMES, **POUCH, enemy_names=ENEMY_NAMES, first_turn=0,
+          time_remaining=57, turns=[TURN, dict(abilities=[], execution_order=[],
+                                               random_spent=[0, 0, 0, 0])],
+          energy_pools=[[1, 1, 0, 0, 2, 0], [0, 0, 0, 1, 1, 0]]),
+     old_packet(6, 99, *NAMES, *OLD_POUCH, *ENEMY_NAMES, 0, 57,
+                2, 2, *OLD_MESSAGES, 2, 1, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 0,
+                2, 1, 1, 0, 0, 2, 0, 0, 0, 0, 1, 1, 0)),
+    (protocol.SERVER_VERSION_CHECK, dict(version="1.2.3"), old_packet(7, "1.2.3")),
+    (protocol.SERVER_TIMEOUT, dict(), old_packet(8)),
+    (protocol.SERVER_LOGIN_NONCE, dict(nonce=-559038737), old_packet(9, -559038737)),
+    (protocol.SERVER_RANKED_MATCH_START, dict(first_turn=1, **POUCH),
+     old_packet(10, 1, *OLD_POUCH)),
+    (protocol.SERVER_DRAFT_MESSAGE, dict(character="toga"), old_packet(11, "toga")),
+    (protocol.SERVER_DRAFT_FINALIZATION, dict(seed=7, start_pool=[0, 1, 0, 0, 1, 0]),
+     old_packet(12, 7, 0, 1, 0, 0, 1, 0)),
+    (protocol.SERVER_DRAFT_TIMEOUT, dict(), old_packet(13)),
+    (protocol.SERVER_DRAFT_DISCONNECTION, dict(), old_packet(14)),
+    (protocol.CLIENT_QUICK_MATCH_START, dict(names=NAMES, **POUCH),
+     old_packet(0, *NAMES, *OLD_POUCH)),
+    (protocol.CLIENT_MATCH_COMMUNICATION,
+     dict(timeout=0, abilities=MESSAGES, execution_order=[1, 0], random_spent=[0, 0, 1, 0]),
+     old_packet(1, 0, 2, *OLD_MESSAGES, 2, 1, 0, 0, 0, 1, 0)),
+    (protocol.CLIENT_LOGIN_ATTEMPT, dict(username="misaki", digest="d1g35t"),
+     old_packet(2, "misaki", "d1g35t")),
+    (protocol.CLIENT_REGISTRATION, dict(username="misaki", digest="d1g35t"),
+     old_packet(3, "misaki", "d1g35t")),
+    (protocol.CLIENT_AVATAR_UPDATE, dict(avatar=AVATAR), old_packet(4, AVATAR)),
+    (protocol.CLIENT_PLAYER_UPDATE,
+     dict(wins=5, losses=2, medals=40, mission_data="naruto/0/0/0/0/0|"),
+     old_packet(5, 5, 2, 40, "naruto/0/0/0/0/0|")),
+    (protocol.CLIENT_SURRENDER, dict(mission_packages=MISSIONS),
+     old_packet(6, *[value for package in MISSIONS for value in package])),
+    (protocol.CLIENT_SEARCH_CANCELLATION, dict(), old_packet(7)),
+    (protocol.CLIENT_MATCH_ENDING, dict(won=1), old_packet(8, 1)),
+    (protocol.CLIENT_MATCH_STATISTICS, dict(names=NAMES, won=0), old_packet(9, *NAMES, 0)),
+    (protocol.CLIENT_VERSION_REQUEST, dict(), old_packet(10)),
+    (protocol.CLIENT_LOGIN_NONCE_REQUEST, dict(), old_packet(11)),
+    (protocol.CLIENT_RANKED_MATCH_START, dict(**POUCH), old_packet(12, *OLD_POUCH)),
+    (protocol.CLIENT_DRAFT_MESSAGE, dict(character="toga"), old_packet(13, "toga")),
+    (protocol.CLIENT_DRAFT_FINALIZATION, dict(names=NAMES), old_packet(14, *NAMES)),
+]
+
+
+def test_every_schema_covered():
+    covered = {id(schema) for schema, _, _ in CASES}
+    schemas = list(protocol.SERVER_PACKETS.values()) + list(protocol.CLIENT_PACKETS.values())
+    assert [schema.name for schema in schemas if id(schema) not in covered] == []
+
+
+@pytest.mark.parametrize("schema, fields, old_bytes", CASES,
+                         ids=[f"{schema.packet_id}-{schema.name}" for schema, _, _ in CASES])
+def test_schema_round_trip(schema: protocol.PacketSchema, fields: dict, old_bytes: bytes):
+    encoded = schema.encode(**_encodable(fields))
+    assert bytes(encoded) == old_bytes
+    assert protocol.peek_packet_id(encoded) == schema.packet_id
+
+    # Packets arrive with the sentinel still on them.
+    decoded = schema.decode(old_bytes + protocol.SENTINEL)
+    assert decoded.packet_id == schema.packet_id
+    for name, value in fields.items():
+        assert comparable(getattr(decoded, name)) == comparable(value), name
+
+
+def _encodable(fields: dict) -> dict:
+    """Turns are packed from attributes, so the dicts standing in for them
+    are given as records."""
+    if "turns" not in fields:
+        return fields
+    return dict(fields, turns=[protocol.TURN.tuple(**turn) for turn in fields["turns"]])
+
+
+def test_decode_wrong_packet_id():
+    with pytest.raises(ValueError):
+        protocol.SERVER_LOGIN_FAILURE.decode(old_packet(4, "Registration successful"))
+
+
+def test_decode_bad_length():
+    data = bytearray(old_packet(2, "Wrong password"))
+    data[4:8] = b"\x00\x00\x10\x00"
+    with pytest.raises(ValueError):
+        protocol.SERVER_LOGIN_FAILURE.decode(bytes(data))
+
+
+@pytest.mark.parametrize("framing", list(protocol.Framing))
+def test_frame_round_trip(framing: protocol.Framing):
+    payload = protocol.CLIENT_AVATAR_UPDATE.encode(avatar=b"\x00" * 64)
+
+    async def read_back() -> bytes:
+        reader = asyncio.StreamReader()
+        reader.feed_data(protocol.frame(payload, framing))
+        reader.feed_eof()
+        return await protocol.read_frame(reader, framing)
+
+    assert asyncio.run(read_back()) == bytes(payload)
+
+
+def test_oversize_frame_skipped():
+    payload = protocol.CLIENT_MATCH_ENDING.encode(won=1)
+
+    async def read_back() -> bytes:
+        reader = asyncio.StreamReader(limit=protocol.MAX_FRAME_SIZE)
+        reader.feed_data(protocol.FRAME_HEADER.pack(protocol.MAX_FRAME_SIZE + 1))
+        reader.feed_data(b"\x00" * (protocol.MAX_FRAME_SIZE + 1))
+        reader.feed_data(protocol.frame(payload, protocol.Framing.LENGTH_PREFIXED))
+        reader.feed_eof()
+        with pytest.raises(ValueError):
+            await protocol.read_frame(reader, protocol.Framing.LENGTH_PREFIXED)
+        return await protocol.read_frame(reader, protocol.Framing.LENGTH_PREFIXED)
+
+    assert asyncio.run(read_back()) == bytes(payload)